@@ -0,0 +1,98 @@
+"""
+Асинхронные версии функций crud.
+
+Сигнатуры те же, но без первого аргумента db: чтения сами берут соединение
+из пула в потоке чтения, записи уходят в поток-писатель (см. aio.py).
+Синхронные функции crud по-прежнему можно вызывать напрямую.
+"""
+from typing import Callable
+from . import crud
+from .aio import run_read, run_write
+
+def _reader(fn: Callable) -> Callable:
+    async def wrapper(*args, **kwargs):
+        return await run_read(fn, *args, **kwargs)
+    wrapper.__name__ = wrapper.__qualname__ = fn.__name__
+    wrapper.__doc__ = fn.__doc__
+    return wrapper
+
+def _writer(fn: Callable) -> Callable:
+    async def wrapper(*args, **kwargs):
+        return await run_write(fn, *args, **kwargs)
+    wrapper.__name__ = wrapper.__qualname__ = fn.__name__
+    wrapper.__doc__ = fn.__doc__
+    return wrapper
+
+# ========== Сотрудники ==========
+create_employee = _writer(crud.create_employee)
+get_employee = _reader(crud.get_employee)
+get_employees = _reader(crud.get_employees)
+get_employees_after = _reader(crud.get_employees_after)
+update_employee = _writer(crud.update_employee)
+delete_employee = _writer(crud.delete_employee)
+
+# ========== Детали ==========
+create_part = _writer(crud.create_part)
+create_parts = _writer(crud.create_parts)
+get_part = _reader(crud.get_part)
+get_parts = _reader(crud.get_parts)
+get_parts_after = _reader(crud.get_parts_after)
+update_part = _writer(crud.update_part)
+delete_part = _writer(crud.delete_part)
+check_part_availability = _reader(crud.check_part_availability)
+check_parts_availability = _reader(crud.check_parts_availability)
+
+# ========== Услуги ==========
+create_service = _writer(crud.create_service)
+get_service = _reader(crud.get_service)
+get_services = _reader(crud.get_services)
+update_service = _writer(crud.update_service)
+delete_service = _writer(crud.delete_service)
+
+# ========== Заказы ==========
+create_order = _writer(crud.create_order)
+get_order = _reader(crud.get_order)
+get_orders = _reader(crud.get_orders)
+get_orders_after = _reader(crud.get_orders_after)
+update_order = _writer(crud.update_order)
+delete_order = _writer(crud.delete_order)
+calculate_order_total = _writer(crud.calculate_order_total)
+check_order_totals = _reader(crud.check_order_totals)
+get_vehicle_history = _reader(crud.get_vehicle_history)
+
+# ========== Детали заказа ==========
+create_order_detail = _writer(crud.create_order_detail)
+create_order_details = _writer(crud.create_order_details)
+get_order_detail = _reader(crud.get_order_detail)
+get_order_details = _reader(crud.get_order_details)
+get_order_details_for_orders = _reader(crud.get_order_details_for_orders)
+attach_order_details = _reader(crud.attach_order_details)
+update_order_detail = _writer(crud.update_order_detail)
+delete_order_detail = _writer(crud.delete_order_detail)
+
+# ========== Выплаты зарплат ==========
+create_salary_payment = _writer(crud.create_salary_payment)
+get_salary_payment = _reader(crud.get_salary_payment)
+get_salary_payments = _reader(crud.get_salary_payments)
+get_salary_payments_after = _reader(crud.get_salary_payments_after)
+update_salary_payment = _writer(crud.update_salary_payment)
+delete_salary_payment = _writer(crud.delete_salary_payment)
+
+# ========== Расходы ==========
+create_expense = _writer(crud.create_expense)
+create_expenses = _writer(crud.create_expenses)
+get_expense = _reader(crud.get_expense)
+get_expenses = _reader(crud.get_expenses)
+get_expenses_after = _reader(crud.get_expenses_after)
+update_expense = _writer(crud.update_expense)
+delete_expense = _writer(crud.delete_expense)
+
+# ========== Статистика и отчеты ==========
+search = _reader(crud.search)
+
+get_financial_stats = _reader(crud.get_financial_stats)
+get_financial_timeseries = _reader(crud.get_financial_timeseries)
+get_employee_stats = _reader(crud.get_employee_stats)
+get_parts_report = _reader(crud.get_parts_report)
+get_orders_report = _reader(crud.get_orders_report)
+get_dashboard_snapshot = _reader(crud.get_dashboard_snapshot)
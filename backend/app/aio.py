@@ -0,0 +1,119 @@
+import asyncio
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, List, Optional
+from . import config
+from .database import get_db, get_pool, get_writer
+
+# Асинхронный доступ к базе: чтения выполняются на выделенном пуле потоков,
+# записи - в потоке-писателе. Очереди ограничены семафорами, поэтому при
+# перегрузке запросы ждут в цикле событий, а не копятся в очереди потоков.
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+# Семафоры asyncio привязаны к циклу событий, поэтому храним их по циклам
+_limits: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict]" = weakref.WeakKeyDictionary()
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=config.DB_ASYNC_READ_THREADS,
+                    thread_name_prefix="autobatya-read",
+                )
+    return _executor
+
+@asynccontextmanager
+async def _slot(kind: str, size: int):
+    loop = asyncio.get_running_loop()
+    limits = _limits.setdefault(loop, {})
+    semaphore = limits.get(kind)
+    if semaphore is None:
+        semaphore = limits[kind] = asyncio.Semaphore(size)
+    async with semaphore:
+        yield
+
+def _read(fn: Callable, args, kwargs):
+    with get_db() as db:
+        return fn(db, *args, **kwargs)
+
+async def run_read(fn: Callable, *args, **kwargs):
+    """
+    Выполняет fn(db, *args, **kwargs) на соединении из пула в потоке чтения.
+    """
+    async with _slot("read", config.DB_ASYNC_MAX_PENDING_READS):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_executor(), _read, fn, args, kwargs)
+
+def _open_cursor(pool, fn: Callable, args, kwargs):
+    db = pool.acquire()
+    try:
+        return db, fn(db, *args, **kwargs)
+    except BaseException:
+        pool.release(db)
+        raise
+
+def _close_cursor(pool, db, cursor):
+    cursor.close()
+    pool.release(db)
+
+async def iter_read(fn: Callable, *args, chunk_size: int = 1000, **kwargs) -> AsyncIterator[List]:
+    """
+    Выполняет fn(db, *args, **kwargs), возвращающую курсор, и отдает его
+    строки пачками по chunk_size (fetchmany) - результат не собирается в
+    памяти целиком. Соединение занято, пока генератор не дочитан или не
+    закрыт (в том числе при обрыве соединения клиентом); поток чтения -
+    только на время выборки очередной пачки.
+    """
+    executor = _get_executor()
+    pool = get_pool()
+    job = None
+    opened = None
+    try:
+        # Очередь чтения ограничивает только открытие курсора: на время
+        # выгрузки генератор держит соединение, но не место в очереди
+        async with _slot("read", config.DB_ASYNC_MAX_PENDING_READS):
+            job = executor.submit(_open_cursor, pool, fn, args, kwargs)
+            opened = await asyncio.wrap_future(job)
+        cursor = opened[1]
+        while True:
+            job = executor.submit(cursor.fetchmany, chunk_size)
+            rows = await asyncio.wrap_future(job)
+            if not rows:
+                break
+            yield rows
+    finally:
+        # Если генератор закрыт, пока поток еще работает с соединением,
+        # соединение возвращается в пул по завершении этой работы
+        if opened is None:
+            if job is not None:
+                job.add_done_callback(
+                    lambda f: f.cancelled() or f.exception() is not None
+                    or _close_cursor(pool, *f.result())
+                )
+        elif job.done():
+            _close_cursor(pool, *opened)
+        else:
+            job.add_done_callback(lambda f: _close_cursor(pool, *opened))
+
+async def run_write(fn: Callable, *args, **kwargs):
+    """
+    Асинхронный вариант database.run_write: ставит fn в очередь записи
+    и ждет результат, не блокируя цикл событий.
+    """
+    async with _slot("write", config.DB_ASYNC_MAX_PENDING_WRITES):
+        return await asyncio.wrap_future(get_writer().submit(fn, *args, **kwargs))
+
+def shutdown():
+    """
+    Останавливает потоки чтения (при остановке приложения).
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
@@ -0,0 +1,120 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, Sequence, Set, Tuple
+from . import config
+from .database import on_commit
+
+CacheKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+def normalize_params(params: Dict[str, Any]) -> Tuple[Tuple[str, str], ...]:
+    """
+    Приводит параметры запроса к ключу кэша: без пустых значений,
+    в строковом виде и в порядке имен.
+    """
+    return tuple(sorted(
+        (name, str(value)) for name, value in params.items() if value is not None
+    ))
+
+class ResponseCache:
+    """
+    LRU-кэш результатов тяжелых эндпоинтов с временем жизни записей.
+
+    Каждая запись помнит, из каких таблиц она посчитана, и удаляется, как
+    только транзакция, меняющая одну из этих таблиц, закоммичена.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = 60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[CacheKey, Tuple[float, Any, Tuple[str, ...]]]" = OrderedDict()
+        self._keys_by_table: Dict[str, Set[CacheKey]] = {}
+        # Счетчик изменений таблицы: результат, посчитанный во время записи,
+        # не попадет в кэш
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    def get_or_compute(self, endpoint: str, params: Dict[str, Any],
+                       tables: Sequence[str], compute: Callable[[], Any]) -> Any:
+        key = (endpoint, normalize_params(params))
+        hit, value, generations = self._lookup(key, tables)
+        if hit:
+            return value
+        value = compute()
+        self._store_if_unchanged(key, value, tables, generations)
+        return value
+
+    async def get_or_compute_async(self, endpoint: str, params: Dict[str, Any],
+                                   tables: Sequence[str],
+                                   compute: Callable[[], Awaitable[Any]]) -> Any:
+        key = (endpoint, normalize_params(params))
+        hit, value, generations = self._lookup(key, tables)
+        if hit:
+            return value
+        value = await compute()
+        self._store_if_unchanged(key, value, tables, generations)
+        return value
+
+    def invalidate_tables(self, tables: Iterable[str]):
+        with self._lock:
+            for table in tables:
+                self._generations[table] = self._generations.get(table, 0) + 1
+                for key in self._keys_by_table.pop(table, ()):
+                    entry = self._entries.pop(key, None)
+                    if entry is not None:
+                        self._forget(key, entry[2])
+                        self._invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_table.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+            }
+
+    def _lookup(self, key: CacheKey, tables: Sequence[str]):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return True, entry[1], None
+            self._misses += 1
+            return False, None, [self._generations.get(table, 0) for table in tables]
+
+    def _store_if_unchanged(self, key: CacheKey, value: Any, tables: Sequence[str], generations):
+        with self._lock:
+            if generations == [self._generations.get(table, 0) for table in tables]:
+                self._store(key, value, tuple(tables), time.monotonic() + self.ttl)
+
+    def _store(self, key: CacheKey, value: Any, tables: Tuple[str, ...], expires: float):
+        self._entries[key] = (expires, value, tables)
+        self._entries.move_to_end(key)
+        for table in tables:
+            self._keys_by_table.setdefault(table, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            old_key, (_, _, old_tables) = self._entries.popitem(last=False)
+            self._forget(old_key, old_tables)
+            self._evictions += 1
+
+    def _forget(self, key: CacheKey, tables: Tuple[str, ...]):
+        for table in tables:
+            keys = self._keys_by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+
+response_cache = ResponseCache(config.CACHE_MAX_ENTRIES, config.CACHE_TTL)
+on_commit(response_cache.invalidate_tables)
@@ -0,0 +1,90 @@
+import os
+
+# Настройки приложения. Все значения можно переопределить переменными окружения,
+# чтобы не менять код при развертывании на разных кассовых терминалах.
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+DATABASE_URL = os.getenv("AUTOBATYA_DATABASE_URL", "autobatya.db")
+
+# ========== Пул соединений ==========
+DB_POOL_SIZE = _env_int("AUTOBATYA_DB_POOL_SIZE", 8)
+# Сколько секунд ждать свободное соединение, прежде чем вернуть ошибку
+DB_POOL_TIMEOUT = _env_float("AUTOBATYA_DB_POOL_TIMEOUT", 10.0)
+# Соединения, простоявшие дольше этого времени, проверяются запросом SELECT 1
+DB_POOL_HEALTH_CHECK_INTERVAL = _env_float("AUTOBATYA_DB_POOL_HEALTH_CHECK_INTERVAL", 30.0)
+
+# ========== Режим хранения SQLite ==========
+# WAL позволяет читателям работать параллельно с записью
+DB_JOURNAL_MODE = os.getenv("AUTOBATYA_DB_JOURNAL_MODE", "WAL")
+# NORMAL в режиме WAL не теряет целостность, но не делает fsync на каждый коммит
+DB_SYNCHRONOUS = os.getenv("AUTOBATYA_DB_SYNCHRONOUS", "NORMAL")
+# Отрицательное значение - размер кэша страниц в КиБ
+DB_CACHE_SIZE = _env_int("AUTOBATYA_DB_CACHE_SIZE", -16000)
+DB_MMAP_SIZE = _env_int("AUTOBATYA_DB_MMAP_SIZE", 128 * 1024 * 1024)
+DB_TEMP_STORE = os.getenv("AUTOBATYA_DB_TEMP_STORE", "MEMORY")
+# Сколько миллисекунд ждать снятия блокировки другим процессом
+DB_BUSY_TIMEOUT = _env_int("AUTOBATYA_DB_BUSY_TIMEOUT", 5000)
+
+# ========== Кэш ответов статистики и отчетов ==========
+CACHE_MAX_ENTRIES = _env_int("AUTOBATYA_CACHE_MAX_ENTRIES", 256)
+CACHE_TTL = _env_float("AUTOBATYA_CACHE_TTL", 60.0)
+
+# ========== Асинхронный доступ к базе ==========
+# Потоков чтения столько же, сколько соединений в пуле: поток не ждет соединение
+DB_ASYNC_READ_THREADS = _env_int("AUTOBATYA_DB_ASYNC_READ_THREADS", DB_POOL_SIZE)
+# Сколько операций может одновременно ждать в очередях чтения и записи;
+# остальные запросы ждут места, не занимая потоки
+DB_ASYNC_MAX_PENDING_READS = _env_int("AUTOBATYA_DB_ASYNC_MAX_PENDING_READS", 256)
+DB_ASYNC_MAX_PENDING_WRITES = _env_int("AUTOBATYA_DB_ASYNC_MAX_PENDING_WRITES", 256)
+
+# ========== Метрики и профилирование ==========
+# Учет запросов SQL для /metrics; 0 - соединения без инструментирования
+SQL_METRICS = _env_int("AUTOBATYA_SQL_METRICS", 1)
+# Сколько разных текстов запросов учитывать отдельно
+SQL_METRICS_MAX_STATEMENTS = _env_int("AUTOBATYA_SQL_METRICS_MAX_STATEMENTS", 500)
+# Порог медленного запроса в миллисекундах; 0 - лог медленных запросов выключен
+SLOW_QUERY_MS = _env_float("AUTOBATYA_SLOW_QUERY_MS", 0.0)
+
+# ========== Ответы ==========
+# Списки из базы отдаются без повторной валидации через response_model
+TRUSTED_ROWS = _env_int("AUTOBATYA_TRUSTED_ROWS", 1)
+# Сколько строк выгрузки /export читается из курсора за раз
+EXPORT_CHUNK_SIZE = _env_int("AUTOBATYA_EXPORT_CHUNK_SIZE", 1000)
+
+# ========== Импорт CSV ==========
+# Размер кэша страниц отдельного соединения импорта, КиБ (отрицательное значение)
+IMPORT_CACHE_SIZE = _env_int("AUTOBATYA_IMPORT_CACHE_SIZE", -256000)
+
+# ========== Лента изменений /events ==========
+# Интервал комментария-пинга в простаивающем потоке SSE, секунды
+EVENTS_HEARTBEAT = _env_float("AUTOBATYA_EVENTS_HEARTBEAT", 15.0)
+# Через сколько миллисекунд браузер переподключается после обрыва
+EVENTS_RETRY_MS = _env_int("AUTOBATYA_EVENTS_RETRY_MS", 3000)
+# Сколько последних событий хранится для переподключения с Last-Event-ID
+EVENTS_BACKLOG = _env_int("AUTOBATYA_EVENTS_BACKLOG", 1000)
+# Очередь одного подписчика; при переполнении он получает событие resync
+EVENTS_QUEUE_SIZE = _env_int("AUTOBATYA_EVENTS_QUEUE_SIZE", 1000)
+
+# ========== Несколько процессов-воркеров ==========
+# Число процессов uvicorn (main.py); все работают с одним файлом базы
+WORKERS = _env_int("AUTOBATYA_WORKERS", 1)
+# Версии таблиц для кэша и ETag берутся из общей таблицы change_versions,
+# а не из памяти процесса. По умолчанию включено при нескольких воркерах
+SHARED_VERSIONS = _env_int("AUTOBATYA_SHARED_VERSIONS", 1 if WORKERS > 1 else 0)
+# Как часто (в секундах) перечитывать change_versions в фоне: изменения
+# других воркеров и команд из командной строки (rollup rebuild, totals repair,
+# search rebuild) сбрасывают кэш и ETag и доходят до подписчиков /events
+# (событием resync) не позже чем через этот интервал; 0 - не перечитывать
+VERSIONS_POLL_INTERVAL = _env_float("AUTOBATYA_VERSIONS_POLL_INTERVAL", 0.5)
+
+# ========== Суммы заказов ==========
+# Как часто (в секундах) сверять суммы заказов с их строками (см. totals.py);
+# 0 - фоновая проверка выключена
+ORDER_TOTALS_VERIFY_INTERVAL = _env_float("AUTOBATYA_ORDER_TOTALS_VERIFY_INTERVAL", 600.0)
@@ -1,20 +1,36 @@
-from .database import get_db
+from .database import get_db, read_transaction, transaction
+from .events import publish_rows
+from .search import SEARCH_TABLES, match_query, search_table
+from .stock import check_parts, release_parts, reserve_parts, total_quantities
+from .totals import check_order_totals
+from .vehicles import normalize_car_number
 from .models import *
 from typing import List, Optional
-from datetime import datetime
+from datetime import date, datetime, timedelta
+
+def _insert_many(db, sql: str, rows: list) -> int:
+    """
+    Вставляет строки одним executemany и возвращает id первой из них.
+    Вызывается внутри транзакции: пока она держит блокировку записи,
+    AUTOINCREMENT выдает строкам пакета идущие подряд id.
+    """
+    cursor = db.cursor()
+    cursor.executemany(sql, rows)
+    last_id = cursor.execute("SELECT last_insert_rowid()").fetchone()[0]
+    return last_id - len(rows) + 1
 
 # ========== CRUD для сотрудников ==========
 def create_employee(db, employee: EmployeeCreate):
-    cursor = db.cursor()
-    cursor.execute(
-        """
-        INSERT INTO employees (name, position, salary, hire_date, phone, email)
-        VALUES (?, ?, ?, ?, ?, ?)
-        """,
-        (employee.name, employee.position, employee.salary, 
-         employee.hire_date, employee.phone, employee.email)
-    )
-    db.commit()
+    with transaction(db, "employees"):
+        cursor = db.cursor()
+        cursor.execute(
+            """
+            INSERT INTO employees (name, position, salary, hire_date, phone, email)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            (employee.name, employee.position, employee.salary, 
+             employee.hire_date, employee.phone, employee.email)
+        )
     return get_employee(db, cursor.lastrowid)
 
 def get_employee(db, employee_id: int):
@@ -28,39 +44,63 @@ def get_employees(db, skip: int = 0, limit: int = 100):
     cursor.execute("SELECT * FROM employees LIMIT ? OFFSET ?", (limit, skip))
     return [dict(row) for row in cursor.fetchall()]
 
-def update_employee(db, employee_id: int, employee: EmployeeCreate):
+def get_employees_after(db, after_id: Optional[int] = None, limit: int = 100):
+    # Постраничный вывод по курсору: цена страницы не зависит от ее номера
     cursor = db.cursor()
     cursor.execute(
-        """
-        UPDATE employees 
-        SET name=?, position=?, salary=?, hire_date=?, phone=?, email=?
-        WHERE id=?
-        """,
-        (employee.name, employee.position, employee.salary,
-         employee.hire_date, employee.phone, employee.email, employee_id)
+        "SELECT * FROM employees WHERE id > ? ORDER BY id LIMIT ?",
+        (after_id or 0, limit)
     )
-    db.commit()
+    return [dict(row) for row in cursor.fetchall()]
+
+def update_employee(db, employee_id: int, employee: EmployeeCreate):
+    with transaction(db, "employees"):
+        cursor = db.cursor()
+        cursor.execute(
+            """
+            UPDATE employees 
+            SET name=?, position=?, salary=?, hire_date=?, phone=?, email=?
+            WHERE id=?
+            """,
+            (employee.name, employee.position, employee.salary,
+             employee.hire_date, employee.phone, employee.email, employee_id)
+        )
     return get_employee(db, employee_id)
 
 def delete_employee(db, employee_id: int):
-    cursor = db.cursor()
-    cursor.execute("DELETE FROM employees WHERE id=?", (employee_id,))
-    db.commit()
+    with transaction(db, "employees"):
+        cursor = db.cursor()
+        cursor.execute("DELETE FROM employees WHERE id=?", (employee_id,))
     return True
 
 # ========== CRUD для деталей ==========
 def create_part(db, part: PartCreate):
-    cursor = db.cursor()
-    cursor.execute(
-        """
-        INSERT INTO parts (name, price, quantity, supplier)
-        VALUES (?, ?, ?, ?)
-        """,
-        (part.name, part.price, part.quantity, part.supplier)
-    )
-    db.commit()
+    with transaction(db, "parts"):
+        cursor = db.cursor()
+        cursor.execute(
+            """
+            INSERT INTO parts (name, price, quantity, supplier)
+            VALUES (?, ?, ?, ?)
+            """,
+            (part.name, part.price, part.quantity, part.supplier)
+        )
+        publish_rows(db, "parts", "created", [cursor.lastrowid])
     return get_part(db, cursor.lastrowid)
 
+def create_parts(db, parts: List[PartCreate]):
+    rows = [(part.name, part.price, part.quantity, part.supplier) for part in parts]
+    with transaction(db, "parts"):
+        first_id = _insert_many(
+            db,
+            "INSERT INTO parts (name, price, quantity, supplier) VALUES (?, ?, ?, ?)",
+            rows
+        )
+        publish_rows(db, "parts", "created", list(range(first_id, first_id + len(rows))))
+    return [
+        dict(zip(("id", "name", "price", "quantity", "supplier"), (first_id + i, *row)))
+        for i, row in enumerate(rows)
+    ]
+
 def get_part(db, part_id: int):
     cursor = db.cursor()
     cursor.execute("SELECT * FROM parts WHERE id=?", (part_id,))
@@ -72,42 +112,57 @@ def get_parts(db, skip: int = 0, limit: int = 100):
     cursor.execute("SELECT * FROM parts LIMIT ? OFFSET ?", (limit, skip))
     return [dict(row) for row in cursor.fetchall()]
 
-def update_part(db, part_id: int, part: PartCreate):
+def get_parts_after(db, after_id: Optional[int] = None, limit: int = 100):
     cursor = db.cursor()
     cursor.execute(
-        """
-        UPDATE parts 
-        SET name=?, price=?, quantity=?, supplier=?
-        WHERE id=?
-        """,
-        (part.name, part.price, part.quantity, part.supplier, part_id)
+        "SELECT * FROM parts WHERE id > ? ORDER BY id LIMIT ?",
+        (after_id or 0, limit)
     )
-    db.commit()
+    return [dict(row) for row in cursor.fetchall()]
+
+def update_part(db, part_id: int, part: PartCreate):
+    with transaction(db, "parts"):
+        cursor = db.cursor()
+        cursor.execute(
+            """
+            UPDATE parts 
+            SET name=?, price=?, quantity=?, supplier=?
+            WHERE id=?
+            """,
+            (part.name, part.price, part.quantity, part.supplier, part_id)
+        )
+        publish_rows(db, "parts", "updated", [part_id])
     return get_part(db, part_id)
 
 def delete_part(db, part_id: int):
-    cursor = db.cursor()
-    cursor.execute("DELETE FROM parts WHERE id=?", (part_id,))
-    db.commit()
+    with transaction(db, "parts"):
+        cursor = db.cursor()
+        cursor.execute("DELETE FROM parts WHERE id=?", (part_id,))
+        publish_rows(db, "parts", "deleted", [part_id])
     return True
 
 def check_part_availability(db, part_id: int, quantity: int):
-    part = get_part(db, part_id)
-    if not part:
-        return False
-    return part['quantity'] >= quantity
+    return check_parts(db, {part_id: quantity})[0]['available']
+
+def check_parts_availability(db, items: List[PartQuantity]):
+    """
+    Хватает ли деталей для всего списка (одним запросом, см. stock.py).
+    Повторы одной детали складываются.
+    """
+    parts = check_parts(db, total_quantities((item.part_id, item.quantity) for item in items))
+    return {"available": all(part['available'] for part in parts), "parts": parts}
 
 # ========== CRUD для услуг ==========
 def create_service(db, service: ServiceCreate):
-    cursor = db.cursor()
-    cursor.execute(
-        """
-        INSERT INTO services (name, price, duration)
-        VALUES (?, ?, ?)
-        """,
-        (service.name, service.price, service.duration)
-    )
-    db.commit()
+    with transaction(db, "services"):
+        cursor = db.cursor()
+        cursor.execute(
+            """
+            INSERT INTO services (name, price, duration)
+            VALUES (?, ?, ?)
+            """,
+            (service.name, service.price, service.duration)
+        )
     return get_service(db, cursor.lastrowid)
 
 def get_service(db, service_id: int):
@@ -122,117 +177,240 @@ def get_services(db, skip: int = 0, limit: int = 100):
     return [dict(row) for row in cursor.fetchall()]
 
 def update_service(db, service_id: int, service: ServiceCreate):
-    cursor = db.cursor()
-    cursor.execute(
-        """
-        UPDATE services 
-        SET name=?, price=?, duration=?
-        WHERE id=?
-        """,
-        (service.name, service.price, service.duration, service_id)
-    )
-    db.commit()
+    with transaction(db, "services"):
+        cursor = db.cursor()
+        cursor.execute(
+            """
+            UPDATE services 
+            SET name=?, price=?, duration=?
+            WHERE id=?
+            """,
+            (service.name, service.price, service.duration, service_id)
+        )
     return get_service(db, service_id)
 
 def delete_service(db, service_id: int):
-    cursor = db.cursor()
-    cursor.execute("DELETE FROM services WHERE id=?", (service_id,))
-    db.commit()
+    with transaction(db, "services"):
+        cursor = db.cursor()
+        cursor.execute("DELETE FROM services WHERE id=?", (service_id,))
     return True
 
 # ========== CRUD для заказов ==========
+# Колонки заказа в ответах API: служебная car_number_norm (см. vehicles.py) не отдается
+ORDER_COLUMNS = "id, client_name, car_model, car_number, date, total_price, status, employee_id"
+
 def create_order(db, order: OrderCreate):
-    cursor = db.cursor()
-    cursor.execute(
-        """
-        INSERT INTO orders (client_name, car_model, car_number, date, total_price, status, employee_id)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-        """,
-        (order.client_name, order.car_model, order.car_number,
-         order.date, order.total_price, order.status, order.employee_id)
-    )
-    db.commit()
+    with transaction(db, "orders"):
+        cursor = db.cursor()
+        cursor.execute(
+            """
+            INSERT INTO orders (client_name, car_model, car_number, car_number_norm,
+                                date, total_price, status, employee_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (order.client_name, order.car_model, order.car_number, normalize_car_number(order.car_number),
+             order.date, order.total_price, order.status, order.employee_id)
+        )
+        publish_rows(db, "orders", "created", [cursor.lastrowid], ORDER_COLUMNS)
     return get_order(db, cursor.lastrowid)
 
 def get_order(db, order_id: int):
     cursor = db.cursor()
-    cursor.execute("SELECT * FROM orders WHERE id=?", (order_id,))
+    cursor.execute(f"SELECT {ORDER_COLUMNS} FROM orders WHERE id=?", (order_id,))
     row = cursor.fetchone()
     return dict(row) if row else None
 
 def get_orders(db, skip: int = 0, limit: int = 100, status: Optional[str] = None):
     cursor = db.cursor()
     if status:
-        cursor.execute("SELECT * FROM orders WHERE status=? LIMIT ? OFFSET ?", 
+        cursor.execute(f"SELECT {ORDER_COLUMNS} FROM orders WHERE status=? LIMIT ? OFFSET ?",
                       (status, limit, skip))
     else:
-        cursor.execute("SELECT * FROM orders LIMIT ? OFFSET ?", (limit, skip))
+        cursor.execute(f"SELECT {ORDER_COLUMNS} FROM orders LIMIT ? OFFSET ?", (limit, skip))
     return [dict(row) for row in cursor.fetchall()]
 
-def update_order(db, order_id: int, order: OrderCreate):
+def get_orders_after(db, after_date: Optional[str] = None, after_id: Optional[int] = None,
+                     limit: int = 100, status: Optional[str] = None):
+    # Порядок (date, id) совпадает с индексом idx_orders_date (rowid входит в индекс)
     cursor = db.cursor()
-    cursor.execute(
-        """
-        UPDATE orders 
-        SET client_name=?, car_model=?, car_number=?, date=?, 
-            total_price=?, status=?, employee_id=?
-        WHERE id=?
-        """,
-        (order.client_name, order.car_model, order.car_number,
-         order.date, order.total_price, order.status, order.employee_id, order_id)
-    )
-    db.commit()
+    if status:
+        cursor.execute(
+            f"""
+            SELECT {ORDER_COLUMNS} FROM orders
+            WHERE status=? AND (date, id) > (?, ?)
+            ORDER BY date, id
+            LIMIT ?
+            """,
+            (status, after_date or '', after_id or 0, limit)
+        )
+    else:
+        cursor.execute(
+            f"""
+            SELECT {ORDER_COLUMNS} FROM orders
+            WHERE (date, id) > (?, ?)
+            ORDER BY date, id
+            LIMIT ?
+            """,
+            (after_date or '', after_id or 0, limit)
+        )
+    return [dict(row) for row in cursor.fetchall()]
+
+def update_order(db, order_id: int, order: OrderCreate):
+    with transaction(db, "orders"):
+        cursor = db.cursor()
+        cursor.execute(
+            """
+            UPDATE orders 
+            SET client_name=?, car_model=?, car_number=?, car_number_norm=?, date=?, 
+                total_price=CASE
+                    WHEN EXISTS (SELECT 1 FROM order_details WHERE order_id = orders.id)
+                    THEN total_price ELSE ?
+                END,
+                status=?, employee_id=?
+            WHERE id=?
+            """,
+            (order.client_name, order.car_model, order.car_number, normalize_car_number(order.car_number),
+             order.date, order.total_price, order.status, order.employee_id, order_id)
+        )
+        publish_rows(db, "orders", "updated", [order_id], ORDER_COLUMNS)
     return get_order(db, order_id)
 
 def delete_order(db, order_id: int):
-    cursor = db.cursor()
-    cursor.execute("DELETE FROM orders WHERE id=?", (order_id,))
-    db.commit()
+    with transaction(db, "orders"):
+        cursor = db.cursor()
+        cursor.execute("DELETE FROM orders WHERE id=?", (order_id,))
+        publish_rows(db, "orders", "deleted", [order_id])
     return True
 
+def publish_order_totals(db, order_ids: List[int]):
+    # Суммы меняют триггеры на order_details (см. totals.py), здесь - только события
+    publish_rows(db, "orders", "updated", sorted(set(order_ids)), ORDER_COLUMNS)
+
 def calculate_order_total(db, order_id: int):
+    """
+    Полный пересчет суммы заказа по строкам. Обычно сумму поддерживают
+    триггеры, это инструмент исправления (POST /orders/{id}/calculate).
+    """
+    with transaction(db, "orders"):
+        cursor = db.cursor()
+        cursor.execute(
+            """
+            SELECT TOTAL(price * quantity) 
+            FROM order_details 
+            WHERE order_id=?
+            """,
+            (order_id,)
+        )
+        total = cursor.fetchone()[0]
+        cursor.execute(
+            "UPDATE orders SET total_price=? WHERE id=?",
+            (total, order_id)
+        )
+        publish_rows(db, "orders", "updated", [order_id], ORDER_COLUMNS)
+    return total
+
+def get_vehicle_history(db, car_number: str, skip: int = 0, limit: int = 20):
+    """
+    Заказы машины, новые первыми, с деталями и названиями услуг и деталей.
+    Номер сравнивается в нормализованном виде (см. vehicles.py), поэтому
+    "а123вс 77" и "A123BC77" - одна машина. Страница заказов выбирается по
+    индексу idx_orders_car_number_norm, детали присоединяются тем же запросом.
+    """
+    car_number_norm = normalize_car_number(car_number)
+    if not car_number_norm:
+        return []
     cursor = db.cursor()
     cursor.execute(
-        """
-        SELECT SUM(price * quantity) 
-        FROM order_details 
-        WHERE order_id=?
+        f"""
+        SELECT o.*,
+               d.id AS detail_id, d.service_id, s.name AS service_name,
+               d.part_id, p.name AS part_name, d.quantity, d.price
+        FROM (
+            SELECT {ORDER_COLUMNS} FROM orders
+            WHERE car_number_norm = ?
+            ORDER BY date DESC, id DESC
+            LIMIT ? OFFSET ?
+        ) o
+        LEFT JOIN order_details d ON d.order_id = o.id
+        LEFT JOIN services s ON s.id = d.service_id
+        LEFT JOIN parts p ON p.id = d.part_id
+        ORDER BY o.date DESC, o.id DESC, d.id
         """,
-        (order_id,)
-    )
-    total = cursor.fetchone()[0] or 0
-    cursor.execute(
-        "UPDATE orders SET total_price=? WHERE id=?",
-        (total, order_id)
+        (car_number_norm, limit, skip)
     )
-    db.commit()
-    return total
+    orders = []
+    for row in cursor.fetchall():
+        if not orders or orders[-1]['id'] != row['id']:
+            order = {column: row[column] for column in ORDER_COLUMNS.split(", ")}
+            order['details'] = []
+            orders.append(order)
+        if row['detail_id'] is not None:
+            orders[-1]['details'].append({
+                'id': row['detail_id'],
+                'service_id': row['service_id'],
+                'service_name': row['service_name'],
+                'part_id': row['part_id'],
+                'part_name': row['part_name'],
+                'quantity': row['quantity'],
+                'price': row['price'],
+            })
+    return orders
 
 # ========== CRUD для деталей заказа ==========
 def create_order_detail(db, order_detail: OrderDetailCreate):
-    cursor = db.cursor()
-    cursor.execute(
-        """
-        INSERT INTO order_details (order_id, service_id, part_id, quantity, price)
-        VALUES (?, ?, ?, ?, ?)
-        """,
-        (order_detail.order_id, order_detail.service_id, 
-         order_detail.part_id, order_detail.quantity, order_detail.price)
-    )
-    db.commit()
+    # Вставка, пересчет суммы и списание со склада - одна транзакция
+    with transaction(db, "order_details", "orders", "parts"):
+        # Списание условное: если детали не хватает, InsufficientStock откатывает все
+        if order_detail.part_id:
+            reserve_parts(db, {order_detail.part_id: order_detail.quantity})
+        
+        cursor = db.cursor()
+        cursor.execute(
+            """
+            INSERT INTO order_details (order_id, service_id, part_id, quantity, price)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            (order_detail.order_id, order_detail.service_id, 
+             order_detail.part_id, order_detail.quantity, order_detail.price)
+        )
+        order_detail_id = cursor.lastrowid
+        
+        publish_order_totals(db, [order_detail.order_id])
+        
+        if order_detail.part_id:
+            publish_rows(db, "parts", "updated", [order_detail.part_id])
     
-    # Обновляем общую сумму заказа
-    calculate_order_total(db, order_detail.order_id)
+    return get_order_detail(db, order_detail_id)
+
+def create_order_details(db, order_details: List[OrderDetailCreate]):
+    rows = [
+        (d.order_id, d.service_id, d.part_id, d.quantity, d.price)
+        for d in order_details
+    ]
+    # Списание со склада суммируем по деталям, чтобы обновить каждую один раз
+    stock = total_quantities((d.part_id, d.quantity) for d in order_details if d.part_id)
     
-    # Если это деталь, уменьшаем количество на складе
-    if order_detail.part_id:
-        cursor.execute(
-            "UPDATE parts SET quantity=quantity-? WHERE id=?",
-            (order_detail.quantity, order_detail.part_id)
+    with transaction(db, "order_details", "orders", "parts"):
+        # Не хватает хотя бы одной детали - не создается ни одна строка
+        reserve_parts(db, stock)
+        first_id = _insert_many(
+            db,
+            """
+            INSERT INTO order_details (order_id, service_id, part_id, quantity, price)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            rows
         )
-        db.commit()
+        
+        publish_order_totals(db, [d.order_id for d in order_details])
+        
+        publish_rows(db, "parts", "updated", list(stock))
     
-    return get_order_detail(db, cursor.lastrowid)
+    return [
+        dict(zip(("id", "order_id", "service_id", "part_id", "quantity", "price"),
+                 (first_id + i, *row)))
+        for i, row in enumerate(rows)
+    ]
 
 def get_order_detail(db, order_detail_id: int):
     cursor = db.cursor()
@@ -245,78 +423,97 @@ def get_order_details(db, order_id: int):
     cursor.execute("SELECT * FROM order_details WHERE order_id=?", (order_id,))
     return [dict(row) for row in cursor.fetchall()]
 
-def update_order_detail(db, order_detail_id: int, order_detail: OrderDetailCreate):
-    old_detail = get_order_detail(db, order_detail_id)
-    
-    cursor = db.cursor()
-    cursor.execute(
-        """
-        UPDATE order_details 
-        SET order_id=?, service_id=?, part_id=?, quantity=?, price=?
-        WHERE id=?
-        """,
-        (order_detail.order_id, order_detail.service_id, 
-         order_detail.part_id, order_detail.quantity, 
-         order_detail.price, order_detail_id)
-    )
-    db.commit()
-    
-    # Обновляем общую сумму заказа
-    calculate_order_total(db, order_detail.order_id)
-    
-    # Если изменялась деталь, корректируем остатки
-    if old_detail['part_id']:
-        # Возвращаем старую деталь на склад
+def get_order_details_for_orders(db, order_ids: List[int], chunk_size: int = 500):
+    """
+    Детали сразу для нескольких заказов: один запрос WHERE order_id IN (...)
+    на каждые chunk_size заказов вместо запроса на каждый заказ.
+    Возвращает словарь {order_id: [детали]}.
+    """
+    details = {order_id: [] for order_id in order_ids}
+    cursor = db.cursor()
+    ids = list(details)
+    for start in range(0, len(ids), chunk_size):
+        chunk = ids[start:start + chunk_size]
+        placeholders = ", ".join("?" * len(chunk))
         cursor.execute(
-            "UPDATE parts SET quantity=quantity+? WHERE id=?",
-            (old_detail['quantity'], old_detail['part_id'])
+            f"SELECT * FROM order_details WHERE order_id IN ({placeholders}) ORDER BY id",
+            chunk
         )
-        db.commit()
-    
-    if order_detail.part_id:
-        # Берем новую деталь со склада
+        for row in cursor.fetchall():
+            details[row['order_id']].append(dict(row))
+    return details
+
+def attach_order_details(db, orders: List[dict]):
+    details = get_order_details_for_orders(db, [order['id'] for order in orders])
+    for order in orders:
+        order['details'] = details[order['id']]
+    return orders
+
+def update_order_detail(db, order_detail_id: int, order_detail: OrderDetailCreate):
+    with transaction(db, "order_details", "orders", "parts"):
+        old_detail = get_order_detail(db, order_detail_id)
+        if not old_detail:
+            return None
+        
+        cursor = db.cursor()
         cursor.execute(
-            "UPDATE parts SET quantity=quantity-? WHERE id=?",
-            (order_detail.quantity, order_detail.part_id)
+            """
+            UPDATE order_details 
+            SET order_id=?, service_id=?, part_id=?, quantity=?, price=?
+            WHERE id=?
+            """,
+            (order_detail.order_id, order_detail.service_id, 
+             order_detail.part_id, order_detail.quantity, 
+             order_detail.price, order_detail_id)
         )
-        db.commit()
+        
+        # Сумма заказа (и прежнего заказа, если строку перенесли)
+        publish_order_totals(db, [order_detail.order_id, old_detail['order_id']])
+        
+        # Если изменялась деталь, корректируем остатки
+        if old_detail['part_id']:
+            # Возвращаем старую деталь на склад
+            release_parts(db, {old_detail['part_id']: old_detail['quantity']})
+        
+        if order_detail.part_id:
+            # Берем новую деталь со склада (с учетом только что возвращенной)
+            reserve_parts(db, {order_detail.part_id: order_detail.quantity})
+        
+        publish_rows(db, "parts", "updated",
+                     sorted({old_detail['part_id'], order_detail.part_id} - {None}))
     
     return get_order_detail(db, order_detail_id)
 
 def delete_order_detail(db, order_detail_id: int):
-    order_detail = get_order_detail(db, order_detail_id)
-    if not order_detail:
-        return False
-    
-    cursor = db.cursor()
-    cursor.execute("DELETE FROM order_details WHERE id=?", (order_detail_id,))
-    db.commit()
-    
-    # Обновляем общую сумму заказа
-    calculate_order_total(db, order_detail['order_id'])
-    
-    # Если это была деталь, возвращаем на склад
-    if order_detail['part_id']:
-        cursor.execute(
-            "UPDATE parts SET quantity=quantity+? WHERE id=?",
-            (order_detail['quantity'], order_detail['part_id'])
-        )
-        db.commit()
+    with transaction(db, "order_details", "orders", "parts"):
+        order_detail = get_order_detail(db, order_detail_id)
+        if not order_detail:
+            return False
+        
+        cursor = db.cursor()
+        cursor.execute("DELETE FROM order_details WHERE id=?", (order_detail_id,))
+        
+        publish_order_totals(db, [order_detail['order_id']])
+        
+        # Если это была деталь, возвращаем на склад
+        if order_detail['part_id']:
+            release_parts(db, {order_detail['part_id']: order_detail['quantity']})
+            publish_rows(db, "parts", "updated", [order_detail['part_id']])
     
     return True
 
 # ========== CRUD для выплат зарплат ==========
 def create_salary_payment(db, salary_payment: SalaryPaymentCreate):
-    cursor = db.cursor()
-    cursor.execute(
-        """
-        INSERT INTO salary_payments (employee_id, amount, date, bonus)
-        VALUES (?, ?, ?, ?)
-        """,
-        (salary_payment.employee_id, salary_payment.amount, 
-         salary_payment.date, salary_payment.bonus)
-    )
-    db.commit()
+    with transaction(db, "salary_payments"):
+        cursor = db.cursor()
+        cursor.execute(
+            """
+            INSERT INTO salary_payments (employee_id, amount, date, bonus)
+            VALUES (?, ?, ?, ?)
+            """,
+            (salary_payment.employee_id, salary_payment.amount, 
+             salary_payment.date, salary_payment.bonus)
+        )
     return get_salary_payment(db, cursor.lastrowid)
 
 def get_salary_payment(db, salary_payment_id: int):
@@ -340,39 +537,75 @@ def get_salary_payments(db, employee_id: Optional[int] = None,
         )
     return [dict(row) for row in cursor.fetchall()]
 
-def update_salary_payment(db, salary_payment_id: int, salary_payment: SalaryPaymentCreate):
+def get_salary_payments_after(db, employee_id: Optional[int] = None,
+                              after_id: Optional[int] = None, limit: int = 100):
     cursor = db.cursor()
-    cursor.execute(
-        """
-        UPDATE salary_payments 
-        SET employee_id=?, amount=?, date=?, bonus=?
-        WHERE id=?
-        """,
-        (salary_payment.employee_id, salary_payment.amount,
-         salary_payment.date, salary_payment.bonus, salary_payment_id)
-    )
-    db.commit()
+    if employee_id:
+        cursor.execute(
+            """
+            SELECT * FROM salary_payments
+            WHERE employee_id=? AND id > ?
+            ORDER BY id
+            LIMIT ?
+            """,
+            (employee_id, after_id or 0, limit)
+        )
+    else:
+        cursor.execute(
+            "SELECT * FROM salary_payments WHERE id > ? ORDER BY id LIMIT ?",
+            (after_id or 0, limit)
+        )
+    return [dict(row) for row in cursor.fetchall()]
+
+def update_salary_payment(db, salary_payment_id: int, salary_payment: SalaryPaymentCreate):
+    with transaction(db, "salary_payments"):
+        cursor = db.cursor()
+        cursor.execute(
+            """
+            UPDATE salary_payments 
+            SET employee_id=?, amount=?, date=?, bonus=?
+            WHERE id=?
+            """,
+            (salary_payment.employee_id, salary_payment.amount,
+             salary_payment.date, salary_payment.bonus, salary_payment_id)
+        )
     return get_salary_payment(db, salary_payment_id)
 
 def delete_salary_payment(db, salary_payment_id: int):
-    cursor = db.cursor()
-    cursor.execute("DELETE FROM salary_payments WHERE id=?", (salary_payment_id,))
-    db.commit()
+    with transaction(db, "salary_payments"):
+        cursor = db.cursor()
+        cursor.execute("DELETE FROM salary_payments WHERE id=?", (salary_payment_id,))
     return True
 
 # ========== CRUD для расходов ==========
 def create_expense(db, expense: ExpenseCreate):
-    cursor = db.cursor()
-    cursor.execute(
-        """
-        INSERT INTO expenses (name, amount, date, category)
-        VALUES (?, ?, ?, ?)
-        """,
-        (expense.name, expense.amount, expense.date, expense.category)
-    )
-    db.commit()
+    with transaction(db, "expenses"):
+        cursor = db.cursor()
+        cursor.execute(
+            """
+            INSERT INTO expenses (name, amount, date, category)
+            VALUES (?, ?, ?, ?)
+            """,
+            (expense.name, expense.amount, expense.date, expense.category)
+        )
     return get_expense(db, cursor.lastrowid)
 
+def create_expenses(db, expenses: List[ExpenseCreate]):
+    rows = [
+        (expense.name, expense.amount, expense.date, expense.category)
+        for expense in expenses
+    ]
+    with transaction(db, "expenses"):
+        first_id = _insert_many(
+            db,
+            "INSERT INTO expenses (name, amount, date, category) VALUES (?, ?, ?, ?)",
+            rows
+        )
+    return [
+        dict(zip(("id", "name", "amount", "date", "category"), (first_id + i, *row)))
+        for i, row in enumerate(rows)
+    ]
+
 def get_expense(db, expense_id: int):
     cursor = db.cursor()
     cursor.execute("SELECT * FROM expenses WHERE id=?", (expense_id,))
@@ -394,68 +627,85 @@ def get_expenses(db, category: Optional[str] = None,
         )
     return [dict(row) for row in cursor.fetchall()]
 
-def update_expense(db, expense_id: int, expense: ExpenseCreate):
+def get_expenses_after(db, category: Optional[str] = None,
+                       after_id: Optional[int] = None, limit: int = 100):
     cursor = db.cursor()
-    cursor.execute(
-        """
-        UPDATE expenses 
-        SET name=?, amount=?, date=?, category=?
-        WHERE id=?
-        """,
-        (expense.name, expense.amount, expense.date, expense.category, expense_id)
-    )
-    db.commit()
+    if category:
+        cursor.execute(
+            """
+            SELECT * FROM expenses
+            WHERE category=? AND id > ?
+            ORDER BY id
+            LIMIT ?
+            """,
+            (category, after_id or 0, limit)
+        )
+    else:
+        cursor.execute(
+            "SELECT * FROM expenses WHERE id > ? ORDER BY id LIMIT ?",
+            (after_id or 0, limit)
+        )
+    return [dict(row) for row in cursor.fetchall()]
+
+def update_expense(db, expense_id: int, expense: ExpenseCreate):
+    with transaction(db, "expenses"):
+        cursor = db.cursor()
+        cursor.execute(
+            """
+            UPDATE expenses 
+            SET name=?, amount=?, date=?, category=?
+            WHERE id=?
+            """,
+            (expense.name, expense.amount, expense.date, expense.category, expense_id)
+        )
     return get_expense(db, expense_id)
 
 def delete_expense(db, expense_id: int):
-    cursor = db.cursor()
-    cursor.execute("DELETE FROM expenses WHERE id=?", (expense_id,))
-    db.commit()
+    with transaction(db, "expenses"):
+        cursor = db.cursor()
+        cursor.execute("DELETE FROM expenses WHERE id=?", (expense_id,))
     return True
 
+# ========== Полнотекстовый поиск ==========
+def search(db, q: str, limit: int = 20):
+    """
+    Ищет q по заказам, деталям и услугам (индексы FTS5, см. search.py).
+    Возвращает {таблица: найденные строки}, лучшие совпадения первыми.
+    """
+    match = match_query(q)
+    if match is None:
+        return {table: [] for table in SEARCH_TABLES}
+    with read_transaction(db):
+        return {
+            table: search_table(db, table, match, limit, ORDER_COLUMNS if table == "orders" else "t.*")
+            for table in SEARCH_TABLES
+        }
+
 # ========== Статистика и отчеты ==========
 def get_financial_stats(db, start_date: Optional[str] = None, end_date: Optional[str] = None):
+    # Суммы берутся из ежедневной сводки daily_financials (см. rollup.py),
+    # которую триггеры поддерживают при каждой записи. TOTAL, а не SUM:
+    # сумма всегда вещественная, в том числе 0.0 для пустого периода
     cursor = db.cursor()
-    
-    # Доходы
     if start_date and end_date:
         cursor.execute(
             """
-            SELECT SUM(total_price) 
-            FROM orders 
-            WHERE status='завершен' AND date BETWEEN ? AND ?
+            SELECT kind, TOTAL(amount) 
+            FROM daily_financials 
+            WHERE day BETWEEN ? AND ?
+            GROUP BY kind
             """,
             (start_date, end_date)
         )
     else:
         cursor.execute(
-            "SELECT SUM(total_price) FROM orders WHERE status='завершен'"
+            "SELECT kind, TOTAL(amount) FROM daily_financials GROUP BY kind"
         )
-    income = cursor.fetchone()[0] or 0
+    totals = {row[0]: row[1] for row in cursor.fetchall()}
     
-    # Расходы
-    if start_date and end_date:
-        cursor.execute(
-            "SELECT SUM(amount) FROM expenses WHERE date BETWEEN ? AND ?",
-            (start_date, end_date)
-        )
-    else:
-        cursor.execute("SELECT SUM(amount) FROM expenses")
-    expenses = cursor.fetchone()[0] or 0
-    
-    # Зарплаты
-    if start_date and end_date:
-        cursor.execute(
-            """
-            SELECT SUM(amount + bonus) 
-            FROM salary_payments 
-            WHERE date BETWEEN ? AND ?
-            """,
-            (start_date, end_date)
-        )
-    else:
-        cursor.execute("SELECT SUM(amount + bonus) FROM salary_payments")
-    salaries = cursor.fetchone()[0] or 0
+    income = totals.get("income", 0.0)
+    expenses = totals.get("expenses", 0.0)
+    salaries = totals.get("salaries", 0.0)
     
     return {
         "income": income,
@@ -464,14 +714,78 @@ def get_financial_stats(db, start_date: Optional[str] = None, end_date: Optional
         "profit": income - expenses
     }
 
+# Начало периода для каждой строки сводки (day - дата в формате YYYY-MM-DD);
+# неделя начинается с понедельника
+TIMESERIES_BUCKETS = {
+    "day": "day",
+    "week": "date(day, 'weekday 0', '-6 days')",
+    "month": "strftime('%Y-%m-01', day)",
+}
+
+def _bucket_start(day: date, bucket: str) -> date:
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+def _next_bucket(start: date, bucket: str) -> date:
+    if bucket == "week":
+        return start + timedelta(days=7)
+    if bucket == "month":
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=1)
+
+def get_financial_timeseries(db, metric: str, bucket: str = "month",
+                             start_date: Optional[str] = None,
+                             end_date: Optional[str] = None):
+    """
+    Ряд сумм metric (income, expenses или salaries) по периодам bucket
+    (day, week или month). Все периоды считаются одним GROUP BY по сводке
+    daily_financials, пустые периоды заполняются нулями. Без границ ряд
+    идет от первого до последнего периода, в котором есть данные.
+    """
+    conditions, params = ["kind = ?"], [metric]
+    if start_date:
+        conditions.append("day >= ?")
+        params.append(str(start_date))
+    if end_date:
+        conditions.append("day <= ?")
+        params.append(str(end_date))
+    cursor = db.cursor()
+    cursor.execute(
+        f"""
+        SELECT {TIMESERIES_BUCKETS[bucket]} AS period, TOTAL(amount)
+        FROM daily_financials
+        WHERE {' AND '.join(conditions)}
+        GROUP BY period
+        ORDER BY period
+        """,
+        params
+    )
+    totals = {row[0]: row[1] for row in cursor.fetchall()}
+
+    first = start_date or min(totals, default=None)
+    last = end_date or max(totals, default=None)
+    if first is None or last is None:
+        return []
+    current = _bucket_start(date.fromisoformat(str(first)), bucket)
+    last = date.fromisoformat(str(last))
+    points = []
+    while current <= last:
+        key = current.isoformat()
+        points.append({"date": key, "value": totals.get(key, 0.0)})
+        current = _next_bucket(current, bucket)
+    return points
+
 def get_employee_stats(db):
     cursor = db.cursor()
     
     cursor.execute("SELECT COUNT(*) FROM employees")
     count = cursor.fetchone()[0] or 0
     
-    cursor.execute("SELECT AVG(salary) FROM employees")
-    avg_salary = cursor.fetchone()[0] or 0
+    cursor.execute("SELECT COALESCE(AVG(salary), 0.0) FROM employees")
+    avg_salary = cursor.fetchone()[0]
     
     return {
         "employee_count": count,
@@ -491,6 +805,28 @@ def get_parts_report(db, min_quantity: int = 5):
     )
     return [dict(row) for row in cursor.fetchall()]
 
+def get_recent_orders(db, limit: int = 5):
+    # Обратный проход по idx_orders_date, без сортировки всей таблицы
+    cursor = db.cursor()
+    cursor.execute(
+        f"SELECT {ORDER_COLUMNS} FROM orders ORDER BY date DESC, id DESC LIMIT ?",
+        (limit,)
+    )
+    return [dict(row) for row in cursor.fetchall()]
+
+def get_dashboard_snapshot(db, min_quantity: int = 5, recent_limit: int = 5):
+    """
+    Все данные панели управления одним соединением и в одной транзакции
+    чтения, поэтому суммы, остатки и заказы согласованы между собой.
+    """
+    with read_transaction(db):
+        return {
+            "financial": get_financial_stats(db),
+            "employees": get_employee_stats(db),
+            "low_stock_parts": get_parts_report(db, min_quantity),
+            "recent_orders": get_recent_orders(db, recent_limit),
+        }
+
 def get_orders_report(db, status: str = 'завершен', 
                      start_date: Optional[str] = None, 
                      end_date: Optional[str] = None):
@@ -1,131 +1,276 @@
 import sqlite3
 import os
+import logging
+import threading
+import time
 from contextlib import contextmanager
-from typing import Generator
+from typing import Callable, Dict, Generator, List, Optional, Set
+from . import config
+from .pool import ConnectionPool
+from .profiling import InstrumentedConnection
+from .writer import WriteQueue
 
-DATABASE_URL = "autobatya.db"
+DATABASE_URL = config.DATABASE_URL
+
+_pool: Optional[ConnectionPool] = None
+_writer: Optional[WriteQueue] = None
+_pool_lock = threading.Lock()
+# Таблицы, измененные в открытых transaction(), по id соединения
+_pending_tables: Dict[int, Set[str]] = {}
+_commit_listeners: List[Callable[[Set[str]], None]] = []
+# Действия, отложенные до коммита открытых transaction(), по id соединения
+_pending_callbacks: Dict[int, List[Callable[[], None]]] = {}
+_version_listeners: List[Callable[[Dict[str, int]], None]] = []
+
+# Версии таблиц, общие для всех процессов (создается миграцией 4)
+_RECORD_VERSION = """
+    INSERT INTO change_versions (table_name, version, modified) VALUES (?, 1, ?)
+    ON CONFLICT (table_name) DO UPDATE
+    SET version = version + 1, modified = excluded.modified
+    RETURNING version
+"""
+
+logger = logging.getLogger(__name__)
+
+def configure_connection(conn: sqlite3.Connection):
+    """
+    Применяет настройки хранения из config к соединению.
+    """
+    conn.execute(f"PRAGMA busy_timeout={int(config.DB_BUSY_TIMEOUT)}")
+    conn.execute(f"PRAGMA journal_mode={config.DB_JOURNAL_MODE}")
+    conn.execute(f"PRAGMA synchronous={config.DB_SYNCHRONOUS}")
+    conn.execute(f"PRAGMA cache_size={int(config.DB_CACHE_SIZE)}")
+    conn.execute(f"PRAGMA mmap_size={int(config.DB_MMAP_SIZE)}")
+    conn.execute(f"PRAGMA temp_store={config.DB_TEMP_STORE}")
+
+def connect() -> sqlite3.Connection:
+    """
+    Открывает новое соединение с базой данных.
+    check_same_thread=False: соединение из пула может обслуживаться разными
+    потоками threadpool, но в каждый момент времени - только одним запросом.
+    При включенных метриках запросы соединения учитываются в profiling.sql_stats.
+    """
+    factory = InstrumentedConnection if config.SQL_METRICS else sqlite3.Connection
+    conn = sqlite3.connect(DATABASE_URL, check_same_thread=False, factory=factory)
+    conn.row_factory = sqlite3.Row  # Возвращаем строки как словари
+    configure_connection(conn)
+    return conn
+
+def get_pool() -> ConnectionPool:
+    """
+    Возвращает пул соединений, создавая его при первом обращении.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    connect,
+                    size=config.DB_POOL_SIZE,
+                    timeout=config.DB_POOL_TIMEOUT,
+                    health_check_interval=config.DB_POOL_HEALTH_CHECK_INTERVAL,
+                )
+    return _pool
+
+def get_writer() -> WriteQueue:
+    """
+    Возвращает очередь записи, создавая ее при первом обращении.
+    """
+    global _writer
+    if _writer is None:
+        with _pool_lock:
+            if _writer is None:
+                _writer = WriteQueue(connect)
+                _writer.start()
+    return _writer
+
+def run_write(fn, *args, **kwargs):
+    """
+    Выполняет fn(conn, *args, **kwargs) в потоке-писателе и возвращает результат.
+    Все изменения базы должны идти через эту функцию.
+    """
+    return get_writer().call(fn, *args, **kwargs)
+
+def close_db():
+    """
+    Останавливает поток-писатель и закрывает все соединения пула
+    (при остановке приложения или сбросе БД).
+    """
+    global _pool, _writer
+    with _pool_lock:
+        if _writer is not None:
+            _writer.close()
+            _writer = None
+        if _pool is not None:
+            _pool.close()
+            _pool = None
 
 @contextmanager
 def get_db() -> Generator[sqlite3.Connection, None, None]:
     """
     Контекстный менеджер для работы с базой данных.
-    Автоматически закрывает соединение после использования.
+    Берет соединение из пула и возвращает его обратно после использования.
     """
-    conn = sqlite3.connect(DATABASE_URL)
-    conn.row_factory = sqlite3.Row  # Возвращаем строки как словари
-    try:
+    with get_pool().connection() as conn:
         yield conn
+
+def on_commit(listener: Callable[[Set[str]], None]):
+    """
+    Регистрирует обработчик, который после каждого коммита transaction()
+    получает множество измененных таблиц (для сброса кэшей и т.п.).
+    """
+    _commit_listeners.append(listener)
+    return listener
+
+def on_versions(listener: Callable[[Dict[str, int]], None]):
+    """
+    Регистрирует обработчик, который после каждого коммита transaction()
+    получает новые версии измененных таблиц из change_versions.
+    """
+    _version_listeners.append(listener)
+    return listener
+
+def _record_versions(db: sqlite3.Connection, tables: Set[str]) -> Dict[str, int]:
+    # В той же транзакции, что и сами изменения: версия и данные видны
+    # другим процессам одновременно
+    now = time.time()
+    return {
+        table: db.execute(_RECORD_VERSION, (table, now)).fetchone()[0]
+        for table in sorted(tables)
+    }
+
+def after_commit(db: sqlite3.Connection, callback: Callable[[], None]):
+    """
+    Выполняет callback после коммита внешней transaction() на соединении db
+    (при откате - не выполняет). Вне транзакции выполняет сразу.
+    """
+    pending = _pending_callbacks.get(id(db))
+    if pending is None:
+        callback()
+    else:
+        pending.append(callback)
+
+def _notify_commit(tables: Set[str]):
+    for listener in _commit_listeners:
+        try:
+            listener(tables)
+        except Exception:
+            # Коммит уже состоялся - ошибка обработчика не должна его "отменять"
+            logger.exception("Commit listener %r failed", listener)
+
+@contextmanager
+def transaction(db: sqlite3.Connection, *tables: str) -> Generator[sqlite3.Connection, None, None]:
+    """
+    Единица работы: все изменения внутри блока фиксируются одним коммитом,
+    при исключении - откатываются целиком.
+    Вложенный блок присоединяется к уже открытой транзакции и сам не коммитит.
+    tables - таблицы, которые меняет блок; после коммита о них узнают
+    обработчики on_commit.
+    """
+    if db.in_transaction:
+        pending = _pending_tables.get(id(db))
+        if pending is not None:
+            pending.update(tables)
+        yield db
+        return
+    pending = _pending_tables[id(db)] = set(tables)
+    callbacks = _pending_callbacks[id(db)] = []
+    try:
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+            versions = _record_versions(db, pending) if pending else {}
+        except BaseException:
+            db.rollback()
+            raise
+        db.commit()
+    finally:
+        del _pending_tables[id(db)]
+        del _pending_callbacks[id(db)]
+    if pending:
+        _notify_commit(pending)
+        for listener in _version_listeners:
+            try:
+                listener(versions)
+            except Exception:
+                logger.exception("Version listener %r failed", listener)
+    for callback in callbacks:
+        try:
+            callback()
+        except Exception:
+            logger.exception("After-commit callback %r failed", callback)
+
+@contextmanager
+def read_transaction(db: sqlite3.Connection) -> Generator[sqlite3.Connection, None, None]:
+    """
+    Согласованное чтение: все запросы внутри блока видят один и тот же
+    снимок базы (в режиме WAL снимок фиксируется первым чтением), даже если
+    поток-писатель тем временем коммитит изменения.
+    Внутри уже открытой транзакции просто присоединяется к ней.
+    """
+    if db.in_transaction:
+        yield db
+        return
+    db.execute("BEGIN")
+    try:
+        yield db
     finally:
-        conn.close()
+        db.rollback()
+
+@contextmanager
+def _file_lock(path: str):
+    """
+    Межпроцессная блокировка на файле path (на время блока).
+    """
+    with open(path, "a+b") as f:
+        try:
+            import fcntl
+        except ImportError:  # Windows
+            import msvcrt
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK сдается примерно через 10 секунд - ждем дальше
+                    continue
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            return
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
 
 def init_db():
     """
-    Инициализация базы данных - создание таблиц, если они не существуют.
+    Инициализация базы данных - создание и обновление схемы миграциями.
+    Безопасно вызывать повторно: уже примененные миграции пропускаются.
+    Несколько воркеров, стартующих одновременно, применяют миграции по
+    очереди под файловой блокировкой: первый обновляет схему, остальные
+    находят ее уже актуальной. Заодно восстанавливаются индексы и триггеры,
+    оставшиеся снятыми после прерванного импорта.
     """
-    if not os.path.exists(DATABASE_URL):
+    from .importer import restore_interrupted_imports
+    from .migrations import migrate
+    with _file_lock(DATABASE_URL + ".lock"):
         with get_db() as conn:
-            cursor = conn.cursor()
-            
-            # Таблица сотрудников
-            cursor.execute("""
-            CREATE TABLE IF NOT EXISTS employees (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                position TEXT NOT NULL,
-                salary REAL NOT NULL,
-                hire_date TEXT NOT NULL,
-                phone TEXT NOT NULL,
-                email TEXT
-            )
-            """)
-            
-            # Таблица деталей
-            cursor.execute("""
-            CREATE TABLE IF NOT EXISTS parts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                price REAL NOT NULL,
-                quantity INTEGER NOT NULL,
-                supplier TEXT
-            )
-            """)
-            
-            # Таблица услуг
-            cursor.execute("""
-            CREATE TABLE IF NOT EXISTS services (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                price REAL NOT NULL,
-                duration REAL NOT NULL
-            )
-            """)
-            
-            # Таблица заказов
-            cursor.execute("""
-            CREATE TABLE IF NOT EXISTS orders (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                client_name TEXT NOT NULL,
-                car_model TEXT NOT NULL,
-                car_number TEXT NOT NULL,
-                date TEXT NOT NULL,
-                total_price REAL NOT NULL,
-                status TEXT NOT NULL CHECK(status IN ('в работе', 'завершен', 'отменен')),
-                employee_id INTEGER NOT NULL,
-                FOREIGN KEY (employee_id) REFERENCES employees (id)
-            )
-            """)
-            
-            # Таблица деталей заказа
-            cursor.execute("""
-            CREATE TABLE IF NOT EXISTS order_details (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                order_id INTEGER NOT NULL,
-                service_id INTEGER,
-                part_id INTEGER,
-                quantity INTEGER NOT NULL,
-                price REAL NOT NULL,
-                FOREIGN KEY (order_id) REFERENCES orders (id),
-                FOREIGN KEY (service_id) REFERENCES services (id),
-                FOREIGN KEY (part_id) REFERENCES parts (id)
-            )
-            """)
-            
-            # Таблица выплат зарплат
-            cursor.execute("""
-            CREATE TABLE IF NOT EXISTS salary_payments (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                employee_id INTEGER NOT NULL,
-                amount REAL NOT NULL,
-                date TEXT NOT NULL,
-                bonus REAL DEFAULT 0,
-                FOREIGN KEY (employee_id) REFERENCES employees (id)
-            )
-            """)
-            
-            # Таблица расходов
-            cursor.execute("""
-            CREATE TABLE IF NOT EXISTS expenses (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                amount REAL NOT NULL,
-                date TEXT NOT NULL,
-                category TEXT NOT NULL CHECK(category IN ('зарплаты', 'детали', 'аренда', 'другое'))
-            )
-            """)
-            
-            # Индексы для улучшения производительности
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_status ON orders(status)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_date ON orders(date)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_order_details_order_id ON order_details(order_id)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_salary_payments_employee_id ON salary_payments(employee_id)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_expenses_category ON expenses(category)")
-            
-            conn.commit()
+            version = migrate(conn)
+            restore_interrupted_imports(conn)
+            return version
 
 def reset_db():
     """
     Удаление и пересоздание базы данных (для тестирования)
     """
-    if os.path.exists(DATABASE_URL):
-        os.remove(DATABASE_URL)
+    close_db()
+    # Вместе с файлами журнала WAL: иначе новая база подхватит старые страницы
+    for path in (DATABASE_URL, DATABASE_URL + "-wal", DATABASE_URL + "-shm"):
+        if os.path.exists(path):
+            os.remove(path)
     init_db()
\ No newline at end of file
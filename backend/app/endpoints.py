@@ -1,12 +1,77 @@
-from fastapi import FastAPI, HTTPException, Depends, Query
+from fastapi import FastAPI, HTTPException, Depends, Header, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from .database import get_db, init_db
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from contextlib import asynccontextmanager
+import asyncio
+import io
+import logging
+import tempfile
+from .database import get_pool, get_writer, init_db, close_db
+from . import acrud, aio, config
+from .events import change_feed, stream_events
+from .pool import PoolTimeout
+from .stock import InsufficientStock
+from .totals import drift_monitor
+from .metrics import MetricsMiddleware, render as render_metrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from .cache import response_cache
+from .versions import conditional, stored_versions
+from .responses import trusted_rows
+from .export import EXPORTS, FORMATS, InvalidExport, stream_export, validate_export
+from .importer import IMPORTS, InvalidImport, import_csv
+from .pagination import InvalidCursor, NEXT_CURSOR_HEADER, decode_cursor, set_next_cursor
 from .models import *
-from .crud import *
-from typing import List, Optional
+from typing import List, Literal, Optional
 from datetime import date
 
-app = FastAPI(title="Авто Батя API")
+logger = logging.getLogger(__name__)
+
+async def poll_versions(interval: float):
+    """
+    Периодически перечитывает версии таблиц (в пуле потоков, не в цикле
+    событий): изменения других процессов сбрасывают кэш и ETag и доходят
+    до подписчиков /events.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await run_in_threadpool(stored_versions.sync)
+        except Exception:
+            logger.exception("Stored versions poll failed")
+
+async def verify_order_totals(interval: float):
+    """
+    Периодически сверяет суммы заказов с их строками; расхождения
+    попадают в лог и в метрику autobatya_order_totals_drift.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            drift_monitor.record(await acrud.check_order_totals())
+        except Exception:
+            logger.exception("Order totals check failed")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Создаем или обновляем схему БД до приема запросов
+    # (при нескольких воркерах - по очереди, под файловой блокировкой)
+    init_db()
+    tasks = []
+    await run_in_threadpool(stored_versions.sync)
+    if config.VERSIONS_POLL_INTERVAL > 0:
+        tasks.append(asyncio.create_task(poll_versions(config.VERSIONS_POLL_INTERVAL)))
+    if config.ORDER_TOTALS_VERIFY_INTERVAL > 0:
+        tasks.append(asyncio.create_task(verify_order_totals(config.ORDER_TOTALS_VERIFY_INTERVAL)))
+    yield
+    for task in tasks:
+        task.cancel()
+    # Завершаем потоки /events, затем останавливаем потоки чтения и закрываем соединения пула при остановке сервера
+    change_feed.close()
+    aio.shutdown()
+    close_db()
+    stored_versions.close()
+
+app = FastAPI(title="Авто Батя API", lifespan=lifespan)
 
 # Настройка CORS
 app.add_middleware(
@@ -15,254 +80,519 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag", "Last-Modified", "Content-Disposition"],
 )
+# Время ответов по маршрутам для /metrics
+app.add_middleware(MetricsMiddleware)
 
-# Инициализация БД при старте
-init_db()
+@app.exception_handler(PoolTimeout)
+async def pool_timeout_handler(request: Request, exc: PoolTimeout):
+    return JSONResponse(status_code=503, content={"detail": "Database is busy, try again later"})
 
-# Dependency
-def get_db_conn():
-    with get_db() as db:
-        yield db
+@app.exception_handler(InvalidCursor)
+async def invalid_cursor_handler(request: Request, exc: InvalidCursor):
+    return JSONResponse(status_code=400, content={"detail": str(exc)})
+
+@app.exception_handler(InvalidExport)
+async def invalid_export_handler(request: Request, exc: InvalidExport):
+    return JSONResponse(status_code=400, content={"detail": str(exc)})
+
+@app.exception_handler(InvalidImport)
+async def invalid_import_handler(request: Request, exc: InvalidImport):
+    return JSONResponse(status_code=400, content={"detail": str(exc)})
+
+@app.exception_handler(InsufficientStock)
+async def insufficient_stock_handler(request: Request, exc: InsufficientStock):
+    return JSONResponse(status_code=409, content={"detail": str(exc), "part_ids": exc.part_ids})
 
 # ========== Employees Endpoints ==========
 @app.post("/employees/", response_model=Employee)
-def create_employee_endpoint(employee: EmployeeCreate, db = Depends(get_db_conn)):
-    return create_employee(db, employee)
-
-@app.get("/employees/", response_model=List[Employee])
-def read_employees(skip: int = 0, limit: int = 100, db = Depends(get_db_conn)):
-    return get_employees(db, skip, limit)
+async def create_employee_endpoint(employee: EmployeeCreate):
+    return await acrud.create_employee(employee)
 
-@app.get("/employees/{employee_id}", response_model=Employee)
-def read_employee(employee_id: int, db = Depends(get_db_conn)):
-    employee = get_employee(db, employee_id)
+@app.get("/employees/", response_model=List[Employee],
+         dependencies=[Depends(conditional("employees"))])
+async def read_employees(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None
+):
+    if cursor is not None:
+        after = decode_cursor(cursor, ("id",))
+        rows = await acrud.get_employees_after(after[0] if after else None, limit)
+        return trusted_rows(response, set_next_cursor(response, rows, limit, ("id",)))
+    return trusted_rows(response, await acrud.get_employees(skip, limit))
+
+@app.get("/employees/{employee_id}", response_model=Employee,
+         dependencies=[Depends(conditional("employees"))])
+async def read_employee(employee_id: int):
+    employee = await acrud.get_employee(employee_id)
     if employee is None:
         raise HTTPException(status_code=404, detail="Employee not found")
     return employee
 
 @app.put("/employees/{employee_id}", response_model=Employee)
-def update_employee_endpoint(employee_id: int, employee: EmployeeCreate, db = Depends(get_db_conn)):
-    return update_employee(db, employee_id, employee)
+async def update_employee_endpoint(employee_id: int, employee: EmployeeCreate):
+    return await acrud.update_employee(employee_id, employee)
 
 @app.delete("/employees/{employee_id}")
-def delete_employee_endpoint(employee_id: int, db = Depends(get_db_conn)):
-    if not delete_employee(db, employee_id):
+async def delete_employee_endpoint(employee_id: int):
+    if not await acrud.delete_employee(employee_id):
         raise HTTPException(status_code=404, detail="Employee not found")
     return {"message": "Employee deleted"}
 
 # ========== Parts Endpoints ==========
 @app.post("/parts/", response_model=Part)
-def create_part_endpoint(part: PartCreate, db = Depends(get_db_conn)):
-    return create_part(db, part)
+async def create_part_endpoint(part: PartCreate):
+    return await acrud.create_part(part)
 
-@app.get("/parts/", response_model=List[Part])
-def read_parts(skip: int = 0, limit: int = 100, db = Depends(get_db_conn)):
-    return get_parts(db, skip, limit)
+@app.post("/parts/batch", response_model=List[Part])
+async def create_parts_endpoint(parts: List[PartCreate]):
+    return await acrud.create_parts(parts)
 
-@app.get("/parts/{part_id}", response_model=Part)
-def read_part(part_id: int, db = Depends(get_db_conn)):
-    part = get_part(db, part_id)
+@app.get("/parts/", response_model=List[Part],
+         dependencies=[Depends(conditional("parts"))])
+async def read_parts(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None
+):
+    if cursor is not None:
+        after = decode_cursor(cursor, ("id",))
+        rows = await acrud.get_parts_after(after[0] if after else None, limit)
+        return trusted_rows(response, set_next_cursor(response, rows, limit, ("id",)))
+    return trusted_rows(response, await acrud.get_parts(skip, limit))
+
+@app.get("/parts/{part_id}", response_model=Part,
+         dependencies=[Depends(conditional("parts"))])
+async def read_part(part_id: int):
+    part = await acrud.get_part(part_id)
     if part is None:
         raise HTTPException(status_code=404, detail="Part not found")
     return part
 
 @app.put("/parts/{part_id}", response_model=Part)
-def update_part_endpoint(part_id: int, part: PartCreate, db = Depends(get_db_conn)):
-    return update_part(db, part_id, part)
+async def update_part_endpoint(part_id: int, part: PartCreate):
+    return await acrud.update_part(part_id, part)
 
 @app.delete("/parts/{part_id}")
-def delete_part_endpoint(part_id: int, db = Depends(get_db_conn)):
-    if not delete_part(db, part_id):
+async def delete_part_endpoint(part_id: int):
+    if not await acrud.delete_part(part_id):
         raise HTTPException(status_code=404, detail="Part not found")
     return {"message": "Part deleted"}
 
 @app.get("/parts/check/{part_id}")
-def check_part_availability(part_id: int, quantity: int = Query(..., gt=0), db = Depends(get_db_conn)):
-    available = check_part_availability(db, part_id, quantity)
+async def check_part_availability_endpoint(part_id: int, quantity: int = Query(..., gt=0)):
+    available = await acrud.check_part_availability(part_id, quantity)
     return {"available": available}
 
+@app.post("/parts/check", response_model=StockCheck)
+async def check_parts_availability_endpoint(items: List[PartQuantity]):
+    # Только проверка: резервирует деталь создание строки заказа
+    return await acrud.check_parts_availability(items)
+
 # ========== Services Endpoints ==========
 @app.post("/services/", response_model=Service)
-def create_service_endpoint(service: ServiceCreate, db = Depends(get_db_conn)):
-    return create_service(db, service)
-
-@app.get("/services/", response_model=List[Service])
-def read_services(skip: int = 0, limit: int = 100, db = Depends(get_db_conn)):
-    return get_services(db, skip, limit)
-
-@app.get("/services/{service_id}", response_model=Service)
-def read_service(service_id: int, db = Depends(get_db_conn)):
-    service = get_service(db, service_id)
+async def create_service_endpoint(service: ServiceCreate):
+    return await acrud.create_service(service)
+
+@app.get("/services/", response_model=List[Service],
+         dependencies=[Depends(conditional("services"))])
+async def read_services(response: Response, skip: int = 0, limit: int = 100):
+    return trusted_rows(response, await acrud.get_services(skip, limit))
+
+@app.get("/services/{service_id}", response_model=Service,
+         dependencies=[Depends(conditional("services"))])
+async def read_service(service_id: int):
+    service = await acrud.get_service(service_id)
     if service is None:
         raise HTTPException(status_code=404, detail="Service not found")
     return service
 
 @app.put("/services/{service_id}", response_model=Service)
-def update_service_endpoint(service_id: int, service: ServiceCreate, db = Depends(get_db_conn)):
-    return update_service(db, service_id, service)
+async def update_service_endpoint(service_id: int, service: ServiceCreate):
+    return await acrud.update_service(service_id, service)
 
 @app.delete("/services/{service_id}")
-def delete_service_endpoint(service_id: int, db = Depends(get_db_conn)):
-    if not delete_service(db, service_id):
+async def delete_service_endpoint(service_id: int):
+    if not await acrud.delete_service(service_id):
         raise HTTPException(status_code=404, detail="Service not found")
     return {"message": "Service deleted"}
 
 # ========== Orders Endpoints ==========
 @app.post("/orders/", response_model=Order)
-def create_order_endpoint(order: OrderCreate, db = Depends(get_db_conn)):
-    return create_order(db, order)
-
-@app.get("/orders/", response_model=List[Order])
-def read_orders(
+async def create_order_endpoint(order: OrderCreate):
+    return await acrud.create_order(order)
+
+# details выводится только при ?include=details
+@app.get("/orders/", response_model=List[OrderWithDetails], response_model_exclude_unset=True,
+         dependencies=[Depends(conditional("orders", "order_details"))])
+async def read_orders(
+    response: Response,
     status: Optional[str] = None,
     skip: int = 0,
     limit: int = 100,
-    db = Depends(get_db_conn)
+    cursor: Optional[str] = None,
+    include: Optional[str] = None
 ):
-    return get_orders(db, skip, limit, status)
-
-@app.get("/orders/{order_id}", response_model=Order)
-def read_order(order_id: int, db = Depends(get_db_conn)):
-    order = get_order(db, order_id)
+    if cursor is not None:
+        after_date, after_id = decode_cursor(cursor, ("date", "id")) or (None, None)
+        rows = await acrud.get_orders_after(after_date, after_id, limit, status)
+        set_next_cursor(response, rows, limit, ("date", "id"))
+    else:
+        rows = await acrud.get_orders(skip, limit, status)
+    if include and "details" in include.split(","):
+        await acrud.attach_order_details(rows)
+    return trusted_rows(response, rows)
+
+@app.get("/orders/{order_id}", response_model=Order,
+         dependencies=[Depends(conditional("orders"))])
+async def read_order(order_id: int):
+    order = await acrud.get_order(order_id)
     if order is None:
         raise HTTPException(status_code=404, detail="Order not found")
     return order
 
 @app.put("/orders/{order_id}", response_model=Order)
-def update_order_endpoint(order_id: int, order: OrderCreate, db = Depends(get_db_conn)):
-    return update_order(db, order_id, order)
+async def update_order_endpoint(order_id: int, order: OrderCreate):
+    return await acrud.update_order(order_id, order)
 
 @app.delete("/orders/{order_id}")
-def delete_order_endpoint(order_id: int, db = Depends(get_db_conn)):
-    if not delete_order(db, order_id):
+async def delete_order_endpoint(order_id: int):
+    if not await acrud.delete_order(order_id):
         raise HTTPException(status_code=404, detail="Order not found")
     return {"message": "Order deleted"}
 
 @app.post("/orders/{order_id}/calculate", response_model=float)
-def calculate_order_total_endpoint(order_id: int, db = Depends(get_db_conn)):
-    return calculate_order_total(db, order_id)
+async def calculate_order_total_endpoint(order_id: int):
+    return await acrud.calculate_order_total(order_id)
+
+# ========== Vehicles Endpoints ==========
+VEHICLE_HISTORY_TABLES = ("orders", "order_details", "services", "parts")
+
+@app.get("/vehicles/{car_number}/history", response_model=List[VehicleHistoryOrder],
+         dependencies=[Depends(conditional(*VEHICLE_HISTORY_TABLES))])
+async def read_vehicle_history(
+    response: Response,
+    car_number: str,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100)
+):
+    # Регистр, пробелы и латиница вместо кириллицы в номере не важны
+    return trusted_rows(response, await acrud.get_vehicle_history(car_number, skip, limit))
 
 # ========== Order Details Endpoints ==========
 @app.post("/order_details/", response_model=OrderDetail)
-def create_order_detail_endpoint(order_detail: OrderDetailCreate, db = Depends(get_db_conn)):
-    return create_order_detail(db, order_detail)
-
-@app.get("/order_details/", response_model=List[OrderDetail])
-def read_order_details(order_id: int = Query(...), db = Depends(get_db_conn)):
-    return get_order_details(db, order_id)
-
-@app.get("/order_details/{order_detail_id}", response_model=OrderDetail)
-def read_order_detail(order_detail_id: int, db = Depends(get_db_conn)):
-    order_detail = get_order_detail(db, order_detail_id)
+async def create_order_detail_endpoint(order_detail: OrderDetailCreate):
+    return await acrud.create_order_detail(order_detail)
+
+@app.post("/order_details/batch", response_model=List[OrderDetail])
+async def create_order_details_endpoint(order_details: List[OrderDetailCreate]):
+    return await acrud.create_order_details(order_details)
+
+@app.get("/order_details/", response_model=List[OrderDetail],
+         dependencies=[Depends(conditional("order_details"))])
+async def read_order_details(response: Response, order_id: int = Query(...)):
+    return trusted_rows(response, await acrud.get_order_details(order_id))
+
+@app.get("/order_details/{order_detail_id}", response_model=OrderDetail,
+         dependencies=[Depends(conditional("order_details"))])
+async def read_order_detail(order_detail_id: int):
+    order_detail = await acrud.get_order_detail(order_detail_id)
     if order_detail is None:
         raise HTTPException(status_code=404, detail="Order detail not found")
     return order_detail
 
 @app.put("/order_details/{order_detail_id}", response_model=OrderDetail)
-def update_order_detail_endpoint(
+async def update_order_detail_endpoint(
     order_detail_id: int,
-    order_detail: OrderDetailCreate,
-    db = Depends(get_db_conn)
+    order_detail: OrderDetailCreate
 ):
-    return update_order_detail(db, order_detail_id, order_detail)
+    updated = await acrud.update_order_detail(order_detail_id, order_detail)
+    if updated is None:
+        raise HTTPException(status_code=404, detail="Order detail not found")
+    return updated
 
 @app.delete("/order_details/{order_detail_id}")
-def delete_order_detail_endpoint(order_detail_id: int, db = Depends(get_db_conn)):
-    if not delete_order_detail(db, order_detail_id):
+async def delete_order_detail_endpoint(order_detail_id: int):
+    if not await acrud.delete_order_detail(order_detail_id):
         raise HTTPException(status_code=404, detail="Order detail not found")
     return {"message": "Order detail deleted"}
 
 # ========== Finances Endpoints ==========
-@app.get("/stats/financial", response_model=FinancialStats)
-def get_financial_stats_endpoint(
+# Статистика читается из сводки daily_financials: ее пересборка (rollup.py)
+# меняет ответы так же, как запись в исходные таблицы
+FINANCIAL_TABLES = ("orders", "expenses", "salary_payments", "daily_financials")
+
+@app.get("/stats/financial", response_model=FinancialStats,
+         dependencies=[Depends(conditional(*FINANCIAL_TABLES))])
+async def get_financial_stats_endpoint(
     start_date: Optional[date] = None,
-    end_date: Optional[date] = None,
-    db = Depends(get_db_conn)
+    end_date: Optional[date] = None
 ):
-    return get_financial_stats(db, start_date, end_date)
-
-@app.get("/stats/employees", response_model=EmployeeStats)
-def get_employee_stats_endpoint(db = Depends(get_db_conn)):
-    return get_employee_stats(db)
-
-@app.get("/salary_payments/", response_model=List[SalaryPayment])
-def read_salary_payments(
+    return await response_cache.get_or_compute_async(
+        "/stats/financial",
+        {"start_date": start_date, "end_date": end_date},
+        FINANCIAL_TABLES,
+        lambda: acrud.get_financial_stats(start_date, end_date)
+    )
+
+# Таблица, из которой берется каждая метрика ряда
+TIMESERIES_TABLES = {"income": "orders", "expenses": "expenses", "salaries": "salary_payments"}
+
+@app.get("/stats/timeseries", response_model=List[TimeseriesPoint],
+         dependencies=[Depends(conditional(*FINANCIAL_TABLES))])
+async def get_financial_timeseries_endpoint(
+    response: Response,
+    metric: Literal["income", "expenses", "salaries"],
+    bucket: Literal["day", "week", "month"] = "month",
+    start: Optional[date] = None,
+    end: Optional[date] = None
+):
+    if start is not None and end is not None and start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    return trusted_rows(response, await response_cache.get_or_compute_async(
+        "/stats/timeseries",
+        {"metric": metric, "bucket": bucket, "start": start, "end": end},
+        (TIMESERIES_TABLES[metric], "daily_financials"),
+        lambda: acrud.get_financial_timeseries(metric, bucket, start, end)
+    ))
+
+@app.get("/stats/employees", response_model=EmployeeStats,
+         dependencies=[Depends(conditional("employees"))])
+async def get_employee_stats_endpoint():
+    return await response_cache.get_or_compute_async(
+        "/stats/employees", {}, ("employees",),
+        lambda: acrud.get_employee_stats()
+    )
+
+# ========== Search Endpoints ==========
+SEARCH_SOURCE_TABLES = ("orders", "parts", "services")
+
+@app.get("/search", response_model=SearchResults,
+         dependencies=[Depends(conditional(*SEARCH_SOURCE_TABLES))])
+async def search_endpoint(
+    response: Response,
+    q: str = Query(..., max_length=200),
+    limit: int = Query(20, ge=1, le=100)
+):
+    # Каждое слово q ищется по началу: "ива а12" - Иванов с номером А123..
+    return trusted_rows(response, await response_cache.get_or_compute_async(
+        "/search", {"q": q, "limit": limit}, SEARCH_SOURCE_TABLES,
+        lambda: acrud.search(q, limit)
+    ))
+
+# ========== Dashboard Endpoints ==========
+DASHBOARD_TABLES = ("orders", "expenses", "salary_payments", "daily_financials", "employees", "parts")
+
+@app.get("/dashboard/snapshot", response_model=DashboardSnapshot,
+         dependencies=[Depends(conditional(*DASHBOARD_TABLES))])
+async def get_dashboard_snapshot_endpoint(
+    response: Response,
+    min_quantity: int = 5,
+    recent_limit: int = Query(5, ge=1, le=100)
+):
+    # Кэшируется целиком: снимок сбрасывается при записи в любую из таблиц
+    return trusted_rows(response, await response_cache.get_or_compute_async(
+        "/dashboard/snapshot",
+        {"min_quantity": min_quantity, "recent_limit": recent_limit},
+        DASHBOARD_TABLES,
+        lambda: acrud.get_dashboard_snapshot(min_quantity, recent_limit)
+    ))
+
+@app.get("/salary_payments/", response_model=List[SalaryPayment],
+         dependencies=[Depends(conditional("salary_payments"))])
+async def read_salary_payments(
+    response: Response,
     employee_id: Optional[int] = None,
     skip: int = 0,
     limit: int = 100,
-    db = Depends(get_db_conn)
+    cursor: Optional[str] = None
 ):
-    return get_salary_payments(db, employee_id, skip, limit)
+    if cursor is not None:
+        after = decode_cursor(cursor, ("id",))
+        rows = await acrud.get_salary_payments_after(employee_id, after[0] if after else None, limit)
+        return trusted_rows(response, set_next_cursor(response, rows, limit, ("id",)))
+    return trusted_rows(response, await acrud.get_salary_payments(employee_id, skip, limit))
 
 @app.post("/salary_payments/", response_model=SalaryPayment)
-def create_salary_payment_endpoint(salary_payment: SalaryPaymentCreate, db = Depends(get_db_conn)):
-    return create_salary_payment(db, salary_payment)
+async def create_salary_payment_endpoint(salary_payment: SalaryPaymentCreate):
+    return await acrud.create_salary_payment(salary_payment)
 
-@app.get("/salary_payments/{salary_payment_id}", response_model=SalaryPayment)
-def read_salary_payment(salary_payment_id: int, db = Depends(get_db_conn)):
-    salary_payment = get_salary_payment(db, salary_payment_id)
+@app.get("/salary_payments/{salary_payment_id}", response_model=SalaryPayment,
+         dependencies=[Depends(conditional("salary_payments"))])
+async def read_salary_payment(salary_payment_id: int):
+    salary_payment = await acrud.get_salary_payment(salary_payment_id)
     if salary_payment is None:
         raise HTTPException(status_code=404, detail="Salary payment not found")
     return salary_payment
 
 @app.put("/salary_payments/{salary_payment_id}", response_model=SalaryPayment)
-def update_salary_payment_endpoint(
+async def update_salary_payment_endpoint(
     salary_payment_id: int,
-    salary_payment: SalaryPaymentCreate,
-    db = Depends(get_db_conn)
+    salary_payment: SalaryPaymentCreate
 ):
-    return update_salary_payment(db, salary_payment_id, salary_payment)
+    return await acrud.update_salary_payment(salary_payment_id, salary_payment)
 
 @app.delete("/salary_payments/{salary_payment_id}")
-def delete_salary_payment_endpoint(salary_payment_id: int, db = Depends(get_db_conn)):
-    if not delete_salary_payment(db, salary_payment_id):
+async def delete_salary_payment_endpoint(salary_payment_id: int):
+    if not await acrud.delete_salary_payment(salary_payment_id):
         raise HTTPException(status_code=404, detail="Salary payment not found")
     return {"message": "Salary payment deleted"}
 
-@app.get("/expenses/", response_model=List[Expense])
-def read_expenses(
+@app.get("/expenses/", response_model=List[Expense],
+         dependencies=[Depends(conditional("expenses"))])
+async def read_expenses(
+    response: Response,
     category: Optional[str] = None,
     skip: int = 0,
     limit: int = 100,
-    db = Depends(get_db_conn)
+    cursor: Optional[str] = None
 ):
-    return get_expenses(db, category, skip, limit)
+    if cursor is not None:
+        after = decode_cursor(cursor, ("id",))
+        rows = await acrud.get_expenses_after(category, after[0] if after else None, limit)
+        return trusted_rows(response, set_next_cursor(response, rows, limit, ("id",)))
+    return trusted_rows(response, await acrud.get_expenses(category, skip, limit))
 
 @app.post("/expenses/", response_model=Expense)
-def create_expense_endpoint(expense: ExpenseCreate, db = Depends(get_db_conn)):
-    return create_expense(db, expense)
+async def create_expense_endpoint(expense: ExpenseCreate):
+    return await acrud.create_expense(expense)
 
-@app.get("/expenses/{expense_id}", response_model=Expense)
-def read_expense(expense_id: int, db = Depends(get_db_conn)):
-    expense = get_expense(db, expense_id)
+@app.post("/expenses/batch", response_model=List[Expense])
+async def create_expenses_endpoint(expenses: List[ExpenseCreate]):
+    return await acrud.create_expenses(expenses)
+
+@app.get("/expenses/{expense_id}", response_model=Expense,
+         dependencies=[Depends(conditional("expenses"))])
+async def read_expense(expense_id: int):
+    expense = await acrud.get_expense(expense_id)
     if expense is None:
         raise HTTPException(status_code=404, detail="Expense not found")
     return expense
 
 @app.put("/expenses/{expense_id}", response_model=Expense)
-def update_expense_endpoint(expense_id: int, expense: ExpenseCreate, db = Depends(get_db_conn)):
-    return update_expense(db, expense_id, expense)
+async def update_expense_endpoint(expense_id: int, expense: ExpenseCreate):
+    return await acrud.update_expense(expense_id, expense)
 
 @app.delete("/expenses/{expense_id}")
-def delete_expense_endpoint(expense_id: int, db = Depends(get_db_conn)):
-    if not delete_expense(db, expense_id):
+async def delete_expense_endpoint(expense_id: int):
+    if not await acrud.delete_expense(expense_id):
         raise HTTPException(status_code=404, detail="Expense not found")
     return {"message": "Expense deleted"}
 
 # ========== Reports Endpoints ==========
-@app.get("/reports/parts", response_model=List[PartsReportItem])
-def get_parts_report_endpoint(
-    min_quantity: int = Query(5, gt=0),
-    db = Depends(get_db_conn)
+@app.get("/reports/parts", response_model=List[PartsReportItem],
+         dependencies=[Depends(conditional("parts"))])
+async def get_parts_report_endpoint(
+    response: Response,
+    min_quantity: int = Query(5, gt=0)
 ):
-    return get_parts_report(db, min_quantity)
-
-@app.get("/reports/orders", response_model=List[OrdersReportItem])
-def get_orders_report_endpoint(
+    return trusted_rows(response, await response_cache.get_or_compute_async(
+        "/reports/parts", {"min_quantity": min_quantity}, ("parts",),
+        lambda: acrud.get_parts_report(min_quantity)
+    ))
+
+@app.get("/reports/orders", response_model=List[OrdersReportItem],
+         dependencies=[Depends(conditional("orders", "employees"))])
+async def get_orders_report_endpoint(
+    response: Response,
     status: str = 'завершен',
     start_date: Optional[date] = None,
+    end_date: Optional[date] = None
+):
+    return trusted_rows(response, await response_cache.get_or_compute_async(
+        "/reports/orders",
+        {"status": status, "start_date": start_date, "end_date": end_date},
+        ("orders", "employees"),
+        lambda: acrud.get_orders_report(status, start_date, end_date)
+    ))
+
+# ========== Export Endpoints ==========
+# Полная выгрузка таблицы потоком, без ограничения limit
+@app.get("/export/{table}")
+async def export_table_endpoint(
+    table: str,
+    format: str = "csv",
+    start_date: Optional[date] = None,
     end_date: Optional[date] = None,
-    db = Depends(get_db_conn)
+    status: Optional[StatusEnum] = None,
+    category: Optional[CategoryEnum] = None,
+    employee_id: Optional[int] = None
+):
+    if table not in EXPORTS:
+        raise HTTPException(status_code=404, detail="Export not found")
+    filters = {
+        name: getattr(value, "value", value)
+        for name, value in (("status", status), ("category", category), ("employee_id", employee_id))
+        if value is not None
+    }
+    spec = validate_export(table, format, filters)
+    return StreamingResponse(
+        stream_export(
+            spec, format,
+            start_date.isoformat() if start_date else None,
+            end_date.isoformat() if end_date else None,
+            filters
+        ),
+        media_type=FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{table}.{format}"'}
+    )
+
+# ========== Import Endpoints ==========
+# Тело запроса - CSV-файл (Content-Type: text/csv) с заголовком из имен полей модели.
+# Снятие индексов на время загрузки (defer_indexes) - только в командной строке:
+# без индексов и триггеров сводки работающая система отвечает медленно и неверно
+@app.post("/import/{table}", response_model=ImportReport)
+async def import_table_endpoint(
+    table: str,
+    request: Request,
+    batch_size: int = Query(10000, gt=0)
+):
+    if table not in IMPORTS:
+        raise HTTPException(status_code=404, detail="Import not found")
+    if "defer_indexes" in request.query_params:
+        raise HTTPException(
+            status_code=400,
+            detail="defer_indexes is only available in the command line importer"
+        )
+    # Файл копится во временном файле: в памяти держится не больше 1 МиБ
+    spool = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    async for chunk in request.stream():
+        spool.write(chunk)
+    spool.seek(0)
+    with io.TextIOWrapper(spool, encoding="utf-8-sig", newline="") as lines:
+        return await run_in_threadpool(import_csv, lines, table, batch_size)
+
+# ========== Events Endpoints ==========
+# Лента изменений заказов и деталей (Server-Sent Events), см. events.py
+@app.get("/events")
+async def events_endpoint(
+    tables: Optional[str] = None,
+    last_event_id: Optional[str] = Header(None)
 ):
-    return get_orders_report(db, status, start_date, end_date)
\ No newline at end of file
+    subscription = change_feed.subscribe(
+        frozenset(tables.split(",")) if tables else frozenset(),
+        last_event_id
+    )
+    return StreamingResponse(
+        stream_events(subscription, config.EVENTS_HEARTBEAT),
+        media_type="text/event-stream",
+        # Прокси (nginx) не должен буферизовать поток
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# ========== Monitoring Endpoints ==========
+@app.get("/stats/pool", response_model=PoolStats)
+async def get_pool_stats_endpoint():
+    return {**get_pool().stats(), "write_queue": get_writer().stats()}
+
+@app.get("/stats/cache", response_model=CacheStats)
+async def get_cache_stats_endpoint():
+    return response_cache.stats()
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics_endpoint():
+    return Response(content=render_metrics(), media_type=METRICS_CONTENT_TYPE)
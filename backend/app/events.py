@@ -0,0 +1,226 @@
+"""
+Лента изменений данных для клиентов (Server-Sent Events, GET /events).
+
+Функции записи в crud.py публикуют события после коммита транзакции
+(см. database.after_commit): создание, изменение и удаление заказов и
+деталей, в том числе списание деталей со склада. Каждое событие кодируется
+в кадр SSE один раз и раздается подписчикам через их asyncio-очереди:
+поток-писатель передает его в цикл событий одним call_soon_threadsafe,
+поэтому простаивающий подписчик - это только ожидающая корутина.
+
+Клиент, переподключившийся с заголовком Last-Event-ID, получает
+пропущенные события из хранимого хвоста ленты. Если хвост уже не содержит
+нужных событий (или очередь подписчика переполнилась), приходит событие
+resync - клиенту нужно перечитать списки целиком. Id события - "метка-номер":
+номера свои у каждого процесса, поэтому id, выданный другим воркером или
+до перезапуска сервера, тоже приводит к resync.
+"""
+import asyncio
+import json
+import threading
+import uuid
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, FrozenSet, List, Optional, Tuple
+from . import config
+from .database import after_commit
+from .responses import orjson
+
+# Таблица, к которой относится событие resync (касается всех таблиц)
+ALL_TABLES = "*"
+
+# (таблица, кадр SSE)
+Item = Tuple[str, bytes]
+
+def _dumps(data: dict) -> str:
+    if orjson is not None:
+        return orjson.dumps(data).decode("utf-8")
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+def encode_event(event_id: Optional[str], data: dict) -> bytes:
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines.append(f"data: {_dumps(data)}")
+    return ("\n".join(lines) + "\n\n").encode("utf-8")
+
+RESYNC: Item = (ALL_TABLES, encode_event(None, {"action": "resync"}))
+# Комментарий SSE: не дает прокси закрыть простаивающее соединение
+HEARTBEAT = b": ping\n\n"
+
+class Subscription:
+    """
+    Подписчик ленты: очередь кадров в цикле событий его запроса.
+    tables - таблицы, события которых нужны (пустое множество - все).
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, tables: FrozenSet[str], maxsize: int):
+        self.loop = loop
+        self.tables = tables
+        self.queue: "asyncio.Queue[Optional[Item]]" = asyncio.Queue(maxsize)
+
+    def put(self, item: Optional[Item]):
+        """Вызывается только в цикле событий подписчика."""
+        if item is not None and self.tables and item[0] not in self.tables and item[0] != ALL_TABLES:
+            return
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            # Клиент не успевает читать: сбрасываем накопленное, пусть перечитает списки
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC if item is not None else None)
+
+def _fan_out(subscriptions: List[Subscription], item: Optional[Item]):
+    for subscription in subscriptions:
+        subscription.put(item)
+
+class ChangeFeed:
+    def __init__(self, backlog: int = 1000, queue_size: int = 1000):
+        self._queue_size = queue_size
+        self._backlog: Deque[Tuple[int, Item]] = deque(maxlen=backlog)
+        self._subscriptions: Dict[asyncio.AbstractEventLoop, List[Subscription]] = {}
+        # Метка процесса в id событий
+        self.epoch = uuid.uuid4().hex[:8]
+        self._last_id = 0
+        self._published = 0
+        self._lock = threading.Lock()
+
+    @property
+    def has_subscribers(self) -> bool:
+        return bool(self._subscriptions)
+
+    def publish(self, table: str, action: str, id: Optional[int] = None,
+                row: Optional[dict] = None):
+        """
+        Публикует событие (вызывается из любого потока, обычно из писателя).
+        action resync без id - таблица изменилась целиком (массовый импорт).
+        """
+        with self._lock:
+            self._last_id += 1
+            self._published += 1
+            data = {"table": table, "action": action}
+            if id is not None:
+                data["id"] = id
+            if row is not None:
+                data["row"] = row
+            item = (table, encode_event(f"{self.epoch}-{self._last_id}", data))
+            self._backlog.append((self._last_id, item))
+            targets = [(loop, list(subs)) for loop, subs in self._subscriptions.items()]
+        for loop, subscriptions in targets:
+            try:
+                loop.call_soon_threadsafe(_fan_out, subscriptions, item)
+            except RuntimeError:
+                # Цикл событий уже закрыт
+                pass
+
+    def mark_gap(self):
+        """
+        Отмечает изменения, которые не публиковались (подписчиков не было):
+        клиент, переподключившийся с прежним Last-Event-ID, получит resync.
+        """
+        with self._lock:
+            self._last_id += 1
+            self._backlog.clear()
+
+    def _parse_event_id(self, event_id: str) -> Optional[int]:
+        """
+        Номер события из Last-Event-ID; None - id чужого процесса или не наш формат.
+        """
+        epoch, _, number = event_id.strip().partition("-")
+        if epoch != self.epoch or not number.isdigit():
+            return None
+        return int(number)
+
+    def subscribe(self, tables: FrozenSet[str] = frozenset(),
+                  last_event_id: Optional[str] = None) -> Subscription:
+        """
+        Регистрирует подписчика в текущем цикле событий. При last_event_id
+        очередь сразу заполняется пропущенными событиями (или resync).
+        Регистрация и снимок хвоста - под одной блокировкой, поэтому
+        события не теряются и не повторяются.
+        """
+        loop = asyncio.get_running_loop()
+        subscription = Subscription(loop, tables, self._queue_size)
+        last_seen = self._parse_event_id(last_event_id) if last_event_id is not None else None
+        with self._lock:
+            if last_event_id is not None and last_seen is None:
+                subscription.put(RESYNC)
+            elif last_seen is not None and last_seen != self._last_id:
+                oldest = self._backlog[0][0] if self._backlog else self._last_id + 1
+                if last_seen > self._last_id or last_seen + 1 < oldest:
+                    subscription.put(RESYNC)
+                else:
+                    for event_id, item in self._backlog:
+                        if event_id > last_seen:
+                            subscription.put(item)
+            self._subscriptions.setdefault(loop, []).append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.loop)
+            if subscriptions is not None and subscription in subscriptions:
+                subscriptions.remove(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.loop]
+
+    def close(self):
+        """
+        Завершает потоки всех подписчиков (при остановке сервера).
+        """
+        with self._lock:
+            targets = [(loop, list(subs)) for loop, subs in self._subscriptions.items()]
+        for loop, subscriptions in targets:
+            try:
+                loop.call_soon_threadsafe(_fan_out, subscriptions, None)
+            except RuntimeError:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "subscribers": sum(len(subs) for subs in self._subscriptions.values()),
+                "published": self._published,
+                "last_event_id": self._last_id,
+            }
+
+change_feed = ChangeFeed(backlog=config.EVENTS_BACKLOG, queue_size=config.EVENTS_QUEUE_SIZE)
+
+def publish_rows(db, table: str, action: str, ids: List[int], columns: str = "*"):
+    """
+    Публикует после коммита текущей транзакции строки table с данными ids
+    (колонки columns читаются сейчас, внутри транзакции). Без подписчиков
+    только отмечает пропуск в ленте.
+    """
+    if not ids:
+        return
+    if not change_feed.has_subscribers:
+        change_feed.mark_gap()
+        return
+    if action == "deleted":
+        events = [(row_id, None) for row_id in ids]
+    else:
+        placeholders = ", ".join("?" * len(ids))
+        rows = db.execute(f"SELECT {columns} FROM {table} WHERE id IN ({placeholders})", list(ids)).fetchall()
+        events = [(row["id"], dict(row)) for row in rows]
+
+    def publish():
+        for row_id, row in events:
+            change_feed.publish(table, action, row_id, row)
+    after_commit(db, publish)
+
+async def stream_events(subscription: Subscription, heartbeat: float) -> AsyncIterator[bytes]:
+    """
+    Тело ответа /events: кадры событий, между ними - пинг раз в heartbeat секунд.
+    """
+    try:
+        yield f"retry: {int(config.EVENTS_RETRY_MS)}\n\n".encode("utf-8")
+        while True:
+            try:
+                item = await asyncio.wait_for(subscription.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield HEARTBEAT
+                continue
+            if item is None:
+                return
+            yield item[1]
+    finally:
+        change_feed.unsubscribe(subscription)
@@ -0,0 +1,110 @@
+"""
+Потоковая выгрузка таблиц в CSV и NDJSON.
+
+Строки читаются из курсора пачками (aio.iter_read) и сразу кодируются
+в ответ, поэтому память не зависит от размера выгрузки.
+"""
+import csv
+import io
+import json
+from typing import AsyncIterator, Dict, List, NamedTuple, Optional, Tuple
+from . import aio, config
+from .responses import orjson
+
+class ExportSpec(NamedTuple):
+    table: str
+    columns: Tuple[str, ...]
+    # Фильтры по равенству, допустимые для таблицы (кроме периода по date)
+    filters: Tuple[str, ...]
+
+EXPORTS: Dict[str, ExportSpec] = {
+    "orders": ExportSpec(
+        "orders",
+        ("id", "client_name", "car_model", "car_number", "date", "total_price", "status", "employee_id"),
+        ("status", "employee_id"),
+    ),
+    "expenses": ExportSpec(
+        "expenses",
+        ("id", "name", "amount", "date", "category"),
+        ("category",),
+    ),
+    "salary_payments": ExportSpec(
+        "salary_payments",
+        ("id", "employee_id", "amount", "bonus", "date"),
+        ("employee_id",),
+    ),
+}
+
+FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+class InvalidExport(ValueError):
+    """Неизвестная таблица, формат или фильтр выгрузки."""
+
+def open_export_cursor(db, spec: ExportSpec, start_date: Optional[str] = None,
+                       end_date: Optional[str] = None, filters: Optional[dict] = None):
+    """
+    Открывает курсор выгрузки. Сортировка по (date, id) идет по индексу
+    с ведущим date, поэтому SQLite не собирает весь результат для сортировки
+    (в expenses и salary_payments по id досортировываются строки одного дня).
+    """
+    conditions, params = [], []
+    if start_date is not None:
+        conditions.append("date >= ?")
+        params.append(start_date)
+    if end_date is not None:
+        conditions.append("date <= ?")
+        params.append(end_date)
+    for name, value in (filters or {}).items():
+        conditions.append(f"{name} = ?")
+        params.append(value)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return db.execute(
+        f"SELECT {', '.join(spec.columns)} FROM {spec.table} {where} ORDER BY date, id",
+        params
+    )
+
+def _encode_csv(rows: List, header: Optional[Tuple[str, ...]] = None) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header is not None:
+        writer.writerow(header)
+    writer.writerows(rows)
+    return buffer.getvalue().encode("utf-8")
+
+def _encode_ndjson(rows: List, columns: Tuple[str, ...]) -> bytes:
+    if orjson is not None:
+        return b"".join(orjson.dumps(dict(zip(columns, row))) + b"\n" for row in rows)
+    return "".join(
+        json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n" for row in rows
+    ).encode("utf-8")
+
+def validate_export(table: str, format: str, filters: dict) -> ExportSpec:
+    spec = EXPORTS.get(table)
+    if spec is None:
+        raise InvalidExport(f"Unknown export table: {table}")
+    if format not in FORMATS:
+        raise InvalidExport(f"Unknown export format: {format}")
+    unsupported = sorted(set(filters) - set(spec.filters))
+    if unsupported:
+        raise InvalidExport(f"Filters not supported for {table}: {', '.join(unsupported)}")
+    return spec
+
+async def stream_export(spec: ExportSpec, format: str, start_date: Optional[str] = None,
+                        end_date: Optional[str] = None, filters: Optional[dict] = None) -> AsyncIterator[bytes]:
+    """
+    Тело ответа выгрузки: по одному куску байтов на пачку строк.
+    """
+    if format == "csv":
+        # BOM - чтобы Excel открыл файл в UTF-8, и строка заголовков
+        yield "\ufeff".encode("utf-8") + _encode_csv([], spec.columns)
+    async for rows in aio.iter_read(
+        open_export_cursor, spec, start_date, end_date, filters,
+        chunk_size=config.EXPORT_CHUNK_SIZE
+    ):
+        if format == "csv":
+            yield _encode_csv(rows)
+        else:
+            yield _encode_ndjson(rows, spec.columns)
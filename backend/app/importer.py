@@ -0,0 +1,265 @@
+"""
+Массовый импорт исторических данных из CSV.
+
+Файл читается потоком, строки проверяются моделями из models.py пачками
+и вставляются одним executemany на пачку - каждая пачка это одна
+транзакция, поэтому обычные записи API успевают выполняться между
+пачками. Загрузка идет через отдельное соединение в synchronous=OFF с
+увеличенным кэшем: соединение писателя и надежность записей API не
+затрагиваются.
+
+С defer_indexes (только в командной строке, там включен по умолчанию)
+вторичные индексы таблицы, триггеры сводки daily_financials и поискового
+индекса снимаются до загрузки и восстанавливаются после нее (сводка и
+поисковый индекс пересчитываются целиком) - так быстрее для больших
+файлов, но на время импорта запросы к таблице идут без индексов. Режим
+для разовой загрузки, а не для работающей системы. Снятые индексы и
+триггеры записываются в deferred_import: если импорт прервется, их
+восстановит следующий init_db().
+
+Импорт из каталога backend:
+
+    python -m app.importer orders orders.csv
+    python -m app.importer expenses expenses.csv --keep-indexes
+"""
+import argparse
+import csv
+import io
+import sys
+import logging
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Tuple, Type
+from pydantic import BaseModel, ValidationError
+from . import config
+from .database import connect, transaction
+from .events import change_feed
+from .models import (
+    EmployeeCreate, PartCreate, ServiceCreate, OrderCreate,
+    SalaryPaymentCreate, ExpenseCreate,
+)
+from .rollup import rebuild_rollup
+from .search import SEARCH_TABLES, rebuild_search
+from .vehicles import normalize_car_number
+
+# Сколько ошибок проверки сохраняется в отчете
+MAX_REPORTED_ERRORS = 100
+
+logger = logging.getLogger(__name__)
+
+class ImportSpec(NamedTuple):
+    table: str
+    model: Type[BaseModel]
+    columns: Tuple[str, ...]
+    # Вычисляемые колонки: (колонка, поле модели, функция от значения поля)
+    derived: Tuple[Tuple[str, str, Callable], ...] = ()
+
+    @property
+    def insert_columns(self) -> Tuple[str, ...]:
+        return self.columns + tuple(column for column, _, _ in self.derived)
+
+IMPORTS: Dict[str, ImportSpec] = {
+    "employees": ImportSpec(
+        "employees", EmployeeCreate,
+        ("name", "position", "salary", "hire_date", "phone", "email"),
+    ),
+    "parts": ImportSpec("parts", PartCreate, ("name", "price", "quantity", "supplier")),
+    "services": ImportSpec("services", ServiceCreate, ("name", "price", "duration")),
+    "orders": ImportSpec(
+        "orders", OrderCreate,
+        ("client_name", "car_model", "car_number", "date", "total_price", "status", "employee_id"),
+        (("car_number_norm", "car_number", normalize_car_number),),
+    ),
+    "salary_payments": ImportSpec(
+        "salary_payments", SalaryPaymentCreate, ("employee_id", "amount", "date", "bonus"),
+    ),
+    "expenses": ImportSpec("expenses", ExpenseCreate, ("name", "amount", "date", "category")),
+}
+
+class InvalidImport(ValueError):
+    """Неизвестная таблица или в файле нет обязательных колонок."""
+
+def _required_fields(model: Type[BaseModel]) -> List[str]:
+    fields = getattr(model, "model_fields", None)
+    if fields is not None:
+        return [name for name, field in fields.items() if field.is_required()]
+    return [name for name, field in model.__fields__.items() if field.required]
+
+def iter_batches(lines: Iterable[str], spec: ImportSpec,
+                 batch_size: int) -> Iterator[Tuple[List[tuple], List[str]]]:
+    """
+    Читает CSV и отдает пачки (проверенные строки для вставки, ошибки).
+    Пустые ячейки считаются незаполненными: для них действуют значения
+    по умолчанию из модели. Колонка id и лишние колонки игнорируются.
+    """
+    reader = csv.DictReader(lines)
+    missing = sorted(set(_required_fields(spec.model)) - set(reader.fieldnames or ()))
+    if missing:
+        raise InvalidImport(f"Missing columns for {spec.table}: {', '.join(missing)}")
+    rows: List[tuple] = []
+    errors: List[str] = []
+    for record in reader:
+        values = {key: value for key, value in record.items() if key and value not in ("", None)}
+        try:
+            item = spec.model(**values)
+        except ValidationError as exc:
+            # Номер строки файла с учетом заголовка
+            error = exc.errors()[0]
+            field = ".".join(str(part) for part in error["loc"]) or "row"
+            errors.append(f"line {reader.line_num}: {field}: {error['msg']}")
+        else:
+            rows.append(
+                tuple(getattr(item, column) for column in spec.columns)
+                + tuple(derive(getattr(item, field)) for _, field, derive in spec.derived)
+            )
+        if len(rows) >= batch_size:
+            yield rows, errors
+            rows, errors = [], []
+    if rows or errors:
+        yield rows, errors
+
+def load_batch(db, spec: ImportSpec, rows: List[tuple]) -> int:
+    columns = spec.insert_columns
+    placeholders = ", ".join("?" * len(columns))
+    with transaction(db, spec.table):
+        db.executemany(
+            f"INSERT INTO {spec.table} ({', '.join(columns)}) VALUES ({placeholders})",
+            rows
+        )
+    return len(rows)
+
+def _tune_for_load(db):
+    db.execute("PRAGMA synchronous=OFF")
+    db.execute(f"PRAGMA cache_size={int(config.IMPORT_CACHE_SIZE)}")
+
+def _drop_deferred(db, table: str):
+    """
+    Снимает вторичные индексы таблицы, триггеры сводки и поискового индекса.
+    Их SQL сохраняется в deferred_import в той же транзакции.
+    """
+    rows = db.execute(
+        """
+        SELECT type, name, sql FROM sqlite_master
+        WHERE tbl_name = ? AND sql IS NOT NULL
+          AND (type = 'index' OR (type = 'trigger' AND (
+              name LIKE 'trg_daily_financials_%' OR name LIKE 'trg_' || tbl_name || '_fts_%')))
+        """,
+        (table,)
+    ).fetchall()
+    with transaction(db):
+        for kind, name, sql in rows:
+            db.execute(
+                "INSERT OR IGNORE INTO deferred_import (name, table_name, sql) VALUES (?, ?, ?)",
+                (name, table, sql)
+            )
+            db.execute(f"DROP {kind.upper()} IF EXISTS {name}")
+
+def _restore_deferred(db, table: str):
+    """
+    Восстанавливает снятое _drop_deferred по записям deferred_import.
+    Повторный вызов ничего не меняет: уже существующие индексы и триггеры
+    пропускаются, записи удаляются вместе с восстановлением.
+    """
+    rows = db.execute(
+        "SELECT name, sql FROM deferred_import WHERE table_name = ?", (table,)
+    ).fetchall()
+    if not rows:
+        return
+    with transaction(db, table, "daily_financials"):
+        for name, sql in rows:
+            exists = db.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = ?", (name,)
+            ).fetchone()
+            if exists is None:
+                db.execute(sql)
+        if any("daily_financials" in sql for _, sql in rows):
+            rebuild_rollup(db)
+        if table in SEARCH_TABLES:
+            rebuild_search(db, table)
+        db.execute("DELETE FROM deferred_import WHERE table_name = ?", (table,))
+
+def restore_interrupted_imports(db):
+    """
+    Восстанавливает индексы и триггеры, оставшиеся снятыми после
+    прерванного импорта (вызывается из init_db).
+    """
+    tables = [row[0] for row in db.execute(
+        "SELECT DISTINCT table_name FROM deferred_import"
+    ).fetchall()]
+    for table in tables:
+        logger.warning("Restoring indexes and triggers deferred by an interrupted import of %s", table)
+        _restore_deferred(db, table)
+
+def import_csv(lines: Iterable[str], table: str, batch_size: int = 10000,
+               defer_indexes: bool = False) -> dict:
+    """
+    Импортирует CSV в таблицу table и возвращает отчет: прочитано,
+    вставлено, отклонено строк, первые ошибки, время и строк в секунду.
+    Вызывается из обычного потока: пачки пишутся через отдельное
+    соединение, записи API тем временем идут через поток-писатель.
+    """
+    spec = IMPORTS.get(table)
+    if spec is None:
+        raise InvalidImport(f"Unknown import table: {table}")
+    started = time.perf_counter()
+    imported = rejected = 0
+    errors: List[str] = []
+    db = connect()
+    try:
+        _tune_for_load(db)
+        if defer_indexes:
+            _drop_deferred(db, table)
+        for rows, batch_errors in iter_batches(lines, spec, batch_size):
+            rejected += len(batch_errors)
+            errors.extend(batch_errors[:MAX_REPORTED_ERRORS - len(errors)])
+            if rows:
+                imported += load_batch(db, spec, rows)
+        loaded = time.perf_counter()
+    finally:
+        try:
+            if defer_indexes:
+                _restore_deferred(db, table)
+        finally:
+            db.close()
+        if imported:
+            # Построчные события для импорта не публикуются: клиенты перечитывают таблицу
+            change_feed.publish(table, "resync")
+    finished = time.perf_counter()
+    elapsed = finished - started
+    return {
+        "table": table,
+        "rows_read": imported + rejected,
+        "rows_imported": imported,
+        "rows_rejected": rejected,
+        "errors": errors,
+        "load_seconds": round(loaded - started, 3),
+        "index_seconds": round(finished - loaded, 3),
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(imported / elapsed, 1) if elapsed else 0.0,
+    }
+
+def main(argv: List[str]) -> int:
+    from .database import close_db, init_db
+
+    parser = argparse.ArgumentParser(prog="python -m app.importer", description="CSV import")
+    parser.add_argument("table", choices=sorted(IMPORTS))
+    parser.add_argument("path")
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--keep-indexes", action="store_true",
+                        help="не снимать индексы и триггеры сводки на время загрузки")
+    args = parser.parse_args(argv)
+
+    init_db()
+    try:
+        with io.open(args.path, encoding="utf-8-sig", newline="") as f:
+            report = import_csv(f, args.table, args.batch_size, not args.keep_indexes)
+    finally:
+        close_db()
+    for error in report["errors"]:
+        print(error)
+    print(f"{report['rows_imported']} rows imported, {report['rows_rejected']} rejected "
+          f"in {report['seconds']:.1f} s ({report['rows_per_second']:.0f} rows/s, "
+          f"indexes {report['index_seconds']:.1f} s)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,219 @@
+"""
+Метрики приложения в текстовом формате Prometheus.
+
+MetricsMiddleware замеряет каждый HTTP-запрос и относит его к шаблону
+маршрута (/orders/{order_id}), а не к конкретному пути. render() собирает
+задержки запросов, статистику SQL из profiling, состояние пула соединений,
+очереди записи и кэша ответов для эндпоинта /metrics.
+"""
+import bisect
+import threading
+import time
+from typing import Dict, Iterable, List, Sequence, Tuple
+from .cache import response_cache
+from .database import get_pool, get_writer
+from .events import change_feed
+from .profiling import sql_stats
+from .totals import drift_monitor
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Границы корзин гистограммы задержек, в секундах
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Запросы, не совпавшие ни с одним маршрутом (404), учитываются вместе
+UNMATCHED_ROUTE = "<unmatched>"
+
+Labels = Tuple[Tuple[str, str], ...]
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labels: Labels, extra: Iterable[Tuple[str, str]] = ()) -> str:
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in pairs) + "}"
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+class Histogram:
+    """
+    Гистограмма с фиксированными корзинами и метками.
+    """
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        # Метки -> [счетчики корзин..., сумма, количество]
+        self._series: Dict[Labels, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str):
+        key = tuple(sorted(labels.items()))
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        for labels, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(labels, [('le', _format_value(bound))])} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(labels, [('le', '+Inf')])} {_format_value(values[-1])}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(values[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {_format_value(values[-1])}")
+        return lines
+
+class Counter:
+    """
+    Монотонный счетчик с метками.
+    """
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._series: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            series = dict(self._series)
+        for labels, value in sorted(series.items()):
+            lines.append(f"{self.name}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+http_request_duration = Histogram(
+    "autobatya_http_request_duration_seconds",
+    "HTTP request latency by route template",
+)
+http_requests = Counter(
+    "autobatya_http_requests_total",
+    "HTTP requests by route template and status code",
+)
+
+class MetricsMiddleware:
+    """
+    ASGI-middleware: время ответа и код статуса каждого HTTP-запроса.
+    Для потоковых ответов время включает передачу всего тела.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            # Маршрутизатор кладет найденный маршрут в scope
+            route = getattr(scope.get("route"), "path", UNMATCHED_ROUTE)
+            method = scope["method"]
+            http_request_duration.observe(elapsed, method=method, route=route)
+            http_requests.inc(method=method, route=route, status=str(status_code))
+
+def _gauges(name: str, documentation: str, kind: str, values: Dict[str, float], label: str) -> List[str]:
+    lines = [f"# HELP {name} {documentation}", f"# TYPE {name} {kind}"]
+    for key, value in values.items():
+        lines.append(f"{name}{_format_labels(((label, key),))} {_format_value(value)}")
+    return lines
+
+def _sql_lines() -> List[str]:
+    statements, slow_queries = sql_stats.snapshot()
+    calls = ["# HELP autobatya_sql_queries_total SQL statements executed",
+             "# TYPE autobatya_sql_queries_total counter"]
+    rows = ["# HELP autobatya_sql_rows_total Rows returned or changed by SQL statements",
+            "# TYPE autobatya_sql_rows_total counter"]
+    seconds = ["# HELP autobatya_sql_seconds_total Time spent executing and fetching SQL statements",
+               "# TYPE autobatya_sql_seconds_total counter"]
+    for statement, (count, row_count, elapsed) in sorted(statements.items()):
+        labels = _format_labels((("statement", statement),))
+        calls.append(f"autobatya_sql_queries_total{labels} {_format_value(count)}")
+        rows.append(f"autobatya_sql_rows_total{labels} {_format_value(row_count)}")
+        seconds.append(f"autobatya_sql_seconds_total{labels} {_format_value(elapsed)}")
+    slow = ["# HELP autobatya_sql_slow_queries_total Statements above the slow query threshold",
+            "# TYPE autobatya_sql_slow_queries_total counter",
+            f"autobatya_sql_slow_queries_total {slow_queries}"]
+    return calls + rows + seconds + slow
+
+def render() -> str:
+    """
+    Все метрики в текстовом формате Prometheus.
+    """
+    pool = get_pool().stats()
+    writer = get_writer().stats()
+    cache = response_cache.stats()
+    events = change_feed.stats()
+    totals = drift_monitor.stats()
+    lines = http_request_duration.render() + http_requests.render() + _sql_lines()
+    lines += _gauges("autobatya_db_pool_connections", "Connection pool state", "gauge",
+                     {key: pool[key] for key in ("size", "in_use", "idle")}, "state")
+    lines += _gauges("autobatya_db_pool_events_total", "Connection pool events", "counter",
+                     {key: pool[key] for key in ("created", "checkouts", "waits", "timeouts",
+                                                 "health_check_failures")}, "event")
+    lines += [
+        "# HELP autobatya_write_queue_pending Write operations waiting for the writer thread",
+        "# TYPE autobatya_write_queue_pending gauge",
+        f"autobatya_write_queue_pending {writer['pending']}",
+    ]
+    lines += _gauges("autobatya_write_queue_operations_total", "Write operations by outcome", "counter",
+                     {"processed": writer["processed"], "failed": writer["failed"]}, "outcome")
+    lines += [
+        "# HELP autobatya_cache_entries Entries in the response cache",
+        "# TYPE autobatya_cache_entries gauge",
+        f"autobatya_cache_entries {cache['entries']}",
+    ]
+    lines += _gauges("autobatya_cache_events_total", "Response cache events", "counter",
+                     {key: cache[key] for key in ("hits", "misses", "evictions", "invalidations")}, "event")
+    lines += [
+        "# HELP autobatya_event_subscribers Open /events streams",
+        "# TYPE autobatya_event_subscribers gauge",
+        f"autobatya_event_subscribers {events['subscribers']}",
+        "# HELP autobatya_events_published_total Change events published to /events",
+        "# TYPE autobatya_events_published_total counter",
+        f"autobatya_events_published_total {events['published']}",
+        "# HELP autobatya_order_totals_drift Orders whose total differs from their lines at the last check",
+        "# TYPE autobatya_order_totals_drift gauge",
+        f"autobatya_order_totals_drift {totals['drifted']}",
+        "# HELP autobatya_order_totals_checks_total Background order total checks",
+        "# TYPE autobatya_order_totals_checks_total counter",
+        f"autobatya_order_totals_checks_total {totals['checks']}",
+        "# HELP autobatya_order_totals_last_check_timestamp_seconds Time of the last order total check",
+        "# TYPE autobatya_order_totals_last_check_timestamp_seconds gauge",
+        f"autobatya_order_totals_last_check_timestamp_seconds {_format_value(totals['last_check'])}",
+    ]
+    return "\n".join(lines) + "\n"
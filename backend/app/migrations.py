@@ -0,0 +1,236 @@
+"""
+Версионные миграции схемы.
+
+Примененные миграции записываются в таблицу schema_version, поэтому
+migrate() можно запускать при каждом старте: выполняются только новые
+шаги, по порядку номеров. Этим же путем схема попадает и в новую, и в уже
+существующую базу.
+
+Шаг миграции - либо SQL-инструкция, либо функция step(db). Каждый шаг
+выполняется в своей транзакции (индекс строится, пока остальные таблицы
+доступны на запись), номер версии записывается вместе с последним шагом.
+Поэтому шаги должны быть идемпотентными (IF NOT EXISTS и т.п.): после
+сбоя посреди миграции она просто выполняется заново.
+
+Применение и текущая версия из каталога backend:
+
+    python -m app.migrations
+"""
+import logging
+import sys
+import time
+from typing import Callable, List, NamedTuple, Tuple, Union
+from .database import transaction
+from .rollup import install_rollup
+from .search import install_search
+from .totals import install_order_totals
+from .vehicles import install_car_number_norm
+
+logger = logging.getLogger(__name__)
+
+Step = Union[str, Callable]
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    steps: Tuple[Step, ...]
+
+SCHEMA_VERSION_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_version (
+    version INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    applied_at TEXT NOT NULL DEFAULT (datetime('now')),
+    duration_ms REAL NOT NULL
+)
+"""
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "initial_schema", (
+        # Таблица сотрудников
+        """
+        CREATE TABLE IF NOT EXISTS employees (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            position TEXT NOT NULL,
+            salary REAL NOT NULL,
+            hire_date TEXT NOT NULL,
+            phone TEXT NOT NULL,
+            email TEXT
+        )
+        """,
+        # Таблица деталей
+        """
+        CREATE TABLE IF NOT EXISTS parts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            price REAL NOT NULL,
+            quantity INTEGER NOT NULL,
+            supplier TEXT
+        )
+        """,
+        # Таблица услуг
+        """
+        CREATE TABLE IF NOT EXISTS services (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            price REAL NOT NULL,
+            duration REAL NOT NULL
+        )
+        """,
+        # Таблица заказов
+        """
+        CREATE TABLE IF NOT EXISTS orders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            client_name TEXT NOT NULL,
+            car_model TEXT NOT NULL,
+            car_number TEXT NOT NULL,
+            date TEXT NOT NULL,
+            total_price REAL NOT NULL,
+            status TEXT NOT NULL CHECK(status IN ('в работе', 'завершен', 'отменен')),
+            employee_id INTEGER NOT NULL,
+            FOREIGN KEY (employee_id) REFERENCES employees (id)
+        )
+        """,
+        # Таблица деталей заказа
+        """
+        CREATE TABLE IF NOT EXISTS order_details (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id INTEGER NOT NULL,
+            service_id INTEGER,
+            part_id INTEGER,
+            quantity INTEGER NOT NULL,
+            price REAL NOT NULL,
+            FOREIGN KEY (order_id) REFERENCES orders (id),
+            FOREIGN KEY (service_id) REFERENCES services (id),
+            FOREIGN KEY (part_id) REFERENCES parts (id)
+        )
+        """,
+        # Таблица выплат зарплат
+        """
+        CREATE TABLE IF NOT EXISTS salary_payments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            employee_id INTEGER NOT NULL,
+            amount REAL NOT NULL,
+            date TEXT NOT NULL,
+            bonus REAL DEFAULT 0,
+            FOREIGN KEY (employee_id) REFERENCES employees (id)
+        )
+        """,
+        # Таблица расходов
+        """
+        CREATE TABLE IF NOT EXISTS expenses (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            amount REAL NOT NULL,
+            date TEXT NOT NULL,
+            category TEXT NOT NULL CHECK(category IN ('зарплаты', 'детали', 'аренда', 'другое'))
+        )
+        """,
+        # Индексы для улучшения производительности
+        "CREATE INDEX IF NOT EXISTS idx_orders_status ON orders(status)",
+        "CREATE INDEX IF NOT EXISTS idx_orders_date ON orders(date)",
+        "CREATE INDEX IF NOT EXISTS idx_order_details_order_id ON order_details(order_id)",
+        "CREATE INDEX IF NOT EXISTS idx_salary_payments_employee_id ON salary_payments(employee_id)",
+        "CREATE INDEX IF NOT EXISTS idx_expenses_category ON expenses(category)",
+    )),
+    # Ежедневная финансовая сводка (см. rollup.py)
+    Migration(2, "daily_financials_rollup", (install_rollup,)),
+    Migration(3, "composite_indexes", (
+        # Отчет по заказам и пересчет сводки: status=? AND date BETWEEN ? AND ?,
+        # сортировка по date, сумма total_price берется прямо из индекса
+        "CREATE INDEX IF NOT EXISTS idx_orders_status_date_total ON orders(status, date, total_price)",
+        # Префикс нового индекса, отдельный индекс по status больше не нужен
+        "DROP INDEX IF EXISTS idx_orders_status",
+        "CREATE INDEX IF NOT EXISTS idx_orders_employee_id ON orders(employee_id)",
+        # Отчет по остаткам: quantity < ? ORDER BY quantity, без обращения к таблице
+        "CREATE INDEX IF NOT EXISTS idx_parts_quantity_name_price ON parts(quantity, name, price)",
+        # Суммы расходов и зарплат по дням (сводка daily_financials)
+        "CREATE INDEX IF NOT EXISTS idx_expenses_date_category_amount ON expenses(date, category, amount)",
+        "CREATE INDEX IF NOT EXISTS idx_salary_payments_date_amount_bonus ON salary_payments(date, amount, bonus)",
+    )),
+    # Версии таблиц, общие для всех процессов-воркеров (см. versions.py):
+    # transaction() увеличивает версию измененных таблиц перед коммитом
+    Migration(4, "change_versions", (
+        """
+        CREATE TABLE IF NOT EXISTS change_versions (
+            table_name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL,
+            modified REAL NOT NULL
+        ) WITHOUT ROWID
+        """,
+    )),
+    # Полнотекстовый поиск по заказам, деталям и услугам (см. search.py)
+    Migration(5, "full_text_search", (install_search,)),
+    # История обслуживания машины: поиск заказов по нормализованному номеру
+    # (см. vehicles.py), сразу в порядке даты
+    Migration(6, "car_number_norm", (
+        install_car_number_norm,
+        "CREATE INDEX IF NOT EXISTS idx_orders_car_number_norm ON orders(car_number_norm, date)",
+    )),
+    # Суммы заказов поддерживаются триггерами на order_details (см. totals.py)
+    Migration(7, "order_totals", (install_order_totals,)),
+    # Индексы и триггеры, снятые на время импорта (см. importer.py): после
+    # сбоя посреди импорта они восстанавливаются при следующем старте
+    Migration(8, "deferred_import", (
+        """
+        CREATE TABLE IF NOT EXISTS deferred_import (
+            name TEXT PRIMARY KEY,
+            table_name TEXT NOT NULL,
+            sql TEXT NOT NULL
+        ) WITHOUT ROWID
+        """,
+    )),
+]
+
+def current_version(db) -> int:
+    db.execute(SCHEMA_VERSION_TABLE)
+    return db.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+def _run_step(db, step: Step):
+    if callable(step):
+        step(db)
+    else:
+        db.execute(step)
+
+def migrate(db) -> int:
+    """
+    Применяет еще не примененные миграции по порядку.
+    Возвращает итоговую версию схемы.
+    """
+    started = time.perf_counter()
+    with transaction(db):
+        version = current_version(db)
+    pending = [migration for migration in MIGRATIONS if migration.version > version]
+    for migration in pending:
+        migration_started = time.perf_counter()
+        for index, step in enumerate(migration.steps):
+            with transaction(db):
+                _run_step(db, step)
+                if index == len(migration.steps) - 1:
+                    duration_ms = (time.perf_counter() - migration_started) * 1000
+                    db.execute(
+                        "INSERT INTO schema_version (version, name, duration_ms) VALUES (?, ?, ?)",
+                        (migration.version, migration.name, duration_ms)
+                    )
+        logger.info("Applied migration %d %s in %.1f ms",
+                    migration.version, migration.name, duration_ms)
+        version = migration.version
+    logger.info("Schema at version %d (%d migrations applied, %.1f ms)",
+                version, len(pending), (time.perf_counter() - started) * 1000)
+    return version
+
+def main() -> int:
+    from .database import get_db, init_db
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    init_db()
+    with get_db() as db:
+        rows = db.execute(
+            "SELECT version, name, applied_at, duration_ms FROM schema_version ORDER BY version"
+        ).fetchall()
+    for version, name, applied_at, duration_ms in rows:
+        print(f"{version:>4} {name:<32} {applied_at} {duration_ms:>9.1f} ms")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
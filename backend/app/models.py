@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, List
 from datetime import date
 from enum import Enum
@@ -46,6 +46,19 @@ class Part(PartCreate):
     class Config:
         orm_mode = True
 
+class PartQuantity(BaseModel):
+    part_id: int
+    quantity: int = Field(..., gt=0)
+
+class PartAvailability(PartQuantity):
+    in_stock: int
+    available: bool
+
+class StockCheck(BaseModel):
+    # Хватает ли всех запрошенных деталей
+    available: bool
+    parts: List[PartAvailability]
+
 # ========== Модели для услуг ==========
 class ServiceBase(BaseModel):
     name: str
@@ -95,6 +108,21 @@ class OrderDetail(OrderDetailCreate):
     class Config:
         orm_mode = True
 
+class OrderWithDetails(Order):
+    details: List[OrderDetail] = []
+
+class VehicleHistoryDetail(BaseModel):
+    id: int
+    service_id: Optional[int] = None
+    service_name: Optional[str] = None
+    part_id: Optional[int] = None
+    part_name: Optional[str] = None
+    quantity: int
+    price: float
+
+class VehicleHistoryOrder(Order):
+    details: List[VehicleHistoryDetail] = []
+
 # ========== Модели для выплат зарплат ==========
 class SalaryPaymentBase(BaseModel):
     employee_id: int
@@ -133,6 +161,11 @@ class FinancialStats(BaseModel):
     salaries: float
     profit: float
 
+class TimeseriesPoint(BaseModel):
+    # Начало периода (день, понедельник недели или первое число месяца)
+    date: str
+    value: float
+
 class EmployeeStats(BaseModel):
     employee_count: int
     average_salary: float
@@ -146,4 +179,50 @@ class OrdersReportItem(BaseModel):
     id: int
     client_name: str
     total_price: float
-    employee_name: str
\ No newline at end of file
+    employee_name: str
+
+class SearchResults(BaseModel):
+    orders: List[Order]
+    parts: List[Part]
+    services: List[Service]
+
+class DashboardSnapshot(BaseModel):
+    financial: FinancialStats
+    employees: EmployeeStats
+    low_stock_parts: List[PartsReportItem]
+    recent_orders: List[Order]
+
+class ImportReport(BaseModel):
+    table: str
+    rows_read: int
+    rows_imported: int
+    rows_rejected: int
+    errors: List[str]
+    load_seconds: float
+    index_seconds: float
+    seconds: float
+    rows_per_second: float
+
+class WriteQueueStats(BaseModel):
+    pending: int
+    processed: int
+    failed: int
+
+class PoolStats(BaseModel):
+    size: int
+    in_use: int
+    idle: int
+    created: int
+    checkouts: int
+    waits: int
+    timeouts: int
+    health_check_failures: int
+    write_queue: WriteQueueStats
+
+class CacheStats(BaseModel):
+    entries: int
+    max_entries: int
+    hits: int
+    misses: int
+    evictions: int
+    invalidations: int
\ No newline at end of file
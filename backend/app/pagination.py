@@ -0,0 +1,58 @@
+import base64
+import json
+from datetime import date
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from fastapi import Response
+
+# Заголовок ответа, в котором возвращается курсор следующей страницы
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+class InvalidCursor(ValueError):
+    """Курсор поврежден или выдан для другого списка."""
+
+def encode_cursor(values: Dict[str, Any]) -> str:
+    raw = json.dumps(values, separators=(",", ":"), ensure_ascii=False).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+def _valid_value(key: str, value: Any) -> bool:
+    # bool - подкласс int, но в курсоре это всегда подделка
+    if isinstance(value, bool):
+        return False
+    if key == "id":
+        return isinstance(value, int)
+    if key == "date":
+        if not isinstance(value, str):
+            return False
+        try:
+            date.fromisoformat(value)
+        except ValueError:
+            return False
+        return True
+    return isinstance(value, (str, int))
+
+def decode_cursor(cursor: str, keys: Sequence[str]) -> Optional[Tuple]:
+    """
+    Возвращает значения ключей курсора в порядке keys.
+    Пустой курсор означает первую страницу - тогда возвращается None.
+    Значения проверяются (id - целое, date - дата ISO, остальные - строка
+    или целое), чтобы подделанный курсор давал 400, а не ошибку в запросе.
+    """
+    if not cursor:
+        return None
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        values = tuple(data[key] for key in keys)
+    except (ValueError, KeyError, TypeError) as exc:
+        raise InvalidCursor(f"Invalid cursor: {cursor!r}") from exc
+    if not all(_valid_value(key, value) for key, value in zip(keys, values)):
+        raise InvalidCursor(f"Invalid cursor: {cursor!r}")
+    return values
+
+def set_next_cursor(response: Response, rows: List[dict], limit: int, keys: Sequence[str]) -> List[dict]:
+    """
+    Если страница заполнена целиком, записывает в ответ курсор,
+    указывающий на ее последнюю строку.
+    """
+    if rows and len(rows) >= limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor({key: rows[-1][key] for key in keys})
+    return rows
@@ -0,0 +1,160 @@
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from queue import LifoQueue, Empty
+from typing import Callable, Dict, Generator
+
+class PoolTimeout(Exception):
+    """Не удалось получить соединение из пула за отведенное время."""
+
+class ConnectionPool:
+    """
+    Ограниченный пул долгоживущих соединений SQLite.
+
+    Соединение выдается одному запросу целиком и возвращается в пул после него,
+    поэтому его можно безопасно передавать между потоками threadpool FastAPI
+    (зависимость и сам эндпоинт могут выполняться в разных потоках).
+    """
+
+    def __init__(self, connect: Callable[[], sqlite3.Connection], size: int = 8,
+                 timeout: float = 10.0, health_check_interval: float = 30.0):
+        self._connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        # LIFO: чаще используем "горячие" соединения с прогретым кэшем схемы
+        self._idle: LifoQueue = LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._closed = False
+        self._created = 0
+        self._checkouts = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._health_check_failures = 0
+        self._in_use = 0
+
+    def acquire(self) -> sqlite3.Connection:
+        if self._closed:
+            raise RuntimeError("Пул соединений закрыт")
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._waits += 1
+            if not self._slots.acquire(timeout=self.timeout):
+                with self._lock:
+                    self._timeouts += 1
+                raise PoolTimeout(
+                    f"Нет свободных соединений за {self.timeout} с (размер пула {self.size})"
+                )
+        try:
+            conn = self._take_idle()
+            if conn is None:
+                conn = self._connect()
+                with self._lock:
+                    self._created += 1
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._checkouts += 1
+            self._in_use += 1
+        return conn
+
+    def release(self, conn: sqlite3.Connection):
+        try:
+            # Незавершенная транзакция не должна достаться следующему запросу
+            if conn.in_transaction:
+                conn.rollback()
+            healthy = True
+        except sqlite3.Error:
+            healthy = False
+        if healthy and not self._closed:
+            self._idle.put((conn, time.monotonic()))
+        else:
+            self._close_quietly(conn)
+        with self._lock:
+            self._in_use -= 1
+        self._slots.release()
+
+    @contextmanager
+    def connection(self) -> Generator[sqlite3.Connection, None, None]:
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def health_check(self) -> int:
+        """
+        Проверяет все простаивающие соединения, битые закрывает.
+        Возвращает количество исправных соединений.
+        """
+        checked = []
+        while True:
+            try:
+                checked.append(self._idle.get_nowait()[0])
+            except Empty:
+                break
+        healthy = 0
+        for conn in checked:
+            if self._is_healthy(conn):
+                healthy += 1
+                self._idle.put((conn, time.monotonic()))
+            else:
+                self._discard(conn)
+        return healthy
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except Empty:
+                break
+            self._close_quietly(conn)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "size": self.size,
+                "in_use": self._in_use,
+                "idle": self._idle.qsize(),
+                "created": self._created,
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+                "health_check_failures": self._health_check_failures,
+            }
+
+    def _take_idle(self):
+        while True:
+            try:
+                conn, last_used = self._idle.get_nowait()
+            except Empty:
+                return None
+            if time.monotonic() - last_used < self.health_check_interval:
+                return conn
+            if self._is_healthy(conn):
+                return conn
+            self._discard(conn)
+
+    def _discard(self, conn: sqlite3.Connection):
+        with self._lock:
+            self._health_check_failures += 1
+        self._close_quietly(conn)
+
+    @staticmethod
+    def _is_healthy(conn: sqlite3.Connection) -> bool:
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    @staticmethod
+    def _close_quietly(conn: sqlite3.Connection):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
@@ -0,0 +1,198 @@
+"""
+Профилирование SQL.
+
+Соединения, открытые database.connect(), создаются с фабрикой
+InstrumentedConnection: каждый запрос учитывается в sql_stats (число
+выполнений, строк и суммарное время по тексту запроса). Если задан порог
+AUTOBATYA_SLOW_QUERY_MS, запросы дольше порога пишутся в лог app.slow_query
+вместе с EXPLAIN QUERY PLAN.
+"""
+import logging
+import re
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, List, Tuple
+from . import config
+
+slow_query_logger = logging.getLogger("app.slow_query")
+
+# Все запросы сверх лимита учитываются под этим ключом,
+# чтобы метрики не разрастались без ограничений
+OTHER_STATEMENT = "<other>"
+_MAX_STATEMENT_LENGTH = 300
+_PLACEHOLDER_LIST = re.compile(r"\bIN\s*\(\s*\?(\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+_EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "REPLACE")
+
+@lru_cache(maxsize=1024)
+def normalize_sql(sql: str) -> str:
+    """
+    Ключ запроса в статистике: пробелы схлопнуты, списки параметров
+    IN (?, ?, ...) любой длины сведены к одному виду.
+    """
+    text = _WHITESPACE.sub(" ", sql).strip()
+    text = _PLACEHOLDER_LIST.sub("IN (?, ...)", text)
+    if len(text) > _MAX_STATEMENT_LENGTH:
+        text = text[:_MAX_STATEMENT_LENGTH - 3] + "..."
+    return text
+
+class SqlStats:
+    """
+    Накопленная статистика запросов: ключ -> [выполнений, строк, секунд].
+    """
+
+    def __init__(self, max_statements: int = 500):
+        self.max_statements = max_statements
+        self._statements: Dict[str, List[float]] = {}
+        self._slow_queries = 0
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, calls: int, rows: int, seconds: float):
+        with self._lock:
+            entry = self._statements.get(statement)
+            if entry is None:
+                if len(self._statements) >= self.max_statements:
+                    statement = OTHER_STATEMENT
+                entry = self._statements.setdefault(statement, [0, 0, 0.0])
+            entry[0] += calls
+            entry[1] += rows
+            entry[2] += seconds
+
+    def record_slow(self):
+        with self._lock:
+            self._slow_queries += 1
+
+    def snapshot(self) -> Tuple[Dict[str, Tuple[int, int, float]], int]:
+        with self._lock:
+            return (
+                {statement: tuple(entry) for statement, entry in self._statements.items()},
+                self._slow_queries,
+            )
+
+    def reset(self):
+        with self._lock:
+            self._statements.clear()
+            self._slow_queries = 0
+
+sql_stats = SqlStats(config.SQL_METRICS_MAX_STATEMENTS)
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """
+    Курсор, который замеряет выполнение и выборку строк текущего запроса.
+    """
+
+    _statement = None
+    _sql = None
+    _parameters = ()
+    _elapsed = 0.0
+    _logged = False
+
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._begin(sql, parameters)
+            rows = self.rowcount if self.rowcount > 0 else 0
+            self._account(time.perf_counter() - started, rows, calls=1)
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            # План строится без параметров - их здесь много
+            self._begin(sql, None)
+            rows = self.rowcount if self.rowcount > 0 else 0
+            self._account(time.perf_counter() - started, rows, calls=1)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._account(time.perf_counter() - started, 0 if row is None else 1)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._account(time.perf_counter() - started, len(rows))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._account(time.perf_counter() - started, len(rows))
+        return rows
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        row = self.fetchone()
+        if row is None:
+            raise StopIteration
+        return row
+
+    def _begin(self, sql, parameters):
+        self._statement = normalize_sql(sql)
+        self._sql = sql
+        self._parameters = parameters
+        self._elapsed = 0.0
+        self._logged = False
+
+    def _account(self, seconds: float, rows: int, calls: int = 0):
+        if self._statement is None:
+            return
+        sql_stats.record(self._statement, calls, rows, seconds)
+        self._elapsed += seconds
+        threshold = config.SLOW_QUERY_MS
+        if threshold > 0 and not self._logged and self._elapsed * 1000 >= threshold:
+            self._logged = True
+            sql_stats.record_slow()
+            self._log_slow()
+
+    def _log_slow(self):
+        plan = explain_query_plan(self.connection, self._sql, self._parameters)
+        slow_query_logger.warning(
+            "Slow query %.1f ms: %s\n%s",
+            self._elapsed * 1000, self._statement, "\n".join(plan) or "(no plan)",
+        )
+
+def explain_query_plan(conn: sqlite3.Connection, sql: str, parameters=()) -> List[str]:
+    """
+    Возвращает строки EXPLAIN QUERY PLAN с отступами по уровню вложенности.
+    """
+    if not sql.lstrip().upper().startswith(_EXPLAINABLE):
+        return []
+    if parameters is None:
+        parameters = (None,) * sql.count("?")
+    try:
+        # Обычный курсор: план не должен попадать в статистику
+        cursor = conn.cursor(sqlite3.Cursor)
+        rows = cursor.execute(f"EXPLAIN QUERY PLAN {sql}", parameters).fetchall()
+    except sqlite3.Error as e:
+        return [f"EXPLAIN QUERY PLAN failed: {e}"]
+    depth = {0: 0}
+    lines = []
+    for node_id, parent_id, _, detail in rows:
+        depth[node_id] = depth.get(parent_id, 0) + 1
+        lines.append("  " * depth[node_id] + detail)
+    return lines
+
+class InstrumentedConnection(sqlite3.Connection):
+    """
+    Соединение, все курсоры которого - InstrumentedCursor.
+    execute() и executemany() переопределены: встроенные версии создают
+    курсор в обход cursor().
+    """
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
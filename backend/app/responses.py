@@ -0,0 +1,43 @@
+"""
+Быстрая отдача списков.
+
+Строки из SQLite уже имеют ту же форму, что и модели ответа (они и
+записывались через эти модели), поэтому для списков повторная валидация
+каждой строки через response_model не нужна: trusted_rows() отдает их
+сразу в FastJSONResponse. response_model у эндпоинтов остается - по нему
+строится документация OpenAPI. Отключается AUTOBATYA_TRUSTED_ROWS=0.
+"""
+import json
+from typing import Any
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from . import config
+
+try:
+    import orjson
+except ImportError:  # orjson - необязательная зависимость
+    orjson = None
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON-ответ через orjson, если он установлен, иначе через json.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content)
+        return json.dumps(
+            content, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+        ).encode("utf-8")
+
+def trusted_rows(response: Response, rows: Any) -> Any:
+    """
+    Возвращает строки из базы как готовый ответ, минуя response_model.
+    response - ответ, внедренный FastAPI в эндпоинт: выставленные на нем
+    заголовки (ETag, X-Next-Cursor) переносятся, иначе FastAPI их потеряет.
+    """
+    if not config.TRUSTED_ROWS:
+        return rows
+    fast = FastJSONResponse(rows)
+    fast.headers.raw.extend(response.headers.raw)
+    return fast
@@ -0,0 +1,211 @@
+"""
+Ежедневная финансовая сводка.
+
+Таблица daily_financials хранит суммы доходов, расходов и зарплат по дням
+(расходы - еще и по категориям). Триггеры поддерживают ее при любой записи
+в orders, expenses и salary_payments, поэтому статистика за любой период -
+это сумма по нескольким строкам сводки вместо полного прохода по таблицам.
+
+Пересборка и проверка согласованности из каталога backend:
+
+    python -m app.rollup rebuild
+    python -m app.rollup check
+"""
+import sys
+from typing import List, Tuple
+
+# Сумма, на которую сводка может расходиться с исходными таблицами
+# из-за накопления ошибок округления float
+TOLERANCE = 0.005
+
+_UPSERT = """
+    ON CONFLICT (day, kind, category) DO UPDATE SET amount = amount + excluded.amount;
+"""
+
+ROLLUP_TABLE = """
+CREATE TABLE IF NOT EXISTS daily_financials (
+    day TEXT NOT NULL,
+    kind TEXT NOT NULL CHECK(kind IN ('income', 'expenses', 'salaries')),
+    category TEXT NOT NULL DEFAULT '',
+    amount REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, kind, category)
+) WITHOUT ROWID
+"""
+
+ROLLUP_TRIGGERS = [
+    # Доход - только завершенные заказы
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_daily_financials_orders_insert
+    AFTER INSERT ON orders WHEN NEW.status = 'завершен'
+    BEGIN
+        INSERT INTO daily_financials (day, kind, category, amount)
+        VALUES (NEW.date, 'income', '', NEW.total_price)
+        {_UPSERT}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_daily_financials_orders_delete
+    AFTER DELETE ON orders WHEN OLD.status = 'завершен'
+    BEGIN
+        INSERT INTO daily_financials (day, kind, category, amount)
+        VALUES (OLD.date, 'income', '', -OLD.total_price)
+        {_UPSERT}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_daily_financials_orders_update
+    AFTER UPDATE OF date, total_price, status ON orders
+    WHEN OLD.status = 'завершен' OR NEW.status = 'завершен'
+    BEGIN
+        INSERT INTO daily_financials (day, kind, category, amount)
+        SELECT OLD.date, 'income', '', -OLD.total_price WHERE OLD.status = 'завершен'
+        {_UPSERT}
+        INSERT INTO daily_financials (day, kind, category, amount)
+        SELECT NEW.date, 'income', '', NEW.total_price WHERE NEW.status = 'завершен'
+        {_UPSERT}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_daily_financials_expenses_insert
+    AFTER INSERT ON expenses
+    BEGIN
+        INSERT INTO daily_financials (day, kind, category, amount)
+        VALUES (NEW.date, 'expenses', NEW.category, NEW.amount)
+        {_UPSERT}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_daily_financials_expenses_delete
+    AFTER DELETE ON expenses
+    BEGIN
+        INSERT INTO daily_financials (day, kind, category, amount)
+        VALUES (OLD.date, 'expenses', OLD.category, -OLD.amount)
+        {_UPSERT}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_daily_financials_expenses_update
+    AFTER UPDATE OF date, amount, category ON expenses
+    BEGIN
+        INSERT INTO daily_financials (day, kind, category, amount)
+        VALUES (OLD.date, 'expenses', OLD.category, -OLD.amount)
+        {_UPSERT}
+        INSERT INTO daily_financials (day, kind, category, amount)
+        VALUES (NEW.date, 'expenses', NEW.category, NEW.amount)
+        {_UPSERT}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_daily_financials_salary_payments_insert
+    AFTER INSERT ON salary_payments
+    BEGIN
+        INSERT INTO daily_financials (day, kind, category, amount)
+        VALUES (NEW.date, 'salaries', '', NEW.amount + COALESCE(NEW.bonus, 0))
+        {_UPSERT}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_daily_financials_salary_payments_delete
+    AFTER DELETE ON salary_payments
+    BEGIN
+        INSERT INTO daily_financials (day, kind, category, amount)
+        VALUES (OLD.date, 'salaries', '', -(OLD.amount + COALESCE(OLD.bonus, 0)))
+        {_UPSERT}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_daily_financials_salary_payments_update
+    AFTER UPDATE OF date, amount, bonus ON salary_payments
+    BEGIN
+        INSERT INTO daily_financials (day, kind, category, amount)
+        VALUES (OLD.date, 'salaries', '', -(OLD.amount + COALESCE(OLD.bonus, 0)))
+        {_UPSERT}
+        INSERT INTO daily_financials (day, kind, category, amount)
+        VALUES (NEW.date, 'salaries', '', NEW.amount + COALESCE(NEW.bonus, 0))
+        {_UPSERT}
+    END
+    """,
+]
+
+# Те же суммы, посчитанные напрямую по исходным таблицам
+RAW_TOTALS = """
+SELECT date AS day, 'income' AS kind, '' AS category, SUM(total_price) AS amount
+FROM orders WHERE status = 'завершен' GROUP BY date
+UNION ALL
+SELECT date, 'expenses', category, SUM(amount)
+FROM expenses GROUP BY date, category
+UNION ALL
+SELECT date, 'salaries', '', SUM(amount + COALESCE(bonus, 0))
+FROM salary_payments GROUP BY date
+"""
+
+def install_rollup(db):
+    """
+    Создает таблицу сводки и триггеры. Если таблицы еще не было,
+    заполняет ее по существующим данным. Коммит - за вызывающим
+    (шаг миграции migrations.py).
+    """
+    exists = db.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='daily_financials'"
+    ).fetchone()
+    db.execute(ROLLUP_TABLE)
+    for trigger in ROLLUP_TRIGGERS:
+        db.execute(trigger)
+    if not exists:
+        rebuild_rollup(db)
+
+def rebuild_rollup(db):
+    """
+    Пересчитывает сводку с нуля по исходным таблицам.
+    """
+    db.execute("DELETE FROM daily_financials")
+    db.execute(
+        f"INSERT INTO daily_financials (day, kind, category, amount) {RAW_TOTALS}"
+    )
+
+def check_rollup(db) -> List[Tuple[str, str, str, float, float]]:
+    """
+    Сравнивает сводку с исходными таблицами.
+    Возвращает расхождения: (день, вид, категория, в сводке, по таблицам).
+    """
+    raw = {
+        (row[0], row[1], row[2]): row[3] or 0
+        for row in db.execute(RAW_TOTALS).fetchall()
+    }
+    rollup = {
+        (row[0], row[1], row[2]): row[3]
+        for row in db.execute(
+            "SELECT day, kind, category, amount FROM daily_financials"
+        ).fetchall()
+    }
+    mismatches = []
+    for key in sorted(raw.keys() | rollup.keys()):
+        stored = rollup.get(key, 0)
+        expected = raw.get(key, 0)
+        if abs(stored - expected) > TOLERANCE:
+            mismatches.append((*key, stored, expected))
+    return mismatches
+
+def main(argv: List[str]) -> int:
+    from .database import get_db, init_db, transaction
+
+    if len(argv) != 1 or argv[0] not in ("rebuild", "check"):
+        print("usage: python -m app.rollup rebuild|check")
+        return 2
+    init_db()
+    with get_db() as db:
+        if argv[0] == "rebuild":
+            # Версия daily_financials в change_versions: запущенный сервер увидит ее
+            # фоновой проверкой (versions.StoredVersions) и сбросит кэш и ETag статистики
+            with transaction(db, "daily_financials"):
+                rebuild_rollup(db)
+            print("daily_financials rebuilt")
+            return 0
+        mismatches = check_rollup(db)
+    for day, kind, category, stored, expected in mismatches:
+        print(f"{day} {kind} {category or '-'}: rollup={stored:.2f} raw={expected:.2f}")
+    print(f"{len(mismatches)} mismatches")
+    return 1 if mismatches else 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
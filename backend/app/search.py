@@ -0,0 +1,146 @@
+"""
+Полнотекстовый поиск по заказам, деталям и услугам (SQLite FTS5).
+
+Для каждой таблицы из SEARCH_TABLES есть виртуальная таблица <table>_fts
+с внешним содержимым (content=<table>): она хранит только индекс, сами
+строки читаются из исходной таблицы по rowid. Триггеры обновляют индекс
+при любой записи. Префиксные индексы на 2 и 3 символа ускоряют поиск по
+началу слова ("ива" находит "Иванов", "а12" - номер "А123ВС77").
+
+Пересборка индексов из каталога backend:
+
+    python -m app.search rebuild
+"""
+import re
+import sys
+from typing import Dict, List, Optional, Tuple
+
+# Индексируемые колонки и их вес в ранжировании bm25
+SEARCH_TABLES: Dict[str, Tuple[Tuple[str, float], ...]] = {
+    "orders": (("client_name", 2.0), ("car_model", 1.0), ("car_number", 3.0)),
+    "parts": (("name", 2.0), ("supplier", 1.0)),
+    "services": (("name", 1.0),),
+}
+
+# Регистр и диакритика не различаются (ё = е, Й = й)
+_TOKENIZE = "unicode61 remove_diacritics 2"
+_PREFIX = "2 3"
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+def _columns(table: str) -> List[str]:
+    return [column for column, _ in SEARCH_TABLES[table]]
+
+def _fts_table(table: str) -> str:
+    columns = ", ".join(_columns(table))
+    return f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {table}_fts USING fts5(
+        {columns},
+        content='{table}', content_rowid='id',
+        tokenize='{_TOKENIZE}', prefix='{_PREFIX}'
+    )
+    """
+
+def _fts_triggers(table: str) -> List[str]:
+    columns = _columns(table)
+    names = ", ".join(columns)
+    new_values = ", ".join(f"NEW.{column}" for column in columns)
+    old_values = ", ".join(f"OLD.{column}" for column in columns)
+    # Для внешнего содержимого удаление из индекса - вставка команды 'delete'
+    # со старыми значениями
+    delete = (
+        f"INSERT INTO {table}_fts ({table}_fts, rowid, {names}) "
+        f"VALUES ('delete', OLD.id, {old_values});"
+    )
+    insert = f"INSERT INTO {table}_fts (rowid, {names}) VALUES (NEW.id, {new_values});"
+    return [
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_fts_insert AFTER INSERT ON {table}
+        BEGIN
+            {insert}
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_fts_delete AFTER DELETE ON {table}
+        BEGIN
+            {delete}
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_fts_update AFTER UPDATE OF {names} ON {table}
+        BEGIN
+            {delete}
+            {insert}
+        END
+        """,
+    ]
+
+def install_search(db):
+    """
+    Создает таблицы FTS5 и триггеры и строит индексы по существующим
+    данным. Коммит - за вызывающим (шаг миграции migrations.py).
+    """
+    for table in SEARCH_TABLES:
+        db.execute(_fts_table(table))
+        for trigger in _fts_triggers(table):
+            db.execute(trigger)
+        rebuild_search(db, table)
+
+def rebuild_search(db, table: str):
+    """
+    Пересобирает индекс table по исходной таблице.
+    """
+    db.execute(f"INSERT INTO {table}_fts ({table}_fts) VALUES ('rebuild')")
+
+def match_query(q: str) -> Optional[str]:
+    """
+    Превращает строку поиска в запрос MATCH: каждое слово ищется по
+    началу, все слова должны найтись (AND). Синтаксис FTS5 из строки
+    пользователя не используется - слова берутся в кавычки.
+    """
+    tokens = _TOKEN.findall(q)
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
+
+def search_table(db, table: str, match: str, limit: int, columns: str = "t.*") -> List[dict]:
+    """
+    Лучшие по bm25 строки table (колонки columns). Сначала ранжируется
+    только индекс, строки читаются для уже отобранных limit совпадений.
+    """
+    weights = ", ".join(str(weight) for _, weight in SEARCH_TABLES[table])
+    cursor = db.execute(
+        f"""
+        SELECT {columns}
+        FROM (
+            SELECT rowid, bm25({table}_fts, {weights}) AS score
+            FROM {table}_fts
+            WHERE {table}_fts MATCH ?
+            ORDER BY score
+            LIMIT ?
+        ) found
+        JOIN {table} t ON t.id = found.rowid
+        ORDER BY found.score
+        """,
+        (match, limit)
+    )
+    return [dict(row) for row in cursor.fetchall()]
+
+def main(argv: List[str]) -> int:
+    from .database import get_db, init_db, transaction
+
+    if argv != ["rebuild"]:
+        print("usage: python -m app.search rebuild")
+        return 2
+    init_db()
+    with get_db() as db:
+        # Версии исходных таблиц сбрасывают кэш и ETag /search запущенного
+        # сервера (он увидит их фоновой проверкой change_versions)
+        with transaction(db, *SEARCH_TABLES):
+            for table in SEARCH_TABLES:
+                rebuild_search(db, table)
+    print("search indexes rebuilt")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,102 @@
+"""
+Склад: резервирование деталей под строки заказов.
+
+Списание - один условный UPDATE на пачку деталей: остаток уменьшается,
+только если его хватает (quantity >= нужного), а RETURNING сообщает,
+какие детали списаны. Если хоть одной не хватило, InsufficientStock
+откатывает всю транзакцию записи, поэтому остаток не уходит в минус ни при
+каких параллельных запросах (и между процессами-воркерами) - проверка и
+списание выполняются одной инструкцией под блокировкой записи.
+
+check_parts отвечает на вопрос "хватит ли" для многих деталей одним
+запросом, но ничего не резервирует: между проверкой и записью остаток
+может измениться, окончательный ответ дает только reserve_parts.
+"""
+from typing import Dict, Iterable, List, Tuple
+
+# Деталей в одной инструкции (по два параметра на деталь)
+CHUNK_SIZE = 500
+
+class InsufficientStock(Exception):
+    """Деталей на складе меньше, чем нужно (или детали нет)."""
+
+    def __init__(self, part_ids: List[int]):
+        self.part_ids = part_ids
+        super().__init__(f"Insufficient stock for parts: {', '.join(map(str, part_ids))}")
+
+def total_quantities(items: Iterable[Tuple[int, int]]) -> Dict[int, int]:
+    """
+    Суммирует количества по деталям: (part_id, quantity), ... -> {part_id: всего}.
+    """
+    totals: Dict[int, int] = {}
+    for part_id, quantity in items:
+        totals[part_id] = totals.get(part_id, 0) + quantity
+    return totals
+
+def _chunks(quantities: Dict[int, int]):
+    items = list(quantities.items())
+    for start in range(0, len(items), CHUNK_SIZE):
+        chunk = items[start:start + CHUNK_SIZE]
+        values = ", ".join("(?, ?)" for _ in chunk)
+        yield chunk, values, [value for item in chunk for value in item]
+
+def reserve_parts(db, quantities: Dict[int, int]) -> List[int]:
+    """
+    Списывает со склада quantities {part_id: количество} внутри текущей
+    транзакции и возвращает id списанных деталей. Если какой-то детали не
+    хватает, бросает InsufficientStock - вызывающий блок transaction()
+    откатывает и уже сделанные списания.
+    """
+    reserved: List[int] = []
+    short: List[int] = []
+    for chunk, values, params in _chunks(quantities):
+        rows = db.execute(
+            f"""
+            WITH wanted(part_id, quantity) AS (VALUES {values})
+            UPDATE parts SET quantity = parts.quantity - wanted.quantity
+            FROM wanted
+            WHERE parts.id = wanted.part_id AND parts.quantity >= wanted.quantity
+            RETURNING parts.id
+            """,
+            params
+        ).fetchall()
+        done = {row[0] for row in rows}
+        reserved.extend(done)
+        short.extend(part_id for part_id, _ in chunk if part_id not in done)
+    if short:
+        raise InsufficientStock(sorted(short))
+    return reserved
+
+def release_parts(db, quantities: Dict[int, int]) -> List[int]:
+    """
+    Возвращает детали на склад (удаление или изменение строки заказа).
+    """
+    db.executemany(
+        "UPDATE parts SET quantity = quantity + ? WHERE id = ?",
+        [(quantity, part_id) for part_id, quantity in quantities.items()]
+    )
+    return list(quantities)
+
+def check_parts(db, quantities: Dict[int, int]) -> List[dict]:
+    """
+    Хватает ли деталей: для каждой part_id - нужное количество, остаток и
+    available. Несуществующая деталь - остаток 0.
+    """
+    result: List[dict] = []
+    for _, values, params in _chunks(quantities):
+        rows = db.execute(
+            f"""
+            WITH wanted(part_id, quantity) AS (VALUES {values})
+            SELECT wanted.part_id, wanted.quantity,
+                   COALESCE(parts.quantity, 0) AS in_stock,
+                   COALESCE(parts.quantity, 0) >= wanted.quantity AS available
+            FROM wanted
+            LEFT JOIN parts ON parts.id = wanted.part_id
+            """,
+            params
+        ).fetchall()
+        result.extend(
+            {"part_id": row[0], "quantity": row[1], "in_stock": row[2], "available": bool(row[3])}
+            for row in rows
+        )
+    return result
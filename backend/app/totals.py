@@ -0,0 +1,182 @@
+"""
+Суммы заказов, поддерживаемые триггерами.
+
+orders.total_price - сумма price * quantity по строкам заказа. Триггеры на
+order_details применяют к ней разницу (новая строка минус старая) при
+каждой записи, поэтому запись строки заказа не пересчитывает SUM по всем
+строкам. Первая строка заменяет сумму, введенную вручную для заказа без
+строк (как и прежний полный пересчет), после удаления последней строки
+сумма становится 0.
+
+Разница между суммой и строками может накопиться из-за ошибок округления
+float или записи в обход триггеров. Фоновая проверка (endpoints.py) раз в
+ORDER_TOTALS_VERIFY_INTERVAL секунд пишет расхождения в лог и в метрику
+autobatya_order_totals_drift, исправляет их POST /orders/{id}/calculate
+или команда repair. Проверка и исправление из каталога backend:
+
+    python -m app.totals check
+    python -m app.totals repair
+"""
+import logging
+import sys
+import threading
+import time
+from typing import List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Расхождение, которое считается ошибкой округления, а не ошибкой суммы
+TOLERANCE = 0.005
+
+# Сколько заказов с расхождением перечислять в логе
+MAX_LOGGED = 10
+
+def _add_line(order_id: str, row: str) -> str:
+    # Первая строка заказа заменяет сумму, остальные прибавляются
+    return f"""
+        UPDATE orders SET total_price = CASE
+            WHEN EXISTS (SELECT 1 FROM order_details WHERE order_id = {order_id} AND id != {row}.id)
+            THEN total_price + {row}.price * {row}.quantity
+            ELSE {row}.price * {row}.quantity
+        END
+        WHERE id = {order_id};
+    """
+
+def _remove_line(order_id: str, row: str) -> str:
+    return f"""
+        UPDATE orders SET total_price = CASE
+            WHEN EXISTS (SELECT 1 FROM order_details WHERE order_id = {order_id})
+            THEN total_price - {row}.price * {row}.quantity
+            ELSE 0
+        END
+        WHERE id = {order_id};
+    """
+
+TOTALS_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_order_totals_insert
+    AFTER INSERT ON order_details
+    BEGIN
+        {_add_line("NEW.order_id", "NEW")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_order_totals_delete
+    AFTER DELETE ON order_details
+    BEGIN
+        {_remove_line("OLD.order_id", "OLD")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_order_totals_update
+    AFTER UPDATE OF order_id, price, quantity ON order_details
+    BEGIN
+        {_remove_line("OLD.order_id", "OLD")}
+        {_add_line("NEW.order_id", "NEW")}
+    END
+    """,
+]
+
+# Суммы по строкам для заказов, у которых есть строки
+LINE_TOTALS = """
+SELECT order_id, SUM(price * quantity) AS total
+FROM order_details
+GROUP BY order_id
+"""
+
+def install_order_totals(db):
+    """
+    Создает триггеры и выравнивает суммы существующих заказов по их
+    строкам. Коммит - за вызывающим (шаг миграции migrations.py).
+    """
+    for trigger in TOTALS_TRIGGERS:
+        db.execute(trigger)
+    repair_order_totals(db)
+
+def check_order_totals(db) -> List[Tuple[int, float, float]]:
+    """
+    Сравнивает суммы заказов с их строками.
+    Возвращает расхождения: (id заказа, сумма в заказе, сумма по строкам).
+    """
+    return [
+        (row[0], row[1], row[2])
+        for row in db.execute(
+            f"""
+            SELECT o.id, o.total_price, lines.total
+            FROM ({LINE_TOTALS}) lines
+            JOIN orders o ON o.id = lines.order_id
+            WHERE ABS(o.total_price - lines.total) > ?
+            ORDER BY o.id
+            """,
+            (TOLERANCE,)
+        ).fetchall()
+    ]
+
+def repair_order_totals(db) -> int:
+    """
+    Записывает в заказы с расхождением сумму по строкам.
+    Возвращает число исправленных заказов.
+    """
+    cursor = db.execute(
+        f"""
+        UPDATE orders SET total_price = lines.total
+        FROM ({LINE_TOTALS}) lines
+        WHERE orders.id = lines.order_id AND ABS(orders.total_price - lines.total) > ?
+        """,
+        (TOLERANCE,)
+    )
+    return cursor.rowcount
+
+class DriftMonitor:
+    """
+    Результат последней фоновой проверки сумм (для /metrics).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checks = 0
+        self._drifted = 0
+        self._last_check = 0.0
+
+    def record(self, mismatches: List[Tuple[int, float, float]]):
+        with self._lock:
+            self._checks += 1
+            self._drifted = len(mismatches)
+            self._last_check = time.time()
+        if mismatches:
+            logger.warning(
+                "Order totals drifted from their lines in %d orders: %s",
+                len(mismatches),
+                ", ".join(f"#{order_id} {stored:.2f} != {expected:.2f}"
+                          for order_id, stored, expected in mismatches[:MAX_LOGGED])
+            )
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"checks": self._checks, "drifted": self._drifted, "last_check": self._last_check}
+
+drift_monitor = DriftMonitor()
+
+def main(argv: List[str]) -> int:
+    from .database import get_db, init_db, transaction
+
+    if len(argv) != 1 or argv[0] not in ("check", "repair"):
+        print("usage: python -m app.totals check|repair")
+        return 2
+    init_db()
+    with get_db() as db:
+        if argv[0] == "repair":
+            # Версия orders в change_versions: запущенный сервер увидит ее фоновой
+            # проверкой и сбросит кэш и ETag заказов
+            with transaction(db, "orders"):
+                repaired = repair_order_totals(db)
+            print(f"{repaired} order totals repaired")
+            return 0
+        mismatches = check_order_totals(db)
+    for order_id, stored, expected in mismatches:
+        print(f"order {order_id}: total={stored:.2f} lines={expected:.2f}")
+    print(f"{len(mismatches)} mismatches")
+    return 1 if mismatches else 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,33 @@
+"""
+Нормализованный номер автомобиля для поиска истории обслуживания.
+
+Номер в заказах - свободный текст: "а123вс 77", "A123BC77" (латиницей) и
+"А123ВС77" - одна и та же машина. В колонке orders.car_number_norm номер
+хранится приведенным к одному виду: верхний регистр, латинские буквы,
+похожие на кириллические, заменены кириллицей (на номерах только они),
+пробелы, дефисы и прочие разделители убраны. Колонку заполняют функции
+записи в crud.py и импорт; по ней построен индекс idx_orders_car_number_norm.
+"""
+import re
+
+# Латинские буквы, которые на номерах пишутся вместо кириллических
+_LOOKALIKES = str.maketrans("ABEKMHOPCTYX", "АВЕКМНОРСТУХ")
+_SEPARATORS = re.compile(r"[\W_]+", re.UNICODE)
+
+def normalize_car_number(car_number: str) -> str:
+    return _SEPARATORS.sub("", car_number).upper().translate(_LOOKALIKES)
+
+def install_car_number_norm(db):
+    """
+    Добавляет колонку car_number_norm и заполняет ее для существующих
+    заказов. Шаг миграции: повторный запуск ничего не меняет.
+    """
+    columns = [row[1] for row in db.execute("PRAGMA table_info(orders)").fetchall()]
+    if "car_number_norm" not in columns:
+        db.execute("ALTER TABLE orders ADD COLUMN car_number_norm TEXT")
+    # Функция нужна только этому соединению и только на время заполнения
+    db.create_function("normalize_car_number", 1, normalize_car_number, deterministic=True)
+    db.execute(
+        "UPDATE orders SET car_number_norm = normalize_car_number(car_number) "
+        "WHERE car_number_norm IS NULL"
+    )
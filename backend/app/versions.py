@@ -0,0 +1,225 @@
+import hashlib
+import logging
+import math
+import sqlite3
+import threading
+import time
+import uuid
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+from fastapi import HTTPException, Request, Response
+from . import config
+from .cache import response_cache
+from .database import connect, on_commit, on_versions
+from .events import change_feed
+
+logger = logging.getLogger(__name__)
+
+class StoredVersions:
+    """
+    Версии таблиц из change_versions - общие для всех процессов.
+
+    Каждая transaction() увеличивает там версии измененных таблиц вместе
+    с коммитом. sync() перечитывает таблицу (в фоне, см. endpoints.poll_versions)
+    и сообщает обработчикам, какие таблицы изменились: changed - все,
+    external - измененные другими процессами (другими воркерами или
+    командами из командной строки: rollup rebuild, totals repair и т.п.).
+    Обращения к кэшу и проверки ETag берут уже прочитанные версии (current())
+    и в базу не ходят.
+    """
+
+    def __init__(self, sync_on_commit: bool = False):
+        # С общими версиями свой коммит сразу перечитывается (в потоке писателя),
+        # чтобы следующий запрос получил новый ETag
+        self.sync_on_commit = sync_on_commit
+        self._versions: Dict[str, Tuple[int, float]] = {}
+        # Версии, записанные коммитами этого процесса и еще не замеченные sync()
+        self._own: Dict[str, Set[int]] = {}
+        self._synced = False
+        self._conn: Optional[sqlite3.Connection] = None
+        self._listeners: List[Callable[[Set[str], Set[str]], None]] = []
+        self._lock = threading.Lock()
+
+    def listen(self, listener: Callable[[Set[str], Set[str]], None]):
+        self._listeners.append(listener)
+        return listener
+
+    def note_own(self, versions: Dict[str, int]):
+        with self._lock:
+            for table, version in versions.items():
+                self._own.setdefault(table, set()).add(version)
+        if self.sync_on_commit:
+            self.sync()
+
+    def current(self) -> Dict[str, Tuple[int, float]]:
+        """
+        Возвращает {таблица: (версия, время изменения)} на момент последнего sync().
+        """
+        return self._versions
+
+    def sync(self) -> Dict[str, Tuple[int, float]]:
+        """
+        Перечитывает change_versions. Первый вызов только запоминает
+        версии: кэш процесса еще пуст, сбрасывать нечего.
+        """
+        with self._lock:
+            if self._conn is None:
+                # Свое соединение, а не из пула: проверка не должна ждать
+                # свободное соединение
+                self._conn = connect()
+            rows = self._conn.execute(
+                "SELECT table_name, version, modified FROM change_versions"
+            ).fetchall()
+            changed: Set[str] = set()
+            external: Set[str] = set()
+            versions = dict(self._versions)
+            for table, version, modified in rows:
+                # Таблица, которой еще нет в change_versions, - версия 0
+                known = versions.get(table, (0, 0.0))
+                if known[0] != version:
+                    changed.add(table)
+                    own = self._own.get(table, set())
+                    if not set(range(known[0] + 1, version + 1)) <= own:
+                        external.add(table)
+                versions[table] = (version, modified)
+                if table in self._own:
+                    self._own[table] = {v for v in self._own[table] if v > version}
+            self._versions = versions
+            notify = self._synced
+            self._synced = True
+        if changed and notify:
+            for listener in self._listeners:
+                try:
+                    listener(changed, external)
+                except Exception:
+                    logger.exception("Stored versions listener %r failed", listener)
+        return versions
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            self._versions = {}
+            self._own = {}
+            self._synced = False
+
+class TableVersions:
+    """
+    Счетчики версий таблиц. Каждый коммит, меняющий таблицу, увеличивает
+    ее версию - по версиям строятся ETag и Last-Modified ответов.
+    """
+
+    def __init__(self, shared: Optional[StoredVersions] = None):
+        # Версии живут в памяти процесса, поэтому в ETag входит метка запуска:
+        # после перезапуска старые ETag клиентов не совпадут с новыми.
+        # С shared версии берутся из базы и одинаковы во всех воркерах
+        self.shared = shared
+        self._epoch = uuid.uuid4().hex
+        self._started = time.time()
+        self._versions: Dict[str, int] = {}
+        self._modified: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def bump(self, tables: Iterable[str]):
+        now = time.time()
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+                self._modified[table] = now
+
+    def validators(self, tables: Sequence[str], resource: str) -> Tuple[str, float]:
+        """
+        Возвращает (ETag, время последнего изменения) для ресурса,
+        построенного из таблиц tables.
+        """
+        if self.shared is not None:
+            current = self.shared.current()
+            # Время изменения тоже входит в ETag: у пересозданной базы
+            # те же номера версий не дадут тот же ETag
+            versions = [current.get(table) for table in tables]
+            modified = max(
+                [current[table][1] for table in tables if table in current],
+                default=self._started
+            )
+            digest = hashlib.blake2b(
+                f"shared|{resource}|{versions}".encode(), digest_size=12
+            ).hexdigest()
+            return f'W/"{digest}"', modified
+        with self._lock:
+            versions = [self._versions.get(table, 0) for table in tables]
+            modified = max(
+                [self._modified.get(table, self._started) for table in tables],
+                default=self._started
+            )
+        digest = hashlib.blake2b(
+            f"{self._epoch}|{resource}|{versions}".encode(), digest_size=12
+        ).hexdigest()
+        return f'W/"{digest}"', modified
+
+stored_versions = StoredVersions(sync_on_commit=bool(config.SHARED_VERSIONS))
+table_versions = TableVersions(stored_versions if config.SHARED_VERSIONS else None)
+on_commit(table_versions.bump)
+on_versions(stored_versions.note_own)
+
+@stored_versions.listen
+def _invalidate_external(changed: Set[str], external: Set[str]):
+    # Свои коммиты уже сбросили кэш и версии в on_commit
+    response_cache.invalidate_tables(external)
+    if table_versions.shared is None:
+        table_versions.bump(external)
+
+@stored_versions.listen
+def _resync_subscribers(changed: Set[str], external: Set[str]):
+    # Строк, измененных другим процессом, у этого процесса нет - клиенты перечитывают таблицу
+    for table in sorted(external):
+        change_feed.publish(table, "resync")
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # Слабое сравнение: префикс W/ не учитывается
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+def _not_modified_since(header: str, modified: float) -> bool:
+    try:
+        since = parsedate_to_datetime(header).timestamp()
+    except (TypeError, ValueError):
+        return False
+    return math.ceil(modified) <= since
+
+def conditional(*tables: str):
+    """
+    Зависимость для GET-эндпоинтов: выставляет ETag и Last-Modified и
+    отвечает 304 Not Modified, если клиент уже получил актуальную версию.
+    Проверка идет до обращения к базе.
+    """
+    async def dependency(request: Request, response: Response):
+        resource = f"{request.url.path}?{request.url.query}"
+        etag, modified = table_versions.validators(tables, resource)
+        headers = {
+            "ETag": etag,
+            "Last-Modified": formatdate(math.ceil(modified), usegmt=True),
+            # Браузер хранит ответ, но каждый раз сверяет его с сервером
+            "Cache-Control": "no-cache",
+        }
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            not_modified = _etag_matches(if_none_match, etag)
+        else:
+            if_modified_since = request.headers.get("if-modified-since")
+            not_modified = (
+                if_modified_since is not None
+                and _not_modified_since(if_modified_since, modified)
+            )
+        if not_modified:
+            raise HTTPException(status_code=304, headers=headers)
+        response.headers.update(headers)
+    return dependency
@@ -0,0 +1,91 @@
+import sqlite3
+import threading
+from concurrent.futures import Future
+from queue import Queue
+from typing import Callable, Dict, Optional
+
+class WriteQueue:
+    """
+    Очередь записи с единственным потоком-писателем.
+
+    Все изменяющие операции выполняются последовательно на одном выделенном
+    соединении, поэтому писатели не конкурируют за блокировку базы
+    ("database is locked"), а читатели в режиме WAL их не ждут.
+    """
+
+    def __init__(self, connect: Callable[[], sqlite3.Connection], max_pending: int = 0):
+        self._connect = connect
+        self._queue: Queue = Queue(max_pending)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._processed = 0
+        self._failed = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="autobatya-writer", daemon=True
+                )
+                self._thread.start()
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """
+        Ставит fn(conn, *args, **kwargs) в очередь записи.
+        Если вызов идет из самого потока-писателя, выполняет его сразу,
+        иначе вложенная запись ждала бы сама себя.
+        """
+        if threading.current_thread() is self._thread:
+            future = Future()
+            try:
+                future.set_result(fn(self._conn, *args, **kwargs))
+            except BaseException as exc:
+                future.set_exception(exc)
+            return future
+        self.start()
+        future = Future()
+        self._queue.put((fn, args, kwargs, future))
+        return future
+
+    def call(self, fn: Callable, *args, **kwargs):
+        return self.submit(fn, *args, **kwargs).result()
+
+    def close(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending": self._queue.qsize(),
+            "processed": self._processed,
+            "failed": self._failed,
+        }
+
+    def _run(self):
+        self._conn = self._connect()
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+                fn, args, kwargs, future = item
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    result = fn(self._conn, *args, **kwargs)
+                    # Фиксируем то, что операция не закоммитила сама
+                    if self._conn.in_transaction:
+                        self._conn.commit()
+                except BaseException as exc:
+                    if self._conn.in_transaction:
+                        self._conn.rollback()
+                    self._failed += 1
+                    future.set_exception(exc)
+                else:
+                    self._processed += 1
+                    future.set_result(result)
+        finally:
+            self._conn.close()
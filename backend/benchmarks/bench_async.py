@@ -0,0 +1,115 @@
+"""
+Нагрузочный тест: асинхронные эндпоинты против прежних синхронных.
+
+Синхронный вариант собран здесь же в прежнем виде: def-эндпоинты в
+threadpool Starlette и отдельное соединение на каждый запрос. Пул соединений
+для него не годится: при числе клиентов больше threadpool (40) потоки,
+ждущие соединение, занимают все места, и владельцы соединений не могут
+завершить запрос.
+Оба приложения вызываются в процессе через httpx.ASGITransport.
+Запуск из каталога backend:
+
+    python -m benchmarks.bench_async --requests 2000 --concurrency 50 100 200
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+import httpx
+from fastapi import Depends, FastAPI
+
+from app import crud, database
+
+ROUTES = ["/orders/?limit=50", "/parts/{id}", "/employees/"]
+
+def build_sync_app() -> FastAPI:
+    sync_app = FastAPI()
+
+    def get_db_conn():
+        db = database.connect()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @sync_app.get("/orders/")
+    def read_orders(limit: int = 100, db=Depends(get_db_conn)):
+        return crud.get_orders(db, 0, limit)
+
+    @sync_app.get("/parts/{part_id}")
+    def read_part(part_id: int, db=Depends(get_db_conn)):
+        return crud.get_part(db, part_id)
+
+    @sync_app.get("/employees/")
+    def read_employees(db=Depends(get_db_conn)):
+        return crud.get_employees(db)
+
+    return sync_app
+
+def seed(parts: int, orders: int):
+    with database.get_db() as db:
+        db.execute(
+            "INSERT INTO employees (name, position, salary, hire_date, phone) "
+            "VALUES ('Механик', 'механик', 50000, '2020-01-01', '+7')"
+        )
+        db.executemany(
+            "INSERT INTO parts (name, price, quantity, supplier) VALUES (?, 100, 10, NULL)",
+            [(f"Деталь {i}",) for i in range(parts)],
+        )
+        db.executemany(
+            "INSERT INTO orders (client_name, car_model, car_number, date, total_price, status, employee_id) "
+            "VALUES (?, 'Лада', 'А001ВС77', '2024-01-01', 1000, 'завершен', 1)",
+            [(f"Клиент {i}",) for i in range(orders)],
+        )
+        db.commit()
+
+async def drive(target: FastAPI, requests: int, concurrency: int, parts: int):
+    latencies = []
+    counter = iter(range(requests))
+    transport = httpx.ASGITransport(app=target)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def worker():
+            for i in counter:
+                url = ROUTES[i % len(ROUTES)].format(id=i % parts + 1)
+                started = time.perf_counter()
+                response = await client.get(url)
+                latencies.append(time.perf_counter() - started)
+                assert response.status_code == 200, response.text
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "rps": requests / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[50, 100, 200])
+    parser.add_argument("--parts", type=int, default=500)
+    parser.add_argument("--orders", type=int, default=5000)
+    args = parser.parse_args()
+
+    database.DATABASE_URL = os.path.join(tempfile.mkdtemp(prefix="bench_async_"), "autobatya.db")
+    database.init_db()
+    seed(args.parts, args.orders)
+    from app.endpoints import app as async_app
+
+    targets = {"sync": build_sync_app(), "async": async_app}
+    print(f"{'клиентов':>8} {'режим':<6} {'запр/с':>8} {'p50, мс':>8} {'p95, мс':>8}")
+    for concurrency in args.concurrency:
+        for name, target in targets.items():
+            result = asyncio.run(drive(target, args.requests, concurrency, args.parts))
+            print(f"{concurrency:>8} {name:<6} {result['rps']:>8.0f} "
+                  f"{result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f}")
+    database.close_db()
+
+if __name__ == "__main__":
+    main()
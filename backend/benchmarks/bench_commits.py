@@ -0,0 +1,149 @@
+"""
+Количество коммитов и время на одну операцию с деталями заказа.
+
+Коммиты считаются через trace callback SQLite (каждый выполненный COMMIT).
+Каждая операция выполняется дважды: как есть (одна транзакция на операцию)
+и с коммитом после каждой изменяющей инструкции - так работали эти функции
+до transaction(), это базовая линия для сравнения.
+Запуск из каталога backend:
+
+    python -m benchmarks.bench_commits --requests 500
+"""
+import argparse
+import os
+import re
+import tempfile
+import time
+
+from app import database
+from app.crud import create_order_detail, delete_order_detail, update_order_detail
+from app.models import OrderDetailCreate
+
+_WRITE = re.compile(r"^\s*(INSERT|UPDATE|DELETE|REPLACE)\b", re.IGNORECASE)
+
+class _Fetched:
+    """Результат инструкции, дочитанный до коммита (RETURNING не дает коммитить)."""
+
+    def __init__(self, cursor, rows):
+        self.lastrowid = cursor.lastrowid
+        self.rowcount = cursor.rowcount
+        self.description = cursor.description
+        self._rows = rows
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+class _Cursor:
+    """Курсор обертки: атрибуты берутся у результата последней инструкции."""
+
+    def __init__(self, conn: "PerStatementCommits"):
+        self._conn = conn
+        self._result = None
+
+    def execute(self, sql: str, parameters=()):
+        self._result = self._conn.execute(sql, parameters)
+        return self
+
+    def executemany(self, sql: str, parameters):
+        self._result = self._conn.executemany(sql, parameters)
+        return self
+
+    def __getattr__(self, name):
+        return getattr(self._result, name)
+
+    def __iter__(self):
+        return iter(self._result)
+
+class PerStatementCommits:
+    """
+    Обертка соединения: внутри transaction() фиксирует каждую изменяющую
+    инструкцию отдельным коммитом и сразу открывает следующую транзакцию.
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self):
+        return _Cursor(self)
+
+    def _commit_each(self, cursor, sql: str):
+        # Версии таблиц transaction() пишет перед своим коммитом - он и будет последним
+        if not (self._conn.in_transaction and _WRITE.match(sql)) or "change_versions" in sql:
+            return cursor
+        fetched = _Fetched(cursor, cursor.fetchall())
+        self._conn.commit()
+        self._conn.execute("BEGIN IMMEDIATE")
+        return fetched
+
+    def execute(self, sql: str, parameters=()):
+        return self._commit_each(self._conn.execute(sql, parameters), sql)
+
+    def executemany(self, sql: str, parameters):
+        return self._commit_each(self._conn.executemany(sql, parameters), sql)
+
+def seed(conn, orders: int):
+    conn.execute(
+        "INSERT INTO employees (name, position, salary, hire_date, phone) "
+        "VALUES ('Механик', 'механик', 50000, '2020-01-01', '+7')"
+    )
+    conn.execute(
+        "INSERT INTO parts (name, price, quantity, supplier) VALUES ('Фильтр', 500, 1000000, NULL)"
+    )
+    conn.executemany(
+        "INSERT INTO orders (client_name, car_model, car_number, date, total_price, status, employee_id) "
+        "VALUES ('Клиент', 'Лада', 'А001ВС77', '2024-01-01', 0, 'в работе', 1)",
+        [()] * orders,
+    )
+    conn.commit()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    database.DATABASE_URL = os.path.join(tempfile.mkdtemp(prefix="bench_commits_"), "autobatya.db")
+    database.init_db()
+    commits = 0
+
+    def trace(statement: str):
+        nonlocal commits
+        if statement.strip().upper().startswith("COMMIT"):
+            commits += 1
+
+    def detail(i: int, quantity: int) -> OrderDetailCreate:
+        return OrderDetailCreate(order_id=i % args.requests + 1, part_id=1, quantity=quantity, price=500)
+
+    with database.get_db() as conn:
+        seed(conn, args.requests)
+        conn.set_trace_callback(trace)
+        print(f"{'операция':<22} {'коммиты':<14} {'коммитов/запрос':>16} {'мс/запрос':>10}")
+        for mode, db in (("транзакция", conn), ("по инструкции", PerStatementCommits(conn))):
+            created = []
+            operations = [
+                ("create_order_detail", lambda i: created.append(create_order_detail(db, detail(i, 1))["id"])),
+                ("update_order_detail", lambda i: update_order_detail(db, created[i], detail(i, 2))),
+                ("delete_order_detail", lambda i: delete_order_detail(db, created[i])),
+            ]
+            for name, operation in operations:
+                commits = 0
+                started = time.perf_counter()
+                for i in range(args.requests):
+                    operation(i)
+                elapsed = time.perf_counter() - started
+                print(f"{name:<22} {mode:<14} {commits / args.requests:>16.2f} "
+                      f"{elapsed * 1000 / args.requests:>10.3f}")
+        conn.set_trace_callback(None)
+    database.close_db()
+
+if __name__ == "__main__":
+    main()
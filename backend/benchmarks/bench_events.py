@@ -0,0 +1,125 @@
+"""
+Лента /events: стоимость простаивающих подписчиков и задержка доставки.
+
+Открывается N потоков /events (приложение вызывается напрямую по ASGI),
+затем через API создаются заказы. Для каждого события меряется время от
+ответа на запись до получения события последним из подписчиков, а
+tracemalloc - память, которую занимают открытые потоки.
+Запуск из каталога backend:
+
+    python -m benchmarks.bench_events --subscribers 100 500 --writes 50
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import List
+
+import httpx
+
+from app import database
+from app.events import change_feed
+
+class Stream:
+    """
+    Открытый поток /events: считает полученные события.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.received = 0
+        self.changed = asyncio.Event()
+        self.closed = asyncio.Event()
+        self.task = None
+
+    def open(self):
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+            "method": "GET", "scheme": "http", "path": "/events", "raw_path": b"/events",
+            "query_string": b"tables=orders", "headers": [(b"host", b"bench")],
+            "client": ("127.0.0.1", 1), "server": ("bench", 80), "root_path": "",
+        }
+        request_sent = False
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await self.closed.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.body" and message.get("body", b"").startswith(b"id:"):
+                self.received += 1
+                self.changed.set()
+
+        self.task = asyncio.create_task(self.app(scope, receive, send))
+
+    async def wait_for(self, count: int):
+        while self.received < count:
+            self.changed.clear()
+            await self.changed.wait()
+
+async def run(app, subscribers: int, writes: int) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        employee = (await client.post("/employees/", json={
+            "name": "Bench", "position": "mechanic", "salary": 1,
+            "hire_date": "2024-01-01", "phone": "0",
+        })).json()
+
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        streams: List[Stream] = [Stream(app) for _ in range(subscribers)]
+        for stream in streams:
+            stream.open()
+        while change_feed.stats()["subscribers"] < subscribers:
+            await asyncio.sleep(0.01)
+        per_subscriber = (tracemalloc.get_traced_memory()[0] - baseline) / subscribers
+        tracemalloc.stop()
+
+        latencies = []
+        for i in range(writes):
+            response = await client.post("/orders/", json={
+                "client_name": "Bench", "car_model": "Lada", "car_number": f"B{i:03d}",
+                "date": "2024-01-01", "total_price": 0, "status": "в работе",
+                "employee_id": employee["id"],
+            })
+            assert response.status_code == 200, response.text
+            written = time.perf_counter()
+            await asyncio.gather(*(stream.wait_for(i + 1) for stream in streams))
+            latencies.append(time.perf_counter() - written)
+
+        for stream in streams:
+            stream.closed.set()
+        await asyncio.gather(*(stream.task for stream in streams))
+    latencies.sort()
+    return {
+        "subscribers": subscribers,
+        "kib_per_subscriber": per_subscriber / 1024,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "max_ms": latencies[-1] * 1000,
+    }
+
+async def main_async(args):
+    database.DATABASE_URL = os.path.join(tempfile.mkdtemp(prefix="bench_events_"), "autobatya.db")
+    from app.endpoints import app
+
+    async with app.router.lifespan_context(app):
+        print(f"{'подписчиков':>12} {'КиБ на подписчика':>18} {'доставка p50, мс':>17} {'max, мс':>8}")
+        for subscribers in args.subscribers:
+            result = await run(app, subscribers, args.writes)
+            print(f"{result['subscribers']:>12} {result['kib_per_subscriber']:>18.1f} "
+                  f"{result['p50_ms']:>17.2f} {result['max_ms']:>8.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--subscribers", type=int, nargs="+", default=[100, 500])
+    parser.add_argument("--writes", type=int, default=50)
+    asyncio.run(main_async(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Память при выгрузке /export против списка с большим limit.
+
+Приложение вызывается напрямую по ASGI, тело ответа отбрасывается по мере
+поступления (httpx.ASGITransport собрал бы его в памяти целиком). Пик
+выделенной памяти меряется tracemalloc для двух размеров таблицы; проверка
+завершается с кодом 1, если пик выгрузки растет вместе с таблицей.
+Запуск из каталога backend:
+
+    python -m benchmarks.bench_export --rows 20000 200000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import tracemalloc
+from urllib.parse import urlsplit
+
+from app import database
+from benchmarks.seed import SeedCounts, generate
+
+# Во сколько раз пик памяти выгрузки может вырасти при росте таблицы
+MAX_GROWTH = 1.5
+
+async def call(app, url: str) -> int:
+    """
+    Выполняет GET-запрос к ASGI-приложению и возвращает размер тела ответа.
+    """
+    parts = urlsplit(url)
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": parts.path, "raw_path": parts.path.encode(),
+        "query_string": parts.query.encode(), "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 1), "server": ("bench", 80), "root_path": "",
+    }
+    size = 0
+    status = None
+    request_sent = False
+    finished = asyncio.Event()
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal size, status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            size += len(message.get("body", b""))
+            if not message.get("more_body"):
+                finished.set()
+
+    await app(scope, receive, send)
+    assert status == 200, f"{url}: {status}"
+    return size
+
+def measure(app, url: str):
+    tracemalloc.reset_peak()
+    baseline = tracemalloc.get_traced_memory()[0]
+    size = asyncio.run(call(app, url))
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+    return size, peak
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs=2, default=[20000, 200000])
+    args = parser.parse_args()
+
+    from app.endpoints import app
+    tracemalloc.start()
+    peaks = {}
+    print(f"{'строк':>8} {'запрос':<32} {'ответ, КиБ':>11} {'пик памяти, КиБ':>16}")
+    for rows in args.rows:
+        database.close_db()
+        database.DATABASE_URL = os.path.join(tempfile.mkdtemp(prefix="bench_export_"), "autobatya.db")
+        database.init_db()
+        with database.get_db() as db:
+            generate(db, SeedCounts(employees=5, parts=0, services=0, orders=0, order_details=0,
+                                    salary_payments=0, expenses=rows))
+        for url in ("/export/expenses?format=csv", "/export/expenses?format=ndjson", f"/expenses/?limit={rows}"):
+            # Прогрев: первый запрос создает соединения и кэши
+            asyncio.run(call(app, url))
+            size, peak = measure(app, url)
+            peaks[(rows, url)] = peak
+            print(f"{rows:>8} {url:<32} {size / 1024:>11.0f} {peak / 1024:>16.0f}")
+    database.close_db()
+
+    small, large = args.rows
+    failed = False
+    for url in ("/export/expenses?format=csv", "/export/expenses?format=ndjson"):
+        growth = peaks[(large, url)] / max(peaks[(small, url)], 1)
+        ok = growth <= MAX_GROWTH
+        failed |= not ok
+        print(f"{url}: рост пика x{growth:.2f} при росте таблицы x{large / small:.0f} - "
+              f"{'OK' if ok else 'ПРЕВЫШЕН ПРЕДЕЛ'} (допустимо x{MAX_GROWTH})")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""
+Сериализация списков: валидация через response_model против trusted_rows.
+
+Для разного числа строк замеряется:
+    model    - путь FastAPI по умолчанию: каждая строка проходит через модель
+    orjson   - FastJSONResponse (trusted_rows) с orjson
+    json     - FastJSONResponse без orjson (запасной вариант)
+    e2e      - полный запрос GET /orders/?limit=N в обоих режимах
+
+Запуск из каталога backend:
+
+    python -m benchmarks.bench_serialization --rows 100 1000 10000
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from typing import List
+
+import httpx
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app import config, database, responses
+from app.crud import ORDER_COLUMNS
+from app.models import Order
+from benchmarks.seed import SeedCounts, generate
+
+try:
+    from pydantic import TypeAdapter
+except ImportError:  # pydantic v1
+    TypeAdapter = None
+
+def _best(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def _model_path(rows: List[dict]) -> bytes:
+    # То же, что делает FastAPI с response_model=List[Order]
+    if TypeAdapter is not None:
+        adapter = TypeAdapter(List[Order])
+        return adapter.dump_json(adapter.validate_python(rows))
+    return JSONResponse(jsonable_encoder([Order(**row) for row in rows])).body
+
+def _fast_path(rows: List[dict], use_orjson: bool) -> bytes:
+    saved = responses.orjson
+    if not use_orjson:
+        responses.orjson = None
+    try:
+        return responses.FastJSONResponse(rows).body
+    finally:
+        responses.orjson = saved
+
+async def _e2e(app, limit: int, requests: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.get("/orders/", params={"limit": limit})
+        started = time.perf_counter()
+        for _ in range(requests):
+            response = await client.get("/orders/", params={"limit": limit})
+            assert response.status_code == 200, response.text
+        return (time.perf_counter() - started) / requests
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    database.DATABASE_URL = os.path.join(tempfile.mkdtemp(prefix="bench_serialization_"), "autobatya.db")
+    database.init_db()
+    with database.get_db() as db:
+        generate(db, SeedCounts(orders=max(args.rows), order_details=0))
+        all_rows = [dict(row) for row in db.execute(f"SELECT {ORDER_COLUMNS} FROM orders ORDER BY id").fetchall()]
+    from app.endpoints import app
+
+    print(f"orjson: {'да' if responses.orjson is not None else 'нет'}")
+    print(f"{'строк':>7} {'model, мс':>10} {'orjson, мс':>11} {'json, мс':>9} "
+          f"{'e2e model, мс':>14} {'e2e fast, мс':>13}")
+    for count in args.rows:
+        rows = all_rows[:count]
+        model = _best(lambda: _model_path(rows), args.repeat)
+        fast = _best(lambda: _fast_path(rows, True), args.repeat)
+        plain = _best(lambda: _fast_path(rows, False), args.repeat)
+        requests = max(5, args.repeat // 2)
+        config.TRUSTED_ROWS = 0
+        e2e_model = asyncio.run(_e2e(app, count, requests))
+        config.TRUSTED_ROWS = 1
+        e2e_fast = asyncio.run(_e2e(app, count, requests))
+        print(f"{count:>7} {model * 1000:>10.2f} {fast * 1000:>11.2f} {plain * 1000:>9.2f} "
+              f"{e2e_model * 1000:>14.2f} {e2e_fast * 1000:>13.2f}")
+    database.close_db()
+
+if __name__ == "__main__":
+    main()
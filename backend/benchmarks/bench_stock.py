@@ -0,0 +1,132 @@
+"""
+Стресс-тест списания деталей: остаток не уходит в минус.
+
+Запускается настоящий сервер (uvicorn, --workers N) на чистой базе с
+несколькими деталями в малом количестве, и много параллельных "механиков"
+добавляют в заказы строки с этими деталями, часть - пакетами. Успешные
+ответы и 409 (не хватило) считаются, затем по базе проверяется:
+остатки не отрицательны, и остаток каждой детали равен начальному минус
+количество в строках заказов (ничего не потеряно и не списано дважды).
+Запуск из каталога backend:
+
+    python -m benchmarks.bench_stock --workers 1 2 --requests 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import httpx
+
+from app import database
+from benchmarks.bench_workers import start_server, stop_server
+
+def prepare(db_path: str, parts: int, stock: int) -> Dict[str, object]:
+    database.DATABASE_URL = db_path
+    database.init_db()
+    with database.get_db() as db:
+        with database.transaction(db):
+            db.execute(
+                "INSERT INTO employees (name, position, salary, hire_date, phone) "
+                "VALUES ('Bench', 'механик', 1, '2024-01-01', '0')"
+            )
+            employee_id = db.execute("SELECT last_insert_rowid()").fetchone()[0]
+            db.execute(
+                "INSERT INTO orders (client_name, car_model, car_number, car_number_norm, date, "
+                "total_price, status, employee_id) VALUES ('Bench', 'Лада', 'А001АА77', 'А001АА77', "
+                "'2024-01-01', 0, 'в работе', ?)",
+                (employee_id,)
+            )
+            order_id = db.execute("SELECT last_insert_rowid()").fetchone()[0]
+            db.executemany(
+                "INSERT INTO parts (name, price, quantity) VALUES (?, 100, ?)",
+                [(f"Деталь {i}", stock) for i in range(parts)]
+            )
+            part_ids = [row[0] for row in db.execute("SELECT id FROM parts ORDER BY id")]
+    database.close_db()
+    return {"order_id": order_id, "part_ids": part_ids}
+
+async def hammer(url: str, order_id: int, part_ids: List[int], requests: int,
+                 concurrency: int, seed: int) -> Dict[int, int]:
+    rng = random.Random(seed)
+    counts = {200: 0, 409: 0}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    def line() -> dict:
+        return {"order_id": order_id, "part_id": rng.choice(part_ids),
+                "quantity": rng.randint(1, 3), "price": 100}
+
+    async def one(client: httpx.AsyncClient):
+        async with semaphore:
+            if rng.random() < 0.2:
+                response = await client.post("/order_details/batch", json=[line() for _ in range(3)])
+            else:
+                response = await client.post("/order_details/", json=line())
+        counts[response.status_code] = counts.get(response.status_code, 0) + 1
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60.0) as client:
+        await asyncio.gather(*(one(client) for _ in range(requests)))
+    return counts
+
+def verify(db_path: str, stock: int) -> List[str]:
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute(
+            """
+            SELECT p.id, p.quantity, COALESCE(SUM(d.quantity), 0)
+            FROM parts p
+            LEFT JOIN order_details d ON d.part_id = p.id
+            GROUP BY p.id
+            """
+        ).fetchall()
+    finally:
+        conn.close()
+    problems = []
+    for part_id, quantity, used in rows:
+        if quantity < 0:
+            problems.append(f"part {part_id}: negative stock {quantity}")
+        if quantity != stock - used:
+            problems.append(f"part {part_id}: stock {quantity}, expected {stock} - {used} = {stock - used}")
+    return problems
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2])
+    parser.add_argument("--parts", type=int, default=5)
+    parser.add_argument("--stock", type=int, default=100, help="начальный остаток каждой детали")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'воркеров':>8} {'запросов':>8} {'успешно':>8} {'409':>6} {'прочие':>6} {'запр/с':>7}  результат")
+    for workers in args.workers:
+        db_path = os.path.join(tempfile.mkdtemp(prefix="bench_stock_"), "autobatya.db")
+        setup = prepare(db_path, args.parts, args.stock)
+        process = start_server(db_path, workers, args.port)
+        try:
+            started = time.perf_counter()
+            counts = asyncio.run(hammer(f"http://127.0.0.1:{args.port}", setup["order_id"],
+                                        setup["part_ids"], args.requests, args.concurrency, args.seed))
+            elapsed = time.perf_counter() - started
+        finally:
+            stop_server(process)
+        problems = verify(db_path, args.stock)
+        failed = failed or bool(problems)
+        other = sum(count for status, count in counts.items() if status not in (200, 409))
+        print(f"{workers:>8} {args.requests:>8} {counts[200]:>8} {counts[409]:>6} {other:>6} "
+              f"{args.requests / elapsed:>7.0f}  {'ошибка' if problems else 'остатки сходятся'}")
+        for problem in problems:
+            print("  " + problem)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""
+Пропускная способность чтения во время записи.
+
+Сравнивает старую схему (журнал отката, каждый поток пишет в базу сам)
+с режимом WAL и очередью записи. Запуск из каталога backend:
+
+    python -m benchmarks.bench_wal --seconds 5 --readers 4 --writers 2
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from app import config, database
+from app.crud import create_order_detail, get_financial_stats, get_orders
+from app.models import OrderDetailCreate
+
+MODES = {
+    "legacy": {"journal_mode": "DELETE", "synchronous": "FULL", "write_queue": False},
+    "wal": {"journal_mode": "WAL", "synchronous": "NORMAL", "write_queue": True},
+}
+
+def seed(conn: sqlite3.Connection, orders: int, parts: int):
+    conn.execute(
+        "INSERT INTO employees (name, position, salary, hire_date, phone) "
+        "VALUES ('Механик', 'механик', 50000, '2020-01-01', '+7')"
+    )
+    conn.executemany(
+        "INSERT INTO parts (name, price, quantity, supplier) VALUES (?, ?, ?, ?)",
+        [(f"Деталь {i}", 100 + i, 1_000_000, "Поставщик") for i in range(parts)],
+    )
+    conn.executemany(
+        "INSERT INTO orders (client_name, car_model, car_number, date, total_price, status, employee_id) "
+        "VALUES (?, ?, ?, ?, ?, ?, 1)",
+        [(f"Клиент {i}", "Лада", f"А{i:03d}ВС77", f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}",
+          1000.0, "завершен") for i in range(orders)],
+    )
+    conn.commit()
+
+def run_mode(name: str, seconds: float, readers: int, writers: int, orders: int, parts: int):
+    mode = MODES[name]
+    workdir = tempfile.mkdtemp(prefix=f"bench_{name}_")
+    database.DATABASE_URL = os.path.join(workdir, "autobatya.db")
+    config.DB_JOURNAL_MODE = mode["journal_mode"]
+    config.DB_SYNCHRONOUS = mode["synchronous"]
+    database.init_db()
+    with database.get_db() as conn:
+        seed(conn, orders, parts)
+
+    stop = threading.Event()
+    counters = {"reads": 0, "read_errors": 0, "writes": 0, "write_errors": 0}
+    lock = threading.Lock()
+
+    def bump(key: str):
+        with lock:
+            counters[key] += 1
+
+    def reader():
+        while not stop.is_set():
+            try:
+                with database.get_db() as db:
+                    get_orders(db, 0, 100)
+                    get_financial_stats(db)
+                bump("reads")
+            except sqlite3.OperationalError:
+                bump("read_errors")
+
+    def writer(worker: int):
+        i = 0
+        while not stop.is_set():
+            i += 1
+            detail = OrderDetailCreate(
+                order_id=(worker * 7919 + i) % orders + 1,
+                part_id=i % parts + 1,
+                quantity=1,
+                price=150.0,
+            )
+            try:
+                if mode["write_queue"]:
+                    database.run_write(create_order_detail, detail)
+                else:
+                    with database.get_db() as db:
+                        create_order_detail(db, detail)
+                bump("writes")
+            except sqlite3.OperationalError:
+                bump("write_errors")
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads += [threading.Thread(target=writer, args=(w,)) for w in range(writers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    database.close_db()
+
+    return {
+        "mode": name,
+        "reads_per_sec": counters["reads"] / elapsed,
+        "writes_per_sec": counters["writes"] / elapsed,
+        "read_errors": counters["read_errors"],
+        "write_errors": counters["write_errors"],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--orders", type=int, default=5000)
+    parser.add_argument("--parts", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'режим':<8} {'чтений/с':>10} {'записей/с':>10} {'ошибок чт.':>11} {'ошибок зап.':>12}")
+    for name in MODES:
+        result = run_mode(name, args.seconds, args.readers, args.writers, args.orders, args.parts)
+        print(f"{result['mode']:<8} {result['reads_per_sec']:>10.1f} {result['writes_per_sec']:>10.1f} "
+              f"{result['read_errors']:>11} {result['write_errors']:>12}")
+
+if __name__ == "__main__":
+    main()
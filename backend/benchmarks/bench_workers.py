@@ -0,0 +1,129 @@
+"""
+Масштабирование по числу процессов-воркеров uvicorn.
+
+База заполняется генератором benchmarks.seed, затем для каждого числа
+воркеров запускается настоящий сервер (python -m uvicorn --workers N) и
+нагружается сценариями benchmarks.loadtest по HTTP. Клиентов нагрузки
+может быть несколько (--clients): на многоядерной машине один процесс
+клиента сам упирается в ядро раньше сервера.
+Запуск из каталога backend:
+
+    python -m benchmarks.bench_workers --workers 1 2 4 --clients 2
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+
+import httpx
+
+from app import database
+from benchmarks import loadtest
+from benchmarks.seed import add_count_arguments, counts_from_args, generate
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def start_server(db_path: str, workers: int, port: int) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "AUTOBATYA_DATABASE_URL": db_path,
+        "AUTOBATYA_WORKERS": str(workers),
+    }
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.endpoints:app", "--host", "127.0.0.1",
+         "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with code {process.returncode}")
+        try:
+            httpx.get(f"{url}/stats/pool", timeout=1.0)
+            return process
+        except httpx.TransportError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("uvicorn did not start in 30 s")
+
+def stop_server(process: subprocess.Popen):
+    process.terminate()
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+def run_client(db_path: str, url: str, mix: Dict[str, float], iterations: int,
+               concurrency: int, warmup: int, seed: int) -> dict:
+    """
+    Один процесс клиента нагрузки (выполняется в ProcessPoolExecutor).
+    """
+    database.DATABASE_URL = db_path
+    with database.get_db() as db:
+        ctx = loadtest.Context(db)
+    database.close_db()
+    return asyncio.run(loadtest.run(None, ctx, mix, iterations, concurrency, warmup, seed, url))
+
+def measure(db_path: str, url: str, args) -> dict:
+    per_client = max(1, args.iterations // args.clients)
+    with ProcessPoolExecutor(args.clients) as pool:
+        futures = [
+            pool.submit(run_client, db_path, url, args.mix, per_client,
+                        args.concurrency, args.warmup, args.seed + i)
+            for i in range(args.clients)
+        ]
+        results: List[dict] = [future.result() for future in futures]
+    # Клиенты работают одновременно: суммарная пропускная способность -
+    # все запросы за время самого долгого из них
+    elapsed = max(result["elapsed_s"] for result in results)
+    count = sum(result["total"]["count"] for result in results)
+    return {
+        "rps": count / elapsed if elapsed else 0.0,
+        "errors": sum(result["total"]["errors"] for result in results),
+        "p50_ms": max(result["total"]["p50_ms"] for result in results),
+        "p95_ms": max(result["total"]["p95_ms"] for result in results),
+        "p99_ms": max(result["total"]["p99_ms"] for result in results),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=1, help="процессов клиента нагрузки")
+    parser.add_argument("--mix", type=loadtest.parse_mix, default=loadtest.parse_mix(loadtest.DEFAULT_MIX))
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=20, help="одновременных запросов на клиента")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--port", type=int, default=8765)
+    add_count_arguments(parser)
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix="bench_workers_"), "autobatya.db")
+    database.DATABASE_URL = db_path
+    database.init_db()
+    with database.get_db() as db:
+        generate(db, counts_from_args(args), args.seed)
+    database.close_db()
+
+    print(f"ядер: {os.cpu_count()}, клиентов: {args.clients}")
+    print(f"{'воркеров':>8} {'запр/с':>8} {'ускорение':>10} {'ошибок':>6} "
+          f"{'p50, мс':>8} {'p95, мс':>8} {'p99, мс':>8}")
+    baseline = None
+    for workers in args.workers:
+        process = start_server(db_path, workers, args.port)
+        try:
+            result = measure(db_path, f"http://127.0.0.1:{args.port}", args)
+        finally:
+            stop_server(process)
+        baseline = baseline or result["rps"]
+        print(f"{workers:>8} {result['rps']:>8.0f} {result['rps'] / baseline:>9.2f}x {result['errors']:>6} "
+              f"{result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Сравнение двух результатов benchmarks.loadtest.
+
+    python -m benchmarks.compare before.json after.json
+"""
+import argparse
+import json
+
+def _delta(old: float, new: float) -> str:
+    if not old:
+        return "-"
+    return f"{(new - old) / old * 100:+.0f}%"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("before")
+    parser.add_argument("after")
+    args = parser.parse_args()
+
+    with open(args.before, encoding="utf-8") as f:
+        before = json.load(f)
+    with open(args.after, encoding="utf-8") as f:
+        after = json.load(f)
+
+    print(f"{before.get('commit', '?')} -> {after.get('commit', '?')}")
+    print(f"{'эндпоинт':<32} {'p50, мс':>16} {'p95, мс':>16} {'p99, мс':>16} {'запр/с':>14}")
+    rows = [(name, before["endpoints"].get(name), stats) for name, stats in after["endpoints"].items()]
+    rows.append(("ВСЕГО", before["total"], after["total"]))
+    for name, old, new in rows:
+        if old is None:
+            print(f"{name:<32} (нет в {args.before})")
+            continue
+        cells = [
+            f"{new[key]:>7.1f} {_delta(old[key], new[key]):>8}"
+            for key in ("p50_ms", "p95_ms", "p99_ms")
+        ]
+        print(f"{name:<32} {' '.join(cells)} {new['rps']:>6.0f} {_delta(old['rps'], new['rps']):>7}")
+
+if __name__ == "__main__":
+    main()
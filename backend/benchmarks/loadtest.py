@@ -0,0 +1,287 @@
+"""
+Нагрузочный тест API на смеси типичных сценариев.
+
+Сценарии:
+    dashboard    - обновление дашборда: статистика, отчеты, последние заказы
+    order_entry  - оформление заказа: справочники, заказ, пакет деталей
+    reports      - отчеты и выборки за случайный период
+
+База заполняется генератором benchmarks.seed во временном каталоге,
+приложение вызывается в процессе через httpx.ASGITransport (или по HTTP
+уже запущенный сервер, --url вместе с его базой --db). Результат -
+JSON с p50/p95/p99 и пропускной способностью по каждому эндпоинту;
+два таких файла сравнивает benchmarks.compare. Запуск из каталога backend:
+
+    python -m benchmarks.loadtest --iterations 2000 --concurrency 50 --out before.json
+    python -m benchmarks.loadtest --mix dashboard=1 --orders 50000 --out dashboard.json
+    python -m benchmarks.loadtest --url http://127.0.0.1:8000 --db autobatya.db
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+from app import database
+from benchmarks.seed import add_count_arguments, counts_from_args, generate
+
+class Recorder:
+    """
+    Собирает задержки запросов по именам эндпоинтов.
+    """
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+
+    async def call(self, client: httpx.AsyncClient, name: str, method: str, url: str, **kwargs) -> httpx.Response:
+        started = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        self.latencies.setdefault(name, []).append(time.perf_counter() - started)
+        if response.status_code >= 400:
+            self.errors[name] = self.errors.get(name, 0) + 1
+        return response
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """
+    Перцентиль методом ближайшего ранга.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, min(len(sorted_values), round(p / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[rank - 1]
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> dict:
+    values = sorted(latencies)
+    return {
+        "count": len(values),
+        "errors": errors,
+        "rps": round(len(values) / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(sum(values) / len(values) * 1000, 2) if values else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1000, 2),
+        "p95_ms": round(percentile(values, 95) * 1000, 2),
+        "p99_ms": round(percentile(values, 99) * 1000, 2),
+        "max_ms": round(values[-1] * 1000, 2) if values else 0.0,
+    }
+
+# ========== Сценарии ==========
+class Context:
+    """
+    Сведения о базе, нужные сценариям: диапазоны id и дат.
+    Снимаются с самой базы, поэтому подходят и для готовой базы (--db).
+    """
+
+    TABLES = ("employees", "parts", "services")
+
+    def __init__(self, db):
+        self.ids = {
+            table: tuple(db.execute(f"SELECT MIN(id), MAX(id) FROM {table}").fetchone())
+            for table in self.TABLES
+        }
+        first, last = db.execute("SELECT MIN(date), MAX(date) FROM orders").fetchone()
+        self.start = date.fromisoformat(first) if first else date.today()
+        self.days = (date.fromisoformat(last) - self.start).days + 1 if last else 1
+
+    def random_id(self, rng: random.Random, table: str) -> int:
+        first, last = self.ids[table]
+        return rng.randint(first or 1, last or 1)
+
+    def random_period(self, rng: random.Random):
+        start = self.start + timedelta(days=rng.randrange(self.days))
+        end = start + timedelta(days=rng.choice([7, 30, 90, 365]))
+        return start.isoformat(), end.isoformat()
+
+Scenario = Callable[[httpx.AsyncClient, Recorder, random.Random, Context], Awaitable[None]]
+
+async def dashboard(client: httpx.AsyncClient, rec: Recorder, rng: random.Random, ctx: Context):
+    await rec.call(client, "GET /stats/financial", "GET", "/stats/financial")
+    await rec.call(client, "GET /stats/employees", "GET", "/stats/employees")
+    await rec.call(client, "GET /reports/parts", "GET", "/reports/parts", params={"min_quantity": 5})
+    await rec.call(client, "GET /orders/", "GET", "/orders/", params={"limit": 10})
+
+async def order_entry(client: httpx.AsyncClient, rec: Recorder, rng: random.Random, ctx: Context):
+    await rec.call(client, "GET /services/", "GET", "/services/")
+    await rec.call(client, "GET /parts/", "GET", "/parts/", params={"limit": 100})
+    response = await rec.call(client, "POST /orders/", "POST", "/orders/", json={
+        "client_name": f"Клиент {rng.randrange(10000)}",
+        "car_model": "Лада Веста",
+        "car_number": f"А{rng.randrange(1000):03d}ВС77",
+        "date": date.today().isoformat(),
+        "status": rng.choice(["в работе", "завершен"]),
+        "employee_id": ctx.random_id(rng, "employees"),
+    })
+    if response.status_code != 200:
+        return
+    order_id = response.json()["id"]
+    lines = []
+    for _ in range(rng.randrange(1, 5)):
+        if rng.random() < 0.5:
+            lines.append({"order_id": order_id, "quantity": 1, "price": 1500.0,
+                          "service_id": ctx.random_id(rng, "services")})
+        else:
+            lines.append({"order_id": order_id, "quantity": 1, "price": 800.0,
+                          "part_id": ctx.random_id(rng, "parts")})
+    await rec.call(client, "POST /order_details/batch", "POST", "/order_details/batch", json=lines)
+    await rec.call(client, "GET /orders/{order_id}", "GET", f"/orders/{order_id}")
+
+async def reports(client: httpx.AsyncClient, rec: Recorder, rng: random.Random, ctx: Context):
+    start, end = ctx.random_period(rng)
+    period = {"start_date": start, "end_date": end}
+    await rec.call(client, "GET /stats/financial?period", "GET", "/stats/financial", params=period)
+    await rec.call(client, "GET /reports/orders", "GET", "/reports/orders", params=period)
+    await rec.call(client, "GET /expenses/", "GET", "/expenses/", params={"limit": 100})
+    await rec.call(client, "GET /salary_payments/", "GET", "/salary_payments/", params={"limit": 100})
+
+SCENARIOS: Dict[str, Scenario] = {
+    "dashboard": dashboard,
+    "order_entry": order_entry,
+    "reports": reports,
+}
+
+DEFAULT_MIX = "dashboard=60,order_entry=25,reports=15"
+
+def parse_mix(value: str) -> Dict[str, float]:
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"неизвестный сценарий: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+# ========== Прогон ==========
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+async def run(app, ctx: Context, mix: Dict[str, float], iterations: int,
+              concurrency: int, warmup: int, seed: int, url: Optional[str] = None) -> dict:
+    """
+    Прогон сценариев: в процессе (app) или по HTTP против сервера url.
+    """
+    rng = random.Random(seed)
+    names = list(mix)
+    plan = rng.choices(names, weights=[mix[name] for name in names], k=warmup + iterations)
+    recorder = Recorder()
+    if url is None:
+        client_args = {"transport": httpx.ASGITransport(app=app), "base_url": "http://loadtest"}
+        lifespan = app.router.lifespan_context(app)
+    else:
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        client_args = {"base_url": url, "limits": limits, "timeout": 60.0}
+        lifespan = contextlib.nullcontext()
+    async with lifespan:
+        async with httpx.AsyncClient(**client_args) as client:
+            # Прогрев не попадает в статистику
+            warmup_recorder = Recorder()
+            for name in plan[:warmup]:
+                await SCENARIOS[name](client, warmup_recorder, rng, ctx)
+
+            queue = iter(plan[warmup:])
+            runs = {name: 0 for name in names}
+
+            async def worker(worker_rng: random.Random):
+                for name in queue:
+                    await SCENARIOS[name](client, recorder, worker_rng, ctx)
+                    runs[name] += 1
+
+            started = time.perf_counter()
+            await asyncio.gather(*(worker(random.Random(rng.random())) for _ in range(concurrency)))
+            elapsed = time.perf_counter() - started
+
+    all_latencies = [value for values in recorder.latencies.values() for value in values]
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "scenarios": runs,
+        "total": summarize(all_latencies, sum(recorder.errors.values()), elapsed),
+        "endpoints": {
+            name: summarize(values, recorder.errors.get(name, 0), elapsed)
+            for name, values in sorted(recorder.latencies.items())
+        },
+    }
+
+def print_table(result: dict):
+    print(f"{'эндпоинт':<32} {'запросов':>8} {'ошибок':>6} {'запр/с':>8} "
+          f"{'p50, мс':>8} {'p95, мс':>8} {'p99, мс':>8}")
+    rows = list(result["endpoints"].items()) + [("ВСЕГО", result["total"])]
+    for name, stats in rows:
+        print(f"{name:<32} {stats['count']:>8} {stats['errors']:>6} {stats['rps']:>8.0f} "
+              f"{stats['p50_ms']:>8.1f} {stats['p95_ms']:>8.1f} {stats['p99_ms']:>8.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f"веса сценариев (по умолчанию {DEFAULT_MIX})")
+    parser.add_argument("--iterations", type=int, default=1000, help="число прогонов сценариев")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--db", help="готовая база вместо генерации во временном каталоге")
+    parser.add_argument("--url", help="адрес запущенного сервера (нужна его база в --db)")
+    parser.add_argument("--out", help="файл для JSON-результата (по умолчанию - stdout)")
+    add_count_arguments(parser)
+    args = parser.parse_args()
+
+    counts = counts_from_args(args)
+    if args.url and not args.db:
+        parser.error("--url требует --db: сценариям нужны диапазоны id из базы сервера")
+    if args.db:
+        database.DATABASE_URL = args.db
+        database.init_db()
+    else:
+        database.DATABASE_URL = os.path.join(tempfile.mkdtemp(prefix="loadtest_"), "autobatya.db")
+        database.init_db()
+        with database.get_db() as db:
+            generate(db, counts, args.seed)
+    with database.get_db() as db:
+        ctx = Context(db)
+    database.close_db()
+    app = None
+    if not args.url:
+        from app.endpoints import app
+
+    result = asyncio.run(run(app, ctx, args.mix, args.iterations, args.concurrency,
+                             args.warmup, args.seed, args.url))
+    report = {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "params": {
+            "mix": args.mix,
+            "iterations": args.iterations,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+            "db": args.db,
+            "url": args.url,
+            "counts": None if args.db else {
+                name: value for name, value in vars(counts).items() if isinstance(value, int)
+            },
+        },
+        **result,
+    }
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print_table(result)
+    else:
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+
+if __name__ == "__main__":
+    main()
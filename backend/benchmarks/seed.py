@@ -0,0 +1,180 @@
+"""
+Генератор синтетических данных для нагрузочных тестов.
+
+Заполняет базу сотрудниками, деталями, услугами, заказами с деталями,
+выплатами зарплат и расходами в заданных количествах. Генерация
+детерминирована (--seed), поэтому прогоны на разных коммитах сравнимы.
+Запуск из каталога backend:
+
+    python -m benchmarks.seed --db bench.db --orders 20000 --expenses 5000
+"""
+import argparse
+import random
+import sqlite3
+import time
+from dataclasses import dataclass, fields
+from datetime import date, timedelta
+
+from app.vehicles import normalize_car_number
+
+STATUSES = ["в работе", "завершен", "завершен", "завершен", "отменен"]
+CATEGORIES = ["зарплаты", "детали", "аренда", "другое"]
+CAR_MODELS = ["Лада Веста", "Kia Rio", "Hyundai Solaris", "Renault Logan", "VW Polo", "Skoda Octavia"]
+PLATE_LETTERS = "АВЕКМНОРСТУХ"
+CLIENT_NAMES = ["Иванов", "Петров", "Сидоров", "Кузнецов", "Смирнов", "Попов", "Волков", "Соколов"]
+PART_NAMES = ["Фильтр масляный", "Колодки тормозные", "Свеча зажигания", "Ремень ГРМ", "Амортизатор", "Лампа"]
+SERVICE_NAMES = ["Замена масла", "Диагностика", "Шиномонтаж", "Развал-схождение", "Замена колодок"]
+POSITIONS = ["механик", "мастер-приемщик", "электрик", "администратор"]
+
+@dataclass
+class SeedCounts:
+    employees: int = 20
+    parts: int = 500
+    services: int = 50
+    orders: int = 10000
+    order_details: int = 30000
+    salary_payments: int = 1000
+    expenses: int = 3000
+    # Данные распределяются по дням начиная с этой даты
+    start: date = date(2022, 1, 1)
+    days: int = 3 * 365
+
+def _day(rng: random.Random, counts: SeedCounts) -> str:
+    return (counts.start + timedelta(days=rng.randrange(counts.days))).isoformat()
+
+def _plate(rng: random.Random) -> str:
+    letters = "".join(rng.choice(PLATE_LETTERS) for _ in range(3))
+    return f"{letters[0]}{rng.randrange(1000):03d}{letters[1:]}{rng.choice([77, 97, 177, 50, 199])}"
+
+def generate(db: sqlite3.Connection, counts: SeedCounts, seed: int = 42) -> dict:
+    """
+    Вставляет синтетические данные одним коммитом.
+    Возвращает количество вставленных строк по таблицам.
+    """
+    rng = random.Random(seed)
+    cursor = db.cursor()
+    cursor.executemany(
+        "INSERT INTO employees (name, position, salary, hire_date, phone, email) VALUES (?, ?, ?, ?, ?, ?)",
+        [
+            (f"{rng.choice(CLIENT_NAMES)} {i}", rng.choice(POSITIONS), rng.randrange(40, 120) * 1000.0,
+             _day(rng, counts), f"+7{rng.randrange(10**9, 10**10)}", None)
+            for i in range(counts.employees)
+        ],
+    )
+    cursor.executemany(
+        "INSERT INTO parts (name, price, quantity, supplier) VALUES (?, ?, ?, ?)",
+        [
+            (f"{rng.choice(PART_NAMES)} #{i}", float(rng.randrange(100, 20000)), rng.randrange(0, 200),
+             rng.choice(["Автодок", "Экзист", None]))
+            for i in range(counts.parts)
+        ],
+    )
+    cursor.executemany(
+        "INSERT INTO services (name, price, duration) VALUES (?, ?, ?)",
+        [
+            (f"{rng.choice(SERVICE_NAMES)} #{i}", float(rng.randrange(500, 15000)), rng.choice([0.5, 1, 1.5, 2, 4]))
+            for i in range(counts.services)
+        ],
+    )
+    first_employee = cursor.execute("SELECT MIN(id) FROM employees").fetchone()[0] or 1
+    cursor.executemany(
+        """
+        INSERT INTO orders (client_name, car_model, car_number, date, total_price, status, employee_id)
+        VALUES (?, ?, ?, ?, 0, ?, ?)
+        """,
+        [
+            (f"{rng.choice(CLIENT_NAMES)} {rng.randrange(5000)}", rng.choice(CAR_MODELS), _plate(rng),
+             _day(rng, counts), rng.choice(STATUSES), first_employee + rng.randrange(counts.employees))
+            for _ in range(counts.orders)
+        ],
+    )
+    # Нормализованный номер - как при записи через API (см. app/vehicles.py)
+    db.create_function("normalize_car_number", 1, normalize_car_number, deterministic=True)
+    cursor.execute("UPDATE orders SET car_number_norm = normalize_car_number(car_number) "
+                   "WHERE car_number_norm IS NULL")
+    first_order = cursor.execute("SELECT MIN(id) FROM orders").fetchone()[0] or 1
+    first_part = cursor.execute("SELECT MIN(id) FROM parts").fetchone()[0] or 1
+    first_service = cursor.execute("SELECT MIN(id) FROM services").fetchone()[0] or 1
+    details = []
+    for _ in range(counts.order_details if counts.orders else 0):
+        order_id = first_order + rng.randrange(counts.orders)
+        if counts.services and (not counts.parts or rng.random() < 0.5):
+            details.append((order_id, first_service + rng.randrange(counts.services), None,
+                            1, float(rng.randrange(500, 15000))))
+        elif counts.parts:
+            details.append((order_id, None, first_part + rng.randrange(counts.parts),
+                            rng.randrange(1, 5), float(rng.randrange(100, 20000))))
+    cursor.executemany(
+        "INSERT INTO order_details (order_id, service_id, part_id, quantity, price) VALUES (?, ?, ?, ?, ?)",
+        details,
+    )
+    # Суммы заказов согласованы с их деталями
+    cursor.execute(
+        """
+        UPDATE orders SET total_price = (
+            SELECT COALESCE(SUM(price * quantity), 0) FROM order_details WHERE order_id = orders.id
+        )
+        WHERE id >= ?
+        """,
+        (first_order,),
+    )
+    cursor.executemany(
+        "INSERT INTO salary_payments (employee_id, amount, date, bonus) VALUES (?, ?, ?, ?)",
+        [
+            (first_employee + rng.randrange(counts.employees), rng.randrange(40, 120) * 1000.0,
+             _day(rng, counts), rng.choice([0.0, 0.0, 5000.0, 10000.0]))
+            for _ in range(counts.salary_payments if counts.employees else 0)
+        ],
+    )
+    cursor.executemany(
+        "INSERT INTO expenses (name, amount, date, category) VALUES (?, ?, ?, ?)",
+        [
+            (f"Расход {i}", float(rng.randrange(500, 100000)), _day(rng, counts), rng.choice(CATEGORIES))
+            for i in range(counts.expenses)
+        ],
+    )
+    db.commit()
+    return {
+        "employees": counts.employees,
+        "parts": counts.parts,
+        "services": counts.services,
+        "orders": counts.orders,
+        "order_details": len(details),
+        "salary_payments": counts.salary_payments if counts.employees else 0,
+        "expenses": counts.expenses,
+    }
+
+def add_count_arguments(parser: argparse.ArgumentParser):
+    for field in fields(SeedCounts):
+        if field.type is int and field.name != "days":
+            parser.add_argument(f"--{field.name.replace('_', '-')}", type=int, default=field.default)
+    parser.add_argument("--seed", type=int, default=42)
+
+def counts_from_args(args: argparse.Namespace) -> SeedCounts:
+    return SeedCounts(**{
+        field.name: getattr(args, field.name)
+        for field in fields(SeedCounts)
+        if hasattr(args, field.name)
+    })
+
+def main():
+    from app import database
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--db", default=database.DATABASE_URL, help="файл базы (по умолчанию - рабочая база)")
+    add_count_arguments(parser)
+    args = parser.parse_args()
+
+    database.DATABASE_URL = args.db
+    database.init_db()
+    started = time.perf_counter()
+    with database.get_db() as db:
+        inserted = generate(db, counts_from_args(args), args.seed)
+    database.close_db()
+    elapsed = time.perf_counter() - started
+    for table, count in inserted.items():
+        print(f"{table:<16} {count:>8}")
+    print(f"готово за {elapsed:.1f} с")
+
+if __name__ == "__main__":
+    main()
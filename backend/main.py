@@ -1,5 +1,21 @@
-from app.endpoints import app
+import copy
 import uvicorn
+from uvicorn.config import LOGGING_CONFIG
+from app import config
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    # Логи приложения (миграции, медленные запросы) рядом с логами uvicorn.
+    # Настройка передается uvicorn, а не basicConfig: воркеры - отдельные процессы
+    log_config = copy.deepcopy(LOGGING_CONFIG)
+    log_config["loggers"]["app"] = {"handlers": ["default"], "level": "INFO", "propagate": False}
+    # Несколько воркеров (AUTOBATYA_WORKERS) работают с одной базой: схема
+    # обновляется под файловой блокировкой, кэш и ETag сверяются через change_versions.
+    # Открытые потоки /events сами не завершаются: при остановке ждем их не дольше 5 секунд
+    uvicorn.run(
+        "app.endpoints:app",
+        host="0.0.0.0",
+        port=8000,
+        workers=config.WORKERS,
+        log_config=log_config,
+        timeout_graceful_shutdown=5,
+    )
@@ -0,0 +1,49 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import pytest
+
+# Настройки читаются при импорте app.config, поэтому задаются до импорта приложения:
+# отдельная база для тестов и частая фоновая проверка change_versions
+_tmp = tempfile.mkdtemp(prefix="autobatya-tests-")
+os.environ["AUTOBATYA_DATABASE_URL"] = os.path.join(_tmp, "autobatya.db")
+os.environ["AUTOBATYA_VERSIONS_POLL_INTERVAL"] = "0.1"
+os.environ["AUTOBATYA_ORDER_TOTALS_VERIFY_INTERVAL"] = "0"
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def run_cli(*args: str):
+    # Отдельный процесс, как при запуске команды администратором
+    subprocess.run(
+        [sys.executable, "-m", *args], cwd=BACKEND_DIR, env=os.environ.copy(),
+        check=True, capture_output=True
+    )
+
+def wait_for_change(client, url: str, params: dict, etag: str, timeout: float = 5.0):
+    # Изменения других процессов сервер видит после фоновой проверки change_versions
+    deadline = time.monotonic() + timeout
+    while True:
+        response = client.get(url, params=params, headers={"If-None-Match": etag})
+        if response.status_code != 304 or time.monotonic() > deadline:
+            return response
+        time.sleep(0.05)
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    from app.endpoints import app
+
+    with TestClient(app) as client:
+        yield client
+
+@pytest.fixture
+def employee(client):
+    response = client.post("/employees/", json={
+        "name": "Тестов", "position": "механик", "salary": 100,
+        "hire_date": "2024-01-01", "phone": "1"
+    })
+    assert response.status_code == 200, response.text
+    return response.json()
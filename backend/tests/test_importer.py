@@ -0,0 +1,61 @@
+import io
+
+import pytest
+
+from app import database, importer
+
+def index_names(table: str):
+    with database.get_db() as db:
+        return {row[0] for row in db.execute(
+            "SELECT name FROM sqlite_master WHERE tbl_name = ? AND type IN ('index', 'trigger')",
+            (table,)
+        ).fetchall()}
+
+def deferred_rows():
+    with database.get_db() as db:
+        return db.execute("SELECT COUNT(*) FROM deferred_import").fetchone()[0]
+
+def test_endpoint_rejects_defer_indexes(client):
+    response = client.post(
+        "/import/expenses?defer_indexes=true",
+        content="name,amount,date,category\nx,5,2031-01-01,аренда\n".encode()
+    )
+    assert response.status_code == 400
+
+def test_failed_import_restores_deferred_indexes(client):
+    before = index_names("expenses")
+
+    def lines():
+        yield "name,amount,date,category\n"
+        yield "x,5,2031-01-02,аренда\n"
+        raise OSError("connection lost")
+
+    with pytest.raises(OSError):
+        importer.import_csv(lines(), "expenses", batch_size=1, defer_indexes=True)
+    assert index_names("expenses") == before
+    assert deferred_rows() == 0
+
+def test_init_db_restores_interrupted_import(client):
+    before = index_names("expenses")
+    # Сбой процесса импорта между снятием индексов и их восстановлением
+    db = database.connect()
+    try:
+        importer._drop_deferred(db, "expenses")
+    finally:
+        db.close()
+    assert index_names("expenses") < before
+    assert deferred_rows() == len(before)
+
+    database.init_db()
+    assert index_names("expenses") == before
+    assert deferred_rows() == 0
+    # Повторный старт ничего не меняет
+    database.init_db()
+    assert index_names("expenses") == before
+
+    rows = "name,amount,date,category\ny,7,2031-01-03,аренда\n"
+    report = importer.import_csv(io.StringIO(rows), "expenses", defer_indexes=True)
+    assert report["rows_imported"] == 1
+    assert index_names("expenses") == before
+    stats = client.get("/stats/financial", params={"start_date": "2031-01-03", "end_date": "2031-01-03"})
+    assert stats.json()["expenses"] == 7
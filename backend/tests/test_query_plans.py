@@ -0,0 +1,83 @@
+"""
+Планы горячих запросов: функции crud, которые стоят за отчетами,
+статистикой и списками, не должны читать таблицы целиком (строка плана
+"SCAN <таблица>" без индекса). SQL перехватывается при вызове на базе
+с синтетическими данными (benchmarks.seed) и проверяется через
+EXPLAIN QUERY PLAN.
+"""
+import re
+import sqlite3
+from typing import Callable, List, Tuple
+
+import pytest
+
+from app import crud
+from app.database import configure_connection
+from app.migrations import migrate
+from app.profiling import explain_query_plan
+from app.rollup import RAW_TOTALS
+from benchmarks.seed import SeedCounts, generate
+
+# Полное чтение таблицы; "SCAN t USING COVERING INDEX ..." - это чтение индекса
+_FULL_SCAN = re.compile(r"^\s*SCAN (\w+)(?: AS \w+)?\s*$")
+# Подзапрос FROM (...) x: "SCAN x" читает уже отобранные им строки, а не таблицу
+_SUBQUERY = re.compile(r"^\s*(?:MATERIALIZE|CO-ROUTINE) (\w+)\s*$")
+
+HOT_CALLS: List[Tuple[str, Callable]] = [
+    ("financial_stats", lambda db: crud.get_financial_stats(db, "2024-01-01", "2024-12-31")),
+    ("financial_timeseries", lambda db: crud.get_financial_timeseries(db, "income", "month", "2024-01-01", "2024-12-31")),
+    ("orders_report", lambda db: crud.get_orders_report(db, "завершен", "2024-01-01", "2024-12-31")),
+    ("orders_report_all_dates", lambda db: crud.get_orders_report(db, "завершен")),
+    ("parts_report", lambda db: crud.get_parts_report(db, 5)),
+    ("orders_by_status", lambda db: crud.get_orders_after(db, "2024-01-01", 0, 100, "в работе")),
+    ("orders_page", lambda db: crud.get_orders_after(db, "2024-01-01", 0, 100)),
+    ("search", lambda db: crud.search(db, "ива а12")),
+    ("recent_orders", lambda db: crud.get_recent_orders(db, 5)),
+    ("vehicle_history", lambda db: crud.get_vehicle_history(db, "а123вс77")),
+    ("order_details", lambda db: crud.get_order_details(db, 1)),
+    ("order_details_batch", lambda db: crud.get_order_details_for_orders(db, [1, 2, 3])),
+    ("salary_payments_by_employee", lambda db: crud.get_salary_payments_after(db, 1, 0, 100)),
+    ("expenses_by_category", lambda db: crud.get_expenses_after(db, "аренда", 0, 100)),
+    # Пересборка сводки daily_financials по исходным таблицам
+    ("rollup_totals", lambda db: db.execute(RAW_TOTALS).fetchall()),
+]
+
+def capture_statements(db, call: Callable) -> List[str]:
+    """
+    Выполняет call(db) и возвращает выполненные им SQL-запросы
+    (с подставленными значениями параметров).
+    """
+    statements: List[str] = []
+    db.set_trace_callback(statements.append)
+    try:
+        call(db)
+    finally:
+        db.set_trace_callback(None)
+    return statements
+
+def has_full_scan(plan: List[str]) -> bool:
+    subqueries = {match.group(1) for match in map(_SUBQUERY.match, plan) if match}
+    scans = [match.group(1) for match in map(_FULL_SCAN.match, plan) if match]
+    return any(scan not in subqueries for scan in scans)
+
+@pytest.fixture(scope="module")
+def seeded_db(tmp_path_factory):
+    # Отдельная база: синтетические данные не должны попасть в базу остальных тестов
+    db = sqlite3.connect(str(tmp_path_factory.mktemp("plans") / "plans.db"), check_same_thread=False)
+    db.row_factory = sqlite3.Row
+    configure_connection(db)
+    migrate(db)
+    generate(db, SeedCounts(orders=2000, order_details=6000, salary_payments=200, expenses=600))
+    yield db
+    db.close()
+
+@pytest.mark.parametrize("name, call", HOT_CALLS, ids=[name for name, _ in HOT_CALLS])
+def test_hot_call_has_no_full_scan(seeded_db, name, call):
+    statements = capture_statements(seeded_db, call)
+    assert statements
+    scans = []
+    for sql in statements:
+        plan = explain_query_plan(seeded_db, sql)
+        if has_full_scan(plan):
+            scans.append(" ".join(sql.split()) + "\n" + "\n".join(plan))
+    assert not scans, "full table scan:\n" + "\n\n".join(scans)
@@ -0,0 +1,31 @@
+import sqlite3
+
+from app import config
+from conftest import run_cli, wait_for_change
+
+DAY = "2031-05-17"
+
+def test_rebuild_out_of_process_invalidates_stats(client, employee):
+    response = client.post("/orders/", json={
+        "client_name": "Иванов", "car_model": "Лада", "car_number": "А001АА",
+        "date": DAY, "total_price": 100, "status": "завершен",
+        "employee_id": employee["id"]
+    })
+    assert response.status_code == 200, response.text
+    params = {"start_date": DAY, "end_date": DAY}
+
+    # Сводка разошлась с заказами: запись в обход transaction(), без версий
+    conn = sqlite3.connect(config.DATABASE_URL)
+    with conn:
+        conn.execute(
+            "UPDATE daily_financials SET amount = 999 WHERE day = ? AND kind = 'income'", (DAY,)
+        )
+    conn.close()
+    stale = client.get("/stats/financial", params=params)
+    assert stale.json()["income"] == 999
+
+    run_cli("app.rollup", "rebuild")
+
+    response = wait_for_change(client, "/stats/financial", params, stale.headers["etag"])
+    assert response.status_code == 200
+    assert response.json()["income"] == 100
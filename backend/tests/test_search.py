@@ -0,0 +1,23 @@
+import sqlite3
+
+from app import config
+from conftest import run_cli, wait_for_change
+
+def test_rebuild_out_of_process_invalidates_search(client):
+    response = client.post("/parts/", json={"name": "Кривошипник", "price": 10, "quantity": 1})
+    assert response.status_code == 200, response.text
+    params = {"q": "кривошип"}
+
+    # Индекс потерял строки: очистка в обход transaction(), без версий
+    conn = sqlite3.connect(config.DATABASE_URL)
+    with conn:
+        conn.execute("INSERT INTO parts_fts (parts_fts) VALUES ('delete-all')")
+    conn.close()
+    stale = client.get("/search", params=params)
+    assert stale.json()["parts"] == []
+
+    run_cli("app.search", "rebuild")
+
+    response = wait_for_change(client, "/search", params, stale.headers["etag"])
+    assert response.status_code == 200
+    assert [part["name"] for part in response.json()["parts"]] == ["Кривошипник"]
@@ -0,0 +1,14 @@
+import sqlite3
+
+from app import crud
+from app.migrations import migrate
+
+def test_empty_aggregates_are_floats():
+    # Пустая база: суммы и средние - 0.0, а не целый 0, как и у заполненных
+    db = sqlite3.connect(":memory:")
+    db.row_factory = sqlite3.Row
+    migrate(db)
+    snapshot = crud.get_dashboard_snapshot(db)
+    values = [*snapshot["financial"].values(), snapshot["employees"]["average_salary"]]
+    assert values == [0.0] * 5
+    assert all(isinstance(value, float) for value in values)
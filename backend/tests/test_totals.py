@@ -0,0 +1,32 @@
+import sqlite3
+
+from app import config
+from conftest import run_cli, wait_for_change
+
+def test_repair_out_of_process_invalidates_orders(client, employee):
+    part = client.post("/parts/", json={"name": "Фильтр", "price": 50, "quantity": 10}).json()
+    order = client.post("/orders/", json={
+        "client_name": "Петров", "car_model": "Лада", "car_number": "В002ВВ",
+        "date": "2031-06-01", "total_price": 0, "status": "в работе",
+        "employee_id": employee["id"]
+    }).json()
+    response = client.post("/order_details/", json={
+        "order_id": order["id"], "part_id": part["id"], "quantity": 2, "price": 50
+    })
+    assert response.status_code == 200, response.text
+    url = f"/orders/{order['id']}"
+    assert client.get(url).json()["total_price"] == 100
+
+    # Сумма заказа разошлась со строками: запись в обход transaction(), без версий
+    conn = sqlite3.connect(config.DATABASE_URL)
+    with conn:
+        conn.execute("UPDATE orders SET total_price = 1 WHERE id = ?", (order["id"],))
+    conn.close()
+    stale = client.get(url)
+    assert stale.json()["total_price"] == 1
+
+    run_cli("app.totals", "repair")
+
+    response = wait_for_change(client, url, {}, stale.headers["etag"])
+    assert response.status_code == 200
+    assert response.json()["total_price"] == 100
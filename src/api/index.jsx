@@ -17,10 +17,13 @@ export const deleteEmployee = (id) => api.delete(`/employees/${id}`);
 // Parts
 export const getParts = () => api.get('/parts/');
 export const createPart = (data) => api.post('/parts/', data);
+export const createParts = (items) => api.post('/parts/batch', items);
 export const updatePart = (id, data) => api.put(`/parts/${id}`, data);
 export const deletePart = (id) => api.delete(`/parts/${id}`);
 export const checkPartAvailability = (id, quantity) =>
     api.get(`/parts/check/${id}`, { params: { quantity } });
+// items: [{ part_id, quantity }] - проверка всех деталей одним запросом
+export const checkPartsAvailability = (items) => api.post('/parts/check', items);
 
 // Services
 export const getServices = () => api.get('/services/');
@@ -29,23 +32,31 @@ export const updateService = (id, data) => api.put(`/services/${id}`, data);
 export const deleteService = (id) => api.delete(`/services/${id}`);
 
 // Orders
-export const getOrders = (status) =>
-    api.get('/orders/', { params: { status } });
+// include: 'details' - вернуть заказы вместе с их деталями одним запросом
+export const getOrders = (status, { include } = {}) =>
+    api.get('/orders/', { params: { status, include } });
 export const createOrder = (data) => api.post('/orders/', data);
 export const updateOrder = (id, data) => api.put(`/orders/${id}`, data);
 export const deleteOrder = (id) => api.delete(`/orders/${id}`);
 export const calculateOrderTotal = (id) => api.post(`/orders/${id}/calculate`);
+// История машины: номер можно вводить в любом регистре, с пробелами и латиницей
+export const getVehicleHistory = (carNumber, skip, limit) =>
+    api.get(`/vehicles/${encodeURIComponent(carNumber)}/history`, { params: { skip, limit } });
 
 // Order Details
 export const getOrderDetails = (orderId) =>
     api.get('/order_details/', { params: { order_id: orderId } });
 export const createOrderDetail = (data) => api.post('/order_details/', data);
+export const createOrderDetails = (items) => api.post('/order_details/batch', items);
 export const updateOrderDetail = (id, data) => api.put(`/order_details/${id}`, data);
 export const deleteOrderDetail = (id) => api.delete(`/order_details/${id}`);
 
 // Finances
 export const getFinancialStats = (startDate, endDate) =>
     api.get('/stats/financial', { params: { start_date: startDate, end_date: endDate } });
+// metric: 'income' | 'expenses' | 'salaries', bucket: 'day' | 'week' | 'month'
+export const getFinancialTimeseries = (metric, bucket, start, end) =>
+    api.get('/stats/timeseries', { params: { metric, bucket, start, end } });
 export const getEmployeeStats = () => api.get('/stats/employees');
 export const getSalaryPayments = (employeeId) =>
     api.get('/salary_payments/', { params: { employee_id: employeeId } });
@@ -55,9 +66,38 @@ export const deleteSalaryPayment = (id) => api.delete(`/salary_payments/${id}`);
 export const getExpenses = (category) =>
     api.get('/expenses/', { params: { category } });
 export const createExpense = (data) => api.post('/expenses/', data);
+export const createExpenses = (items) => api.post('/expenses/batch', items);
 export const updateExpense = (id, data) => api.put(`/expenses/${id}`, data);
 export const deleteExpense = (id) => api.delete(`/expenses/${id}`);
 
+// Dashboard
+// Финансы, сотрудники, детали на исходе и последние заказы одним запросом
+export const getDashboardSnapshot = (minQuantity, recentLimit) =>
+    api.get('/dashboard/snapshot', {
+        params: { min_quantity: minQuantity, recent_limit: recentLimit },
+    });
+
+// Search
+export const search = (q, limit) => api.get('/search', { params: { q, limit } });
+
+// Change feed (Server-Sent Events)
+// onEvent получает { table, action, id, row }; action: 'created' | 'updated' |
+// 'deleted' | 'resync' (перечитать списки целиком). Возвращает функцию отписки.
+export const subscribeToChanges = (tables, onEvent) => {
+    const source = new EventSource(`/api/events?tables=${tables.join(',')}`);
+    source.onmessage = (e) => onEvent(JSON.parse(e.data));
+    return () => source.close();
+};
+
+// Применяет событие ленты к списку строк (для setState(prev => ...))
+export const applyRowChange = (rows, { action, id, row }) => {
+    if (action === 'deleted') return rows.filter((item) => item.id !== id);
+    if (!rows.some((item) => item.id === id)) {
+        return action === 'created' ? [...rows, row] : rows;
+    }
+    return rows.map((item) => (item.id === id ? { ...item, ...row } : item));
+};
+
 // Reports
 export const getPartsReport = (minQuantity) =>
     api.get('/reports/parts', { params: { min_quantity: minQuantity } });
@@ -1,27 +1,9 @@
 // src/pages/Dashboard/RecentOrdersTable.jsx
 import React from 'react';
 import { Table, Tag } from 'antd';
-import { getOrders } from '../../api';
-
-const RecentOrdersTable = () => {
-    const [orders, setOrders] = React.useState([]);
-    const [loading, setLoading] = React.useState(true);
-
-    React.useEffect(() => {
-        const fetchOrders = async () => {
-            try {
-                const response = await getOrders({ status: 'завершен', limit: 5 });
-                setOrders(response.data);
-            } catch (error) {
-                console.error('Error fetching orders:', error);
-            } finally {
-                setLoading(false);
-            }
-        };
-
-        fetchOrders();
-    }, []);
 
+// Заказы приходят из снимка панели управления (GET /dashboard/snapshot)
+const RecentOrdersTable = ({ orders }) => {
     const statusColors = {
         'в работе': 'blue',
         'завершен': 'green',
@@ -58,7 +40,6 @@ const RecentOrdersTable = () => {
             columns={columns}
             dataSource={orders}
             rowKey="id"
-            loading={loading}
             pagination={false}
         />
     );
@@ -1,12 +1,28 @@
 import React, { useEffect, useState } from 'react';
-import { Row, Col, Card, Divider } from 'antd';
+import { Row, Col, Card, Divider, Table } from 'antd';
 import { DollarOutlined, ShopOutlined, TeamOutlined, CarOutlined } from '@ant-design/icons';
-import { getFinancialStats, getEmployeeStats } from '../../api'
+import { getDashboardSnapshot, getFinancialTimeseries } from '../../api'
 import StatCard from '../../components/common/StatCard';
 import BarChart from '../../components/Charts/BarChart';
 import PieChart from '../../components/Charts/PieChart';
+import LineChart from '../../components/Charts/LineChart';
 import RecentOrdersTable from './RecentOrdersTable';
 
+// Дата в формате YYYY-MM-DD по местному времени
+const isoDate = (d) =>
+    `${d.getFullYear()}-${String(d.getMonth() + 1).padStart(2, '0')}-${String(d.getDate()).padStart(2, '0')}`;
+
+const lowStockColumns = [
+    { title: 'Деталь', dataIndex: 'name', key: 'name' },
+    { title: 'Остаток', dataIndex: 'quantity', key: 'quantity' },
+    {
+        title: 'Цена',
+        dataIndex: 'price',
+        key: 'price',
+        render: (value) => `${value.toLocaleString('ru-RU')} ₽`,
+    },
+];
+
 const Dashboard = () => {
     const [stats, setStats] = useState({
         income: 0,
@@ -16,24 +32,34 @@ const Dashboard = () => {
         employeeCount: 0,
         avgSalary: 0
     });
+    const [monthlyIncome, setMonthlyIncome] = useState([]);
+    const [recentOrders, setRecentOrders] = useState([]);
+    const [lowStockParts, setLowStockParts] = useState([]);
     const [loading, setLoading] = useState(true);
 
     useEffect(() => {
         const fetchData = async () => {
             try {
-                const [financial, employees] = await Promise.all([
-                    getFinancialStats(),
-                    getEmployeeStats()
+                // Доход по месяцам за последний год - один запрос на весь ряд
+                const today = new Date();
+                const yearAgo = new Date(today.getFullYear() - 1, today.getMonth() + 1, 1);
+                const [snapshot, income] = await Promise.all([
+                    getDashboardSnapshot(),
+                    getFinancialTimeseries('income', 'month', isoDate(yearAgo), isoDate(today))
                 ]);
 
+                const { financial, employees } = snapshot.data;
                 setStats({
-                    income: financial.data.income,
-                    expenses: financial.data.expenses,
-                    salaries: financial.data.salaries,
-                    profit: financial.data.profit,
-                    employeeCount: employees.data.employee_count,
-                    avgSalary: employees.data.average_salary
+                    income: financial.income,
+                    expenses: financial.expenses,
+                    salaries: financial.salaries,
+                    profit: financial.profit,
+                    employeeCount: employees.employee_count,
+                    avgSalary: employees.average_salary
                 });
+                setRecentOrders(snapshot.data.recent_orders);
+                setLowStockParts(snapshot.data.low_stock_parts);
+                setMonthlyIncome(income.data);
             } catch (error) {
                 console.error('Error fetching dashboard data:', error);
             } finally {
@@ -111,8 +137,22 @@ const Dashboard = () => {
                 </Col>
             </Row>
 
+            <Card title="Доход по месяцам">
+                <LineChart data={monthlyIncome} />
+            </Card>
+
             <Card title="Последние заказы">
-                <RecentOrdersTable />
+                <RecentOrdersTable orders={recentOrders} />
+            </Card>
+
+            <Card title="Детали на исходе">
+                <Table
+                    columns={lowStockColumns}
+                    dataSource={lowStockParts}
+                    rowKey="name"
+                    pagination={false}
+                    size="small"
+                />
             </Card>
         </div>
     );
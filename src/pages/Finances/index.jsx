@@ -6,7 +6,7 @@ import ModalForm from '../../components/ui/ModalForm';
 import BarChart from '../../components/Charts/BarChart';
 import PieChart from '../../components/Charts/PieChart';
 import {
-    getFinancialStats,
+    getDashboardSnapshot,
     getSalaryPayments,
     createSalaryPayment,
     updateSalaryPayment,
@@ -36,12 +36,12 @@ const FinancesPage = () => {
     const fetchData = async () => {
         setLoading(true);
         try {
-            const [financial, payments, expensesData] = await Promise.all([
-                getFinancialStats(),
+            const [snapshot, payments, expensesData] = await Promise.all([
+                getDashboardSnapshot(),
                 getSalaryPayments(),
                 getExpenses()
             ]);
-            setFinancialData(financial.data);
+            setFinancialData(snapshot.data.financial);
             setSalaryPayments(payments.data);
             setExpenses(expensesData.data);
         } catch (error) {
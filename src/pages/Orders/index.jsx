@@ -8,12 +8,13 @@ import {
     createOrder,
     updateOrder,
     deleteOrder,
-    getOrderDetails,
     createOrderDetail,
     deleteOrderDetail,
     getEmployees,
     getParts,
-    getServices
+    getServices,
+    subscribeToChanges,
+    applyRowChange
 } from '../../api';
 
 const { TabPane } = Tabs;
@@ -32,13 +33,23 @@ const OrdersPage = () => {
 
     useEffect(() => {
         fetchData();
+        // Заказы и остатки деталей обновляются по /events без перезагрузки списков
+        return subscribeToChanges(['orders', 'parts'], (event) => {
+            if (event.action === 'resync') {
+                fetchData();
+            } else if (event.table === 'orders') {
+                setOrders((prev) => applyRowChange(prev, event));
+            } else if (event.table === 'parts') {
+                setParts((prev) => applyRowChange(prev, event));
+            }
+        });
     }, []);
 
     const fetchData = async () => {
         setLoading(true);
         try {
             const [ordersRes, employeesRes, partsRes, servicesRes] = await Promise.all([
-                getOrders(),
+                getOrders(undefined, { include: 'details' }),
                 getEmployees(),
                 getParts(),
                 getServices()
@@ -49,11 +60,10 @@ const OrdersPage = () => {
             setParts(partsRes.data);
             setServices(servicesRes.data);
 
-            // Загружаем детали для всех заказов
+            // Детали приходят вместе с заказами
             const details = {};
             for (const order of ordersRes.data) {
-                const detailsRes = await getOrderDetails(order.id);
-                details[order.id] = detailsRes.data;
+                details[order.id] = order.details;
             }
             setOrderDetails(details);
         } catch (error) {
@@ -66,9 +76,10 @@ const OrdersPage = () => {
 
     const handleCreate = async (values) => {
         try {
-            await createOrder(values);
+            // Свое изменение применяется сразу, не дожидаясь /events
+            const { data } = await createOrder(values);
+            setOrders((prev) => applyRowChange(prev, { action: 'created', id: data.id, row: data }));
             setModalVisible(false);
-            fetchData();
             message.success('Заказ успешно создан');
         } catch (error) {
             console.error('Error creating order:', error);
@@ -78,9 +89,9 @@ const OrdersPage = () => {
 
     const handleUpdate = async (values) => {
         try {
-            await updateOrder(currentOrder.id, values);
+            const { data } = await updateOrder(currentOrder.id, values);
+            setOrders((prev) => applyRowChange(prev, { action: 'updated', id: currentOrder.id, row: data }));
             setModalVisible(false);
-            fetchData();
             message.success('Заказ успешно обновлен');
         } catch (error) {
             console.error('Error updating order:', error);
@@ -91,7 +102,7 @@ const OrdersPage = () => {
     const handleDelete = async (order) => {
         try {
             await deleteOrder(order.id);
-            fetchData();
+            setOrders((prev) => applyRowChange(prev, { action: 'deleted', id: order.id }));
             message.success('Заказ успешно удален');
         } catch (error) {
             console.error('Error deleting order:', error);
@@ -107,7 +118,11 @@ const OrdersPage = () => {
             message.success('Деталь заказа успешно добавлена');
         } catch (error) {
             console.error('Error creating order detail:', error);
-            message.error('Ошибка при добавлении детали заказа');
+            if (error.response?.status === 409) {
+                message.error('Недостаточно деталей на складе');
+            } else {
+                message.error('Ошибка при добавлении детали заказа');
+            }
         }
     };
 
@@ -7,7 +7,9 @@ import {
     getParts,
     createPart,
     updatePart,
-    deletePart
+    deletePart,
+    subscribeToChanges,
+    applyRowChange
 } from '../../api';
 
 const PartsPage = () => {
@@ -18,6 +20,14 @@ const PartsPage = () => {
 
     useEffect(() => {
         fetchParts();
+        // Изменения (в том числе списание со склада из заказов) приходят по /events
+        return subscribeToChanges(['parts'], (event) => {
+            if (event.action === 'resync') {
+                fetchParts();
+            } else {
+                setParts((prev) => applyRowChange(prev, event));
+            }
+        });
     }, []);
 
     const fetchParts = async () => {
@@ -35,9 +45,10 @@ const PartsPage = () => {
 
     const handleCreate = async (values) => {
         try {
-            await createPart(values);
+            // Свое изменение применяется сразу, не дожидаясь /events
+            const { data } = await createPart(values);
+            setParts((prev) => applyRowChange(prev, { action: 'created', id: data.id, row: data }));
             setModalVisible(false);
-            fetchParts();
             message.success('Деталь успешно добавлена');
         } catch (error) {
             console.error('Error creating part:', error);
@@ -47,9 +58,9 @@ const PartsPage = () => {
 
     const handleUpdate = async (values) => {
         try {
-            await updatePart(currentPart.id, values);
+            const { data } = await updatePart(currentPart.id, values);
+            setParts((prev) => applyRowChange(prev, { action: 'updated', id: currentPart.id, row: data }));
             setModalVisible(false);
-            fetchParts();
             message.success('Деталь успешно обновлена');
         } catch (error) {
             console.error('Error updating part:', error);
@@ -60,7 +71,7 @@ const PartsPage = () => {
     const handleDelete = async (part) => {
         try {
             await deletePart(part.id);
-            fetchParts();
+            setParts((prev) => applyRowChange(prev, { action: 'deleted', id: part.id }));
             message.success('Деталь успешно удалена');
         } catch (error) {
             console.error('Error deleting part:', error);